@@ -1,16 +1,37 @@
+import asyncio
 import bcrypt
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import database
 import models
+from services.metrics import hash_duration
+
+logger = logging.getLogger(__name__)
 
 # CONFIGURAÇÕES
 SECRET_KEY = "sua_chave_secreta_super_poderosa_aqui"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 3000
+# Caches da autenticação (evitam checar assinatura e ir ao banco em toda requisição)
+TOKEN_CACHE_SIZE = int(os.getenv("ANIHUB_TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("ANIHUB_USER_CACHE_SIZE", "5000"))
+USER_CACHE_TTL = float(os.getenv("ANIHUB_USER_CACHE_TTL", "300"))
+# bcrypt: custo (work factor) e pool dedicado para não travar as outras rotas
+BCRYPT_ROUNDS = int(os.getenv("ANIHUB_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("ANIHUB_HASH_WORKERS", "2"))
+HASH_MAX_QUEUE = int(os.getenv("ANIHUB_HASH_MAX_QUEUE", "32"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -19,7 +40,7 @@ def get_password_hash(password):
     # Converte string para bytes
     pwd_bytes = password.encode('utf-8')
     # Gera o salt e o hash
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(pwd_bytes, salt)
     # Retorna como string para salvar no banco
     return hashed.decode('utf-8')
@@ -32,9 +53,53 @@ def verify_password(plain_password, hashed_password):
         hash_bytes = hashed_password.encode('utf-8')
         return bcrypt.checkpw(pwd_bytes, hash_bytes)
     except Exception as e:
-        print(f"Erro na verificação de senha: {e}")
+        logger.warning("Erro na verificação de senha", extra={"error": str(e)})
+        return False
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True se o hash foi gerado com um custo diferente do configurado."""
+    try:
+        # Formato: $2b$<custo>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
         return False
 
+# --- BCRYPT FORA DO THREADPOOL DAS ROTAS ---
+# O bcrypt libera o GIL, então um pool pequeno e exclusivo dá conta sem
+# ocupar os slots que as rotas síncronas (usuários, histórico) usam.
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0  # em execução + na fila
+
+
+def hashing_queue_depth() -> int:
+    """Quantos hashes estão esperando um worker livre."""
+    return max(0, _hash_pending - HASH_WORKERS)
+
+
+async def _run_hash(fn, *args):
+    global _hash_pending
+    # Em tempestade de logins, recusa rápido em vez de acumular fila infinita
+    if hashing_queue_depth() >= HASH_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "2"},
+        )
+    _hash_pending += 1
+    try:
+        with hash_duration.time(operation=fn.__name__):
+            return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hash(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
 # --- GERAÇÃO DE TOKEN ---
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -43,22 +108,134 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# --- CACHE DE TOKENS E USUÁRIOS ---
+@dataclass(frozen=True)
+class CurrentUser:
+    """Cópia leve do usuário logado (não fica presa a uma sessão do banco)."""
+    id: int
+    username: str
+    email: str
+    bio: str
+    avatar_color: str
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CurrentUser":
+        return cls(id=user.id, username=user.username, email=user.email, bio=user.bio, avatar_color=user.avatar_color)
+
+
+_cache_lock = threading.Lock()
+# hash do token -> (username, exp em timestamp); nunca vive além do 'exp' do próprio token
+_token_cache: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+# username -> (CurrentUser, guardado_em)
+_user_cache: "OrderedDict[str, tuple[CurrentUser, float]]" = OrderedDict()
+
+
+def _token_key(token: str) -> str:
+    # Guarda só o hash: o token em si nunca fica em memória no cache
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _lru_put(cache: OrderedDict, key, value, max_size: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def _verify_token(token: str) -> str | None:
+    """Retorna o username do token (None se inválido), checando a assinatura só na primeira vez."""
+    key = _token_key(token)
+    now = time.time()
+    with _cache_lock:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                _token_cache.move_to_end(key)
+                return entry[0]
+            del _token_cache[key]
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    exp = payload.get("exp")
+    if username is None:
+        return None
+    if exp is not None:
+        with _cache_lock:
+            _lru_put(_token_cache, key, (username, float(exp)), TOKEN_CACHE_SIZE)
+    return username
+
+
+def invalidate_user(username: str):
+    """Descarta a cópia em cache do usuário (chamar depois de alterar o perfil)."""
+    with _cache_lock:
+        _user_cache.pop(username, None)
+
+
+def evict_user(username: str):
+    """Remove tudo do usuário dos caches: dados e tokens já verificados."""
+    with _cache_lock:
+        _user_cache.pop(username, None)
+        for key in [k for k, (name, _) in _token_cache.items() if name == username]:
+            del _token_cache[key]
+
+
+def evict_token(token: str):
+    with _cache_lock:
+        _token_cache.pop(_token_key(token), None)
+
+
 # --- IDENTIFICAR USUÁRIO LOGADO ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.username == username).first()
+
+
+def _cached_user(username: str) -> CurrentUser | None:
+    with _cache_lock:
+        entry = _user_cache.get(username)
+        if entry is not None and time.monotonic() - entry[1] < USER_CACHE_TTL:
+            _user_cache.move_to_end(username)
+            return entry[0]
+    return None
+
+
+def _remember_user(username: str, user: models.User | None) -> CurrentUser:
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    current_user = CurrentUser.from_model(user)
+    with _cache_lock:
+        _lru_put(_user_cache, username, (current_user, time.monotonic()), USER_CACHE_SIZE)
+    return current_user
+
+
+def _user_query(username: str):
+    return select(models.User).where(models.User.username == username).limit(1)
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> CurrentUser:
+    username = _verify_token(token)
+    if username is None:
+        raise _credentials_exception()
+    current_user = _cached_user(username)
+    if current_user is not None:
+        return current_user
+    return _remember_user(username, db.execute(_user_query(username)).scalar())
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    """Mesma coisa que get_current_user, mas só abre uma sessão async se o usuário não estiver em cache."""
+    username = _verify_token(token)
+    if username is None:
+        raise _credentials_exception()
+    current_user = _cached_user(username)
+    if current_user is not None:
+        return current_user
+    async with database.AsyncSessionLocal() as db:
+        user = (await db.execute(_user_query(username))).scalar()
+    return _remember_user(username, user)
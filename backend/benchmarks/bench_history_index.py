@@ -0,0 +1,127 @@
+"""
+Benchmark da tabela history com e sem os índices por usuário (migração 2).
+
+Gera um SQLite temporário com N linhas e mede as consultas que o
+routers/users.py faz: histórico do usuário ordenado por recência,
+busca por (user_id, anime_id) e o upsert do POST /users/history.
+
+Uso (dentro de backend/):
+    python benchmarks/bench_history_index.py [--rows 1000000] [--users 10000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+SCHEMA = """
+CREATE TABLE history (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    anime_id INTEGER,
+    title VARCHAR,
+    cover VARCHAR,
+    episode INTEGER,
+    watched_at TIMESTAMP
+);
+CREATE INDEX ix_history_id ON history (id);
+"""
+INDEXES = """
+CREATE UNIQUE INDEX ux_history_user_anime ON history (user_id, anime_id);
+CREATE INDEX ix_history_user_watched ON history (user_id, watched_at);
+"""
+
+QUERIES = {
+    "histórico do usuário": (
+        "SELECT * FROM history WHERE user_id = ? ORDER BY watched_at DESC, id DESC",
+        lambda users, animes: (random.randint(1, users),),
+    ),
+    "busca (user, anime)": (
+        "SELECT id FROM history WHERE user_id = ? AND anime_id = ?",
+        lambda users, animes: (random.randint(1, users), random.randint(1, animes)),
+    ),
+}
+
+
+def build(path: str, rows: int, users: int, animes: int, with_indexes: bool):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    random.seed(42)
+    seen = set()
+    batch = []
+    base = time.time() - 365 * 86400
+    while len(seen) < rows:
+        key = (random.randint(1, users), random.randint(1, animes))
+        if key in seen:
+            continue
+        seen.add(key)
+        batch.append((key[0], key[1], f"Anime {key[1]}", f"https://s4.anilist.co/file/cover/{key[1]}.jpg",
+                      random.randint(1, 24), base + random.random() * 365 * 86400))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO history (user_id, anime_id, title, cover, episode, watched_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO history (user_id, anime_id, title, cover, episode, watched_at) VALUES (?, ?, ?, ?, ?, ?)", batch)
+    if with_indexes:
+        conn.executescript(INDEXES)
+    conn.commit()
+    return conn
+
+
+def measure(fn, repeat: int) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def run(label: str, conn: sqlite3.Connection, users: int, animes: int, repeat: int, with_indexes: bool):
+    for name, (sql, params) in QUERIES.items():
+        p50, p95 = measure(lambda: conn.execute(sql, params(users, animes)).fetchall(), repeat)
+        print(f"{label:<12} {name:<24} p50 {p50:>9.3f} ms   p95 {p95:>9.3f} ms")
+
+    if with_indexes:
+        sql = ("INSERT INTO history (user_id, anime_id, title, cover, episode, watched_at) VALUES (?, ?, 't', 'c', ?, ?) "
+               "ON CONFLICT (user_id, anime_id) DO UPDATE SET episode = excluded.episode, watched_at = excluded.watched_at")
+        write = lambda: conn.execute(sql, (random.randint(1, users), random.randint(1, animes), 1, time.time()))
+        name = "upsert (1 instrução)"
+    else:
+        # Fluxo antigo: SELECT e depois UPDATE ou INSERT
+        def write():
+            user_id, anime_id = random.randint(1, users), random.randint(1, animes)
+            row = conn.execute("SELECT id FROM history WHERE user_id = ? AND anime_id = ?", (user_id, anime_id)).fetchone()
+            if row:
+                conn.execute("UPDATE history SET episode = 1, watched_at = ? WHERE id = ?", (time.time(), row[0]))
+            else:
+                conn.execute("INSERT INTO history (user_id, anime_id, title, cover, episode, watched_at) VALUES (?, ?, 't', 'c', 1, ?)",
+                             (user_id, anime_id, time.time()))
+        name = "select + update/insert"
+    p50, p95 = measure(write, repeat)
+    conn.rollback()
+    print(f"{label:<12} {name:<24} p50 {p50:>9.3f} ms   p95 {p95:>9.3f} ms")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--rows", type=int, default=1_000_000)
+    arg_parser.add_argument("--users", type=int, default=10_000)
+    arg_parser.add_argument("--animes", type=int, default=5_000)
+    arg_parser.add_argument("--repeat", type=int, default=30)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, with_indexes in (("sem índices", False), ("com índices", True)):
+            start = time.perf_counter()
+            conn = build(os.path.join(tmp, f"{with_indexes}.db"), args.rows, args.users, args.animes, with_indexes)
+            print(f"# {label}: {args.rows} linhas geradas em {time.perf_counter() - start:.1f}s")
+            run(label, conn, args.users, args.animes, args.repeat, with_indexes)
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark dos backends de parsing do scraper sobre as páginas salvas em fixtures/.
+
+Uso (dentro de backend/):
+    python benchmarks/bench_parsers.py [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import parsers  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGES = [("search.html", "anime_link"), ("anime.html", "episodes"), ("episode.html", "iframe")]
+
+
+def bench(backend: str, what: str, html: str, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parsers.parse_sync(what, html, backend)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--repeat", type=int, default=50)
+    args = arg_parser.parse_args()
+
+    pages = []
+    for filename, what in PAGES:
+        with open(os.path.join(FIXTURES, filename), encoding="utf-8") as f:
+            pages.append((filename, what, f.read()))
+
+    print(f"{'backend':<12} {'página':<14} {'KB':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    reference = None
+    for backend in parsers.BACKENDS:
+        try:
+            results = [parsers.parse_sync(what, html, backend) for _, what, html in pages]
+        except ImportError as e:
+            print(f"{backend:<12} indisponível ({e.name} não instalado)")
+            continue
+        # O primeiro backend disponível serve de referência para os outros
+        if reference is None:
+            reference = (backend, results)
+        elif results != reference[1]:
+            print(f"⚠️ {backend}: resultado diferente do {reference[0]}")
+
+        for filename, what, html in pages:
+            timings = sorted(bench(backend, what, html, args.repeat))
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{backend:<12} {filename:<14} {len(html) / 1024:>6.0f} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
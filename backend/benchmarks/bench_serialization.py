@@ -0,0 +1,116 @@
+"""
+Benchmark de serialização e bytes trafegados das respostas mais pesadas.
+
+Monta payloads no formato de /home, /catalog, /anime/{name} e
+/users/me/history a partir de fixtures/anilist_media.json e compara:
+  - o caminho padrão do FastAPI (jsonable_encoder + json.dumps);
+  - jsonable_encoder + orjson (rotas que devolvem dict com FastJSONResponse);
+  - orjson direto (rotas que devolvem a Response pronta ou bytes do cache);
+e o tamanho do corpo sem compressão, com gzip e com brotli (se instalado).
+
+Uso (dentro de backend/):
+    python benchmarks/bench_serialization.py [--repeat 200]
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+import responses  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_payloads() -> dict:
+    with open(os.path.join(FIXTURES, "anilist_media.json"), encoding="utf-8") as f:
+        media = json.load(f)
+
+    def rail(offset: int, full: bool = False) -> dict:
+        items = []
+        for i in range(10):
+            m = media[(offset + i) % len(media)]
+            item = {"id": m["id"], "title": {"romaji": m["title"]["romaji"]}, "coverImage": m["coverImage"]}
+            if full:
+                item.update({"bannerImage": m["bannerImage"], "description": m["description"], "trailer": {"id": "abc123", "site": "youtube"}})
+            items.append(item)
+        return {"media": items}
+
+    home = {name: rail(n * 5, full=(name == "trending")) for n, name in enumerate(("trending", "popular", "action", "romance", "horror", "sports"))}
+    catalog = {
+        "pageInfo": {"total": 5000, "perPage": 18, "lastPage": 278, "currentPage": 1, "hasNextPage": True},
+        "media": [
+            {k: m.get(k) for k in ("id", "title", "coverImage", "averageScore", "genres", "seasonYear", "episodes", "format", "popularity")}
+            for m in (media * 2)[:18]
+        ],
+    }
+    m = media[0]
+    detail = {
+        "id": m["id"], "title": m["title"]["romaji"], "cover": m["coverImage"]["extraLarge"], "banner": m["bannerImage"],
+        "description": m["description"], "score": m["averageScore"], "episodes": m["episodes"], "status": m["status"],
+        "year": m["seasonYear"], "genres": m["genres"], "studio": "Wit Studio",
+        "relations": [
+            {"type": e["relationType"], "title": e["node"]["title"]["romaji"], "format": e["node"]["format"], "cover": e["node"]["coverImage"]["medium"]}
+            for e in m["relations"]["edges"]
+        ],
+    }
+    now = datetime(2026, 1, 1)
+    history = [
+        {"id": i, "anime_id": media[i % len(media)]["id"], "title": media[i % len(media)]["title"]["romaji"],
+         "cover": media[i % len(media)]["coverImage"]["large"], "episode": i % 24 + 1, "watched_at": now - timedelta(hours=i)}
+        for i in range(200)
+    ]
+    return {"/home": home, "/catalog": catalog, "/anime/{name}": detail, "/users/me/history": history}
+
+
+def default_path(content) -> bytes:
+    # O que o JSONResponse padrão do FastAPI faz com um dict devolvido pela rota
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def encoder_fast_path(content) -> bytes:
+    return responses.dumps(jsonable_encoder(content))
+
+
+def measure(fn, content, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    backend = "orjson" if responses.orjson is not None else "json (orjson não instalado)"
+    print(f"# serializador rápido: {backend}")
+    print(f"{'rota':<20} {'padrão µs':>10} {'enc+rápido µs':>14} {'direto µs':>10} {'bytes':>8} {'gzip':>7} {'brotli':>7}")
+    for route, content in build_payloads().items():
+        body = responses.dumps(content)
+        gzipped = len(gzip.compress(body, compresslevel=6))
+        brotlied = len(brotli.compress(body, quality=4)) if brotli is not None else None
+        print(
+            f"{route:<20} {measure(default_path, content, args.repeat):>10.1f} "
+            f"{measure(encoder_fast_path, content, args.repeat):>14.1f} "
+            f"{measure(responses.dumps, content, args.repeat):>10.1f} "
+            f"{len(body):>8} {gzipped:>7} {brotlied if brotlied is not None else '-':>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Checagem da paginação do histórico num banco migrado de uma versão antiga.
+
+Monta um SQLite no formato de antes da migração 2 (history sem watched_at),
+aplica as migrações e percorre GET /users/me/history página por página.
+Todas as linhas ganham o mesmo watched_at no preenchimento da migração, então
+a ordem depende só do desempate por id: cada linha tem que aparecer uma vez
+e o cursor tem que acabar.
+
+Uso (dentro de backend/):
+    python benchmarks/check_history_cursor.py [--rows 10] [--limit 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEGACY_HISTORY = """
+CREATE TABLE history (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER REFERENCES users (id),
+    anime_id INTEGER,
+    title VARCHAR,
+    cover VARCHAR,
+    episode INTEGER
+)
+"""
+
+
+def build_legacy(engine, rows: int) -> int:
+    import models
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        models.Base.metadata.create_all(bind=conn)
+        conn.execute(text("DROP TABLE history"))
+        conn.execute(text(LEGACY_HISTORY))
+        conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (1)"))
+        user_id = conn.execute(text(
+            "INSERT INTO users (username, email, hashed_password, is_active) VALUES ('cursor', 'cursor@example.com', 'x', 1)"
+        )).lastrowid
+        conn.execute(
+            text("INSERT INTO history (user_id, anime_id, title, cover, episode) VALUES (:user_id, :anime_id, 'Anime', 'https://s4.anilist.co/c.jpg', 1)"),
+            [{"user_id": user_id, "anime_id": anime_id} for anime_id in range(1, rows + 1)],
+        )
+    return user_id
+
+
+def page_through(client, limit: int, max_pages: int) -> list[int]:
+    seen, cursor = [], None
+    for _ in range(max_pages):
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/users/me/history", params=params)
+        response.raise_for_status()
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+    raise AssertionError(f"cursor não terminou em {max_pages} páginas (ids: {seen[:12]}...)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--rows", type=int, default=10)
+    arg_parser.add_argument("--limit", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes de importar o backend: o engine é criado a partir do ambiente
+        os.environ["ANIHUB_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'cursor.db')}"
+        os.environ["ANIHUB_STREAM_CACHE_PATH"] = os.path.join(tmp, "stream_cache.db")
+        sys.path.insert(0, BACKEND)
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        import auth
+        import database
+        import migrations
+        from routers import users
+
+        user_id = build_legacy(database.engine, args.rows)
+        migrations.run_migrations(database.engine)
+
+        app = FastAPI()
+        app.include_router(users.router)
+        app.dependency_overrides[auth.get_current_user] = lambda: auth.CurrentUser(user_id, "cursor", "cursor@example.com", "", "purple")
+        with TestClient(app) as client:
+            seen = page_through(client, args.limit, max_pages=args.rows + 2)
+        database.engine.dispose()
+
+    expected = list(range(args.rows, 0, -1))
+    if seen != expected:
+        raise AssertionError(f"esperado {expected}, veio {seen}")
+    print(f"ok: {args.rows} linhas com o mesmo watched_at em páginas de {args.limit}, sem repetir nenhuma")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Servidores falsos do AniList (GraphQL) e do site de episódios, para rodar a
+API e os benchmarks sem internet.
+
+- AniList: um catálogo gerado a partir de fixtures/anilist_media.json (os 30
+  animes gravados viram N, com temporadas numeradas e relações entre elas).
+  Entende o que a API manda: Page (com sort, genre, search, format e
+  paginação), Media por id ou por busca, aliases (home e MediaBatch) e devolve
+  só os campos pedidos, como o AniList de verdade. Id desconhecido vira 404.
+- Site: as páginas salvas em fixtures/ (busca, anime, episódio), com os
+  links trocados para este servidor e o slug do anime buscado.
+- Em cada um dá para injetar latência (com variação), erros 500 e, no
+  AniList, respostas 429 com Retry-After.
+
+Uso avulso (dentro de backend/), apontando a API para eles:
+    python benchmarks/fakes.py [--anilist-port 8801] [--site-port 8802] [--latency 80] [--error-rate 0.01]
+    ANIHUB_ANILIST_URL=http://127.0.0.1:8801/ ANIHUB_ANIMESONLINE_URL=http://127.0.0.1:8802 uvicorn main:app
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import re
+import socket
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SITE_FIXTURE_URL = "https://animesonlinecc.to"
+# Slug do anime nas páginas salvas (trocado pelo slug do anime buscado)
+SITE_FIXTURE_SLUG = "anime-resultado-0"
+SYNTHETIC_ID_BASE = 500_000
+
+
+# --- INJEÇÃO DE FALHAS ---
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+
+    def __post_init__(self):
+        self.rng = random.Random(0)
+
+    async def apply(self) -> int | None:
+        """Espera a latência sorteada; devolve o status de erro a responder, se sorteado."""
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+
+# --- CATÁLOGO ---
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+class MediaCatalog:
+    """
+    Os animes gravados nas fixtures, multiplicados até `size`: a cópia k de um
+    anime vira "Título k", com id próprio, popularidade menor e relações de
+    prequel/sequel com as cópias vizinhas. Determinístico para o mesmo size.
+    """
+
+    def __init__(self, size: int = 2000):
+        with open(os.path.join(FIXTURES, "anilist_media.json"), encoding="utf-8") as f:
+            recorded = json.load(f)
+        self.media: list[dict] = []
+        for n in range(size):
+            base, season = recorded[n % len(recorded)], n // len(recorded) + 1
+            self.media.append(self._copy(base, season, n))
+        # Temporadas do mesmo anime ligadas entre si, como no AniList
+        for n, media in enumerate(self.media):
+            for other, relation in ((n - len(recorded), "PREQUEL"), (n + len(recorded), "SEQUEL")):
+                if 0 <= other < size:
+                    media["relations"]["edges"].insert(0, {"relationType": relation, "node": self._node(self.media[other])})
+        self.by_id = {media["id"]: media for media in self.media}
+        self._names = [(media, [normalize(name) for name in self.names(media)]) for media in self.media]
+        self._sorted = {
+            "POPULARITY_DESC": sorted(self.media, key=lambda m: -m["popularity"]),
+            "TRENDING_DESC": sorted(self.media, key=lambda m: -m["trending"]),
+            "SCORE_DESC": sorted(self.media, key=lambda m: -(m["averageScore"] or 0)),
+            "START_DATE_DESC": sorted(self.media, key=lambda m: -_start_date(m)),
+            "TITLE_ROMAJI": sorted(self.media, key=lambda m: m["title"]["romaji"]),
+        }
+        self._cum_weights, total = [], 0.0
+        for rank in range(size):
+            total += 1 / (rank + 1) ** 0.9
+            self._cum_weights.append(total)
+
+    @staticmethod
+    def _copy(base: dict, season: int, n: int) -> dict:
+        media = copy.deepcopy(base)
+        if season > 1:
+            media["id"] = SYNTHETIC_ID_BASE + n
+            media["title"] = {kind: f"{title} {season}" if title else title for kind, title in media["title"].items()}
+            media["synonyms"] = [f"{synonym} {season}" for synonym in media.get("synonyms") or []]
+            media["popularity"] = int(media["popularity"] * 0.9 ** (season - 1))
+            media["trending"] = int((media.get("trending") or 0) * 1.1 ** (season - 1)) % 500
+            if media.get("seasonYear"):
+                media["seasonYear"] += season - 1
+                media["startDate"] = {**(media.get("startDate") or {}), "year": media["seasonYear"]}
+        # O fixture traz os estúdios como edges; a API pede studios(isMain: true) { nodes }
+        studios = media.get("studios") or {"edges": []}
+        studios["nodes"] = [edge["node"] for edge in studios.get("edges", []) if edge.get("isMain")]
+        media["studios"] = studios
+        media["trailer"] = None
+        media.setdefault("relations", {"edges": []})
+        return media
+
+    @staticmethod
+    def _node(media: dict) -> dict:
+        return {"id": media["id"], "title": {"romaji": media["title"]["romaji"]}, "format": media["format"],
+                "type": "ANIME", "coverImage": {"medium": media["coverImage"]["medium"]}}
+
+    @staticmethod
+    def names(media: dict) -> list[str]:
+        return [name for name in (*media["title"].values(), *(media.get("synonyms") or [])) if name]
+
+    def search(self, term: str) -> list[dict]:
+        # Contém o termo em algum dos nomes (na ordem do catálogo)
+        term = normalize(term)
+        return [media for media, names in self._names if any(term in name for name in names)]
+
+    def find(self, term: str) -> dict | None:
+        """O Media(search:) do AniList: nome exato primeiro, senão o mais popular que contém o termo."""
+        normalized = normalize(term)
+        for media, names in self._names:
+            if normalized in names:
+                return media
+        found = sorted(self.search(term), key=lambda m: -m["popularity"])
+        return found[0] if found else None
+
+    def ranked(self, sort: str = "POPULARITY_DESC") -> list[dict]:
+        return self._sorted.get(sort, self._sorted["POPULARITY_DESC"])
+
+    def sample(self, rng: random.Random, count: int = 1) -> list[dict]:
+        """Animes sem repetição, com peso de Zipf pela popularidade (poucos concentram o tráfego)."""
+        popular = self.ranked()
+        chosen = {}
+        for _ in range(count * 3):
+            media = rng.choices(popular, cum_weights=self._cum_weights)[0]
+            chosen[media["id"]] = media
+            if len(chosen) >= count:
+                break
+        return list(chosen.values())
+
+    def page(self, sort: str, genre: str | None, search: str | None, format: str | None) -> list[dict]:
+        ordered = self.ranked(sort)
+        if search:
+            matches = {id(media) for media in self.search(search)}
+            ordered = [media for media in ordered if id(media) in matches]
+        if genre:
+            ordered = [media for media in ordered if genre in media["genres"]]
+        if format:
+            ordered = [media for media in ordered if media["format"] == format]
+        return ordered
+
+
+def _start_date(media: dict) -> int:
+    start = media.get("startDate") or {}
+    return (start.get("year") or 0) * 10000 + (start.get("month") or 0) * 100 + (start.get("day") or 0)
+
+
+# --- GRAPHQL (o subconjunto que a API usa) ---
+_TOKEN_RE = re.compile(r'"[^"]*"|\([^)]*\)|[A-Za-z_]\w*|[{}:]')
+_ARG_RE = re.compile(r'(\w+)\s*:\s*(\$\w+|"[^"]*"|\[[^\]]*\]|-?\w+)')
+
+
+def parse_document(query: str) -> dict:
+    """
+    Campos do documento em árvore: {chave (alias ou nome): (nome, argumentos, subcampos)}.
+    Sem fragmentos nem diretivas, que a API não usa.
+    """
+    query = re.sub(r"#[^\n]*", "", query)
+    tokens = _TOKEN_RE.findall(query)
+    start = tokens.index("{")
+    fields, _ = _selection(tokens, start)
+    return fields
+
+
+def _selection(tokens: list[str], i: int) -> tuple[dict, int]:
+    fields = {}
+    i += 1
+    while tokens[i] != "}":
+        key = name = tokens[i]
+        i += 1
+        if tokens[i] == ":":
+            name = tokens[i + 1]
+            i += 2
+        args = None
+        if tokens[i].startswith("("):
+            args = tokens[i][1:-1]
+            i += 1
+        sub = None
+        if tokens[i] == "{":
+            sub, i = _selection(tokens, i)
+        fields[key] = (name, args, sub)
+    return fields, i + 1
+
+
+def parse_args(raw: str | None, variables: dict) -> dict:
+    args = {}
+    for name, value in _ARG_RE.findall(raw or ""):
+        if value.startswith("$"):
+            args[name] = variables.get(value[1:])
+        elif value.startswith('"'):
+            args[name] = value[1:-1]
+        elif value.startswith("["):
+            args[name] = [v.strip() for v in value[1:-1].split(",") if v.strip()]
+        elif value.lstrip("-").isdigit():
+            args[name] = int(value)
+        else:
+            args[name] = value
+    return args
+
+
+def project(value, fields: dict | None):
+    """Só os campos pedidos (as chaves são os aliases)."""
+    if fields is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, fields) for item in value]
+    return {key: project(value.get(name), sub) for key, (name, _, sub) in fields.items()}
+
+
+class FakeAniList:
+    def __init__(self, catalog: MediaCatalog, faults: Faults):
+        self.catalog = catalog
+        self.faults = faults
+        self.calls: Counter = Counter()
+
+    def execute(self, query: str, variables: dict) -> dict:
+        data, errors = {}, []
+        for key, (name, raw_args, sub) in parse_document(query).items():
+            args = parse_args(raw_args, variables)
+            if name == "Page":
+                data[key] = self._page(args, sub, variables)
+            elif name == "Media":
+                media = self.catalog.by_id.get(args["id"]) if "id" in args else self.catalog.find(args.get("search") or "")
+                if media is None:
+                    errors.append({"message": "Not Found.", "status": 404, "path": [key]})
+                data[key] = project(media, sub)
+            else:
+                errors.append({"message": f'Cannot query field "{name}" on type "Query".', "status": 400})
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    def _page(self, args: dict, fields: dict, variables: dict) -> dict:
+        page, per_page = max(args.get("page") or 1, 1), args.get("perPage") or 50
+        result, total = {}, 0
+        for key, (name, raw_args, sub) in fields.items():
+            if name != "media":
+                continue
+            media_args = parse_args(raw_args, variables)
+            sort = media_args.get("sort") or "POPULARITY_DESC"
+            ordered = self.catalog.page(sort[0] if isinstance(sort, list) else sort,
+                                        media_args.get("genre"), media_args.get("search"), media_args.get("format"))
+            result[key] = project(ordered[(page - 1) * per_page:page * per_page], sub)
+            total = len(ordered)
+        if "pageInfo" in fields:
+            last_page = max(1, -(-total // per_page))
+            info = {"total": total, "perPage": per_page, "currentPage": page, "lastPage": last_page, "hasNextPage": page < last_page}
+            result["pageInfo"] = project(info, fields["pageInfo"][2])
+        return result
+
+    async def graphql(self, request: Request):
+        body = await request.json()
+        query = body.get("query") or ""
+        operation = re.match(r"\s*query\s+(\w+)", query)
+        self.calls[operation.group(1) if operation else "anonymous"] += 1
+        status = await self.faults.apply()
+        if status == 429:
+            return JSONResponse({"errors": [{"message": "Too Many Requests.", "status": 429}]}, 429, headers={"Retry-After": "1"})
+        if status:
+            return JSONResponse({"errors": [{"message": "Internal Server Error", "status": 500}]}, status)
+        return JSONResponse(self.execute(query, body.get("variables") or {}), headers={"X-RateLimit-Remaining": "90"})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/", self.graphql, methods=["POST"])])
+
+
+# --- SITE DE EPISÓDIOS ---
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", normalize(text)).strip("-") or "anime"
+
+
+class FakeSite:
+    def __init__(self, base_url: str, faults: Faults):
+        self.base_url = base_url.rstrip("/")
+        self.faults = faults
+        self.calls: Counter = Counter()
+        self.pages = {}
+        for page in ("search", "anime", "episode"):
+            with open(os.path.join(FIXTURES, f"{page}.html"), encoding="utf-8") as f:
+                self.pages[page] = f.read().replace(SITE_FIXTURE_URL, self.base_url)
+
+    async def _render(self, page: str, slug: str, extra: tuple[str, str] | None = None):
+        self.calls[page] += 1
+        status = await self.faults.apply()
+        if status:
+            return PlainTextResponse("erro", status)
+        html = self.pages[page].replace(SITE_FIXTURE_SLUG, slug)
+        if extra:
+            html = html.replace(*extra)
+        return HTMLResponse(html)
+
+    async def search(self, request: Request):
+        return await self._render("search", slugify(request.query_params.get("s", "")))
+
+    async def anime(self, request: Request):
+        return await self._render("anime", request.path_params["slug"])
+
+    async def episode(self, request: Request):
+        # Cada episódio com o seu próprio iframe
+        slug = request.path_params["slug"]
+        return await self._render("episode", slug, ("fixture_token", slug))
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/", self.search),
+            Route("/anime/{slug}/", self.anime),
+            Route("/episodio/{slug}/", self.episode),
+        ])
+
+
+# --- EXECUÇÃO ---
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(app, port: int) -> tuple[uvicorn.Server, asyncio.Task]:
+    """Sobe o app no event loop atual; para parar: server.should_exit = True e await na task."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False, lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.02)
+    return server, task
+
+
+async def _serve_forever(args):
+    catalog = MediaCatalog(args.catalog_size)
+    anilist = FakeAniList(catalog, Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate))
+    site = FakeSite(f"http://127.0.0.1:{args.site_port}", Faults(args.site_latency, args.site_jitter, args.error_rate))
+    servers = [await start_server(anilist.app(), args.anilist_port), await start_server(site.app(), args.site_port)]
+    print(f"AniList falso: http://127.0.0.1:{args.anilist_port}/ ({len(catalog.media)} animes)")
+    print(f"Site falso:    http://127.0.0.1:{args.site_port}")
+    await asyncio.gather(*(task for _, task in servers))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--anilist-port", type=int, default=8801)
+    arg_parser.add_argument("--site-port", type=int, default=8802)
+    arg_parser.add_argument("--catalog-size", type=int, default=2000)
+    arg_parser.add_argument("--latency", type=float, default=80, help="ms do AniList")
+    arg_parser.add_argument("--jitter", type=float, default=40)
+    arg_parser.add_argument("--site-latency", type=float, default=150)
+    arg_parser.add_argument("--site-jitter", type=float, default=80)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--throttle-rate", type=float, default=0.0, help="fração de 429 do AniList")
+    args = arg_parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
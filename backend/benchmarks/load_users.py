@@ -0,0 +1,155 @@
+"""
+Teste de carga das rotas de usuários: sessão síncrona x assíncrona.
+
+Sobe o servidor (uvicorn, um worker) duas vezes com um SQLite temporário,
+uma com ANIHUB_ASYNC_DB=0 e outra com ANIHUB_ASYNC_DB=1, cria alguns usuários
+com favoritos e histórico e dispara N clientes simultâneos alternando
+GET /users/me/favorites, GET /users/me/history e POST /users/history.
+Mostra requisições por segundo, erros e p50/p95/p99 de cada modo.
+
+Com --no-user-cache o usuário logado é buscado no banco em toda requisição
+(ANIHUB_USER_CACHE_TTL=0), o que exercita também o get_current_user.
+
+Uso (dentro de backend/; o modo async precisa do aiosqlite):
+    python benchmarks/load_users.py [--clients 500] [--duration 15] [--users 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(port: int, async_db: bool, workdir: str, no_user_cache: bool) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "ANIHUB_ASYNC_DB": "1" if async_db else "0",
+        "ANIHUB_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        "ANIHUB_STREAM_CACHE_PATH": os.path.join(workdir, "stream_cache.db"),
+        # Cadastro/login rápidos: o alvo aqui é o banco, não o bcrypt
+        "ANIHUB_BCRYPT_ROUNDS": "4",
+    }
+    if no_user_cache:
+        env["ANIHUB_USER_CACHE_TTL"] = "0"
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("servidor não respondeu a tempo")
+
+
+async def seed(client: httpx.AsyncClient, users: int) -> list[dict]:
+    """Cria os usuários com alguns favoritos e devolve os cabeçalhos de autenticação."""
+    headers = []
+    for n in range(users):
+        credentials = {"username": f"carga{n}", "password": "senha"}
+        await client.post("/register", json={**credentials, "email": f"carga{n}@example.com"})
+        token = (await client.post("/login", json=credentials)).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        operations = [{"op": "favorite_add", "anime_id": a, "title": f"Anime {a}", "cover": "https://s4.anilist.co/c.jpg"} for a in range(1, 31)]
+        operations += [{"op": "history", "anime_id": a, "title": f"Anime {a}", "cover": "https://s4.anilist.co/c.jpg", "episode": 1} for a in range(1, 31)]
+        await client.post("/users/batch", json={"operations": operations}, headers=auth)
+        headers.append(auth)
+    return headers
+
+
+async def worker(client: httpx.AsyncClient, headers: list[dict], deadline: float, latencies: dict, errors: list):
+    while time.monotonic() < deadline:
+        auth = random.choice(headers)
+        route = random.choice(("favorites", "history", "post_history"))
+        start = time.perf_counter()
+        try:
+            if route == "post_history":
+                anime_id = random.randint(1, 500)
+                response = await client.post("/users/history", headers=auth, json={"anime_id": anime_id, "title": f"Anime {anime_id}", "cover": "https://s4.anilist.co/c.jpg", "episode": random.randint(1, 24)})
+            else:
+                response = await client.get(f"/users/me/{route}", headers=auth)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies[route].append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(route)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_mode(async_db: bool, args) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(args.port, async_db, workdir, args.no_user_cache)
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+                await wait_ready(client)
+                headers = await seed(client, args.users)
+                latencies = {"favorites": [], "history": [], "post_history": []}
+                errors: list[str] = []
+                start = time.monotonic()
+                deadline = start + args.duration
+                await asyncio.gather(*(worker(client, headers, deadline, latencies, errors) for _ in range(args.clients)))
+                elapsed = time.monotonic() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "mode": "async" if async_db else "sync",
+        "requests": len(every),
+        "errors": len(errors),
+        "rps": len(every) / elapsed,
+        "p50": statistics.median(every) if every else float("nan"),
+        "p95": percentile(every, 0.95),
+        "p99": percentile(every, 0.99),
+        "routes": {route: (len(values), percentile(values, 0.95)) for route, values in latencies.items()},
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--clients", type=int, default=500)
+    arg_parser.add_argument("--duration", type=float, default=15)
+    arg_parser.add_argument("--users", type=int, default=50)
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--mode", choices=("both", "sync", "async"), default="both")
+    arg_parser.add_argument("--no-user-cache", action="store_true")
+    args = arg_parser.parse_args()
+
+    modes = {"both": (False, True), "sync": (False,), "async": (True,)}[args.mode]
+    print(f"# {args.clients} clientes simultâneos por {args.duration:.0f}s, {args.users} usuários")
+    print(f"{'modo':<6} {'req/s':>9} {'reqs':>8} {'erros':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for async_db in modes:
+        result = asyncio.run(run_mode(async_db, args))
+        print(f"{result['mode']:<6} {result['rps']:>9.1f} {result['requests']:>8} {result['errors']:>6} "
+              f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f}")
+        for route, (count, p95) in result["routes"].items():
+            print(f"         {route:<14} {count:>8} reqs   p95 {p95:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
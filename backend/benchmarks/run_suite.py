@@ -0,0 +1,519 @@
+"""
+Suíte de carga da API inteira, sem internet.
+
+1. sobe o AniList e o site de episódios falsos (benchmarks/fakes.py), com a
+   latência e a taxa de erros pedidas;
+2. cria um SQLite temporário com usuários, listas e histórico (benchmarks/seed.py)
+   e, opcionalmente, preenche o espelho de animes pela importação em lote;
+3. sobe a API (uvicorn) apontando para os falsos e faz login de N sessões;
+4. dispara usuários virtuais, cada um sorteando roteiros de uso:
+   - browse: home, catálogo (filtros e páginas), detalhe e relações;
+   - search: busca enquanto digita (uma sugestão por tecla) e abre o anime;
+   - binge: abre o anime e assiste episódios em sequência, gravando o histórico;
+   - profile: perfil, favoritos, continuar assistindo, minha lista e histórico,
+     com algumas alterações;
+5. mostra req/s, erros e p50/p95/p99 por rota (o molde, ex. /anime/{anime_name}),
+   as chamadas que chegaram aos falsos e o resumo do /metrics da API.
+
+Com --output o resultado vai para um JSON; com --compare ele é comparado com um
+JSON anterior e o script sai com código 1 se alguma rota piorou além da
+tolerância (p95 maior, menos req/s ou mais erros).
+
+Uso (dentro de backend/):
+    python benchmarks/run_suite.py [--users 50] [--duration 60] [--mix mixed|browse=50,binge=50]
+        [--anilist-latency 80] [--anilist-errors 0.01] [--site-latency 150]
+        [--env ANIHUB_ASYNC_DB=1] [--output atual.json] [--compare base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import httpx
+
+from fakes import FakeAniList, FakeSite, Faults, MediaCatalog, free_port, start_server
+from seed import SEED_PASSWORD, username
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_VERSION = 1
+
+GENRES = ("Action", "Adventure", "Comedy", "Drama", "Fantasy", "Romance", "Sci-Fi", "Slice of Life", "Sports")
+SORTS = ("POPULARITY_DESC", "TRENDING_DESC", "SCORE_DESC", "START_DATE_DESC")
+MIXES = {
+    "mixed": {"browse": 40, "search": 25, "binge": 20, "profile": 15},
+    "browse": {"browse": 1},
+    "search": {"search": 1},
+    "binge": {"binge": 1},
+    "profile": {"profile": 1},
+}
+
+
+# --- MEDIÇÃO ---
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Recorder:
+    """Latências por rota; só conta o que começou dentro da janela medida."""
+
+    def __init__(self):
+        self.recording = False
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.client_errors: Counter = Counter()
+        self.scenarios: Counter = Counter()
+
+    def record(self, route: str, started: float, elapsed_ms: float, status: int | None):
+        if not self.recording or started < self.window_start:
+            return
+        if status is None or status >= 500:
+            self.errors[route] += 1
+        elif status >= 400:
+            self.client_errors[route] += 1
+        self.latencies[route].append(elapsed_ms)
+
+    def start(self):
+        self.window_start = time.perf_counter()
+        self.recording = True
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            routes[route] = {
+                "requests": len(values),
+                "errors": self.errors[route],
+                "client_errors": self.client_errors[route],
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values), 2),
+                **{f"p{int(p * 100)}_ms": round(percentile(values, p), 2) for p in (0.5, 0.95, 0.99)},
+                "max_ms": round(values[-1], 2),
+            }
+        every = sorted(v for values in self.latencies.values() for v in values)
+        total = {
+            "requests": len(every),
+            "errors": sum(self.errors.values()),
+            "rps": round(len(every) / elapsed, 2),
+            **{f"p{int(p * 100)}_ms": round(percentile(every, p), 2) if every else None for p in (0.5, 0.95, 0.99)},
+        }
+        return {"total": total, "routes": routes, "scenarios": dict(self.scenarios)}
+
+
+class Api:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+
+    async def call(self, method: str, route: str, path: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            # O corpo inteiro faz parte da latência (como no navegador)
+            await response.aread()
+        except httpx.HTTPError:
+            response = None
+        self.recorder.record(f"{method} {route}", started, (time.perf_counter() - started) * 1000,
+                             response.status_code if response is not None else None)
+        return response
+
+
+# --- ROTEIROS DE USO ---
+class VirtualUser:
+    def __init__(self, api: Api, catalog: MediaCatalog, auth: dict, rng: random.Random, think: float):
+        self.api = api
+        self.catalog = catalog
+        self.auth = auth
+        self.rng = rng
+        self.think_mean = think
+
+    async def think(self, scale: float = 1.0):
+        if self.think_mean:
+            await asyncio.sleep(self.rng.expovariate(1 / (self.think_mean * scale)))
+
+    def anime(self) -> dict:
+        return self.catalog.sample(self.rng)[0]
+
+    async def browse(self):
+        await self.api.call("GET", "/home", "/home")
+        await self.think()
+        params = {"page": 1, "sort": self.rng.choice(SORTS)}
+        if self.rng.random() < 0.5:
+            params["genre"] = self.rng.choice(GENRES)
+        for _ in range(self.rng.randint(1, 3)):
+            response = await self.api.call("GET", "/catalog", "/catalog", params=params)
+            await self.think()
+            params["page"] += 1
+        media = response.json().get("media") if response is not None and response.status_code == 200 else None
+        anime = self.rng.choice(media) if media else self.anime()
+        await asyncio.gather(
+            self.api.call("GET", "/anime/id/{anime_id}", f"/anime/id/{anime['id']}"),
+            self.api.call("GET", "/anime/id/{anime_id}/relations", f"/anime/id/{anime['id']}/relations"),
+        )
+        await self.think()
+
+    async def search(self):
+        title = self.anime()["title"]["romaji"]
+        # Digita parte do nome (com erros de caixa) e escolhe uma sugestão
+        typed = title[:self.rng.randint(3, max(3, min(len(title), 14)))].lower()
+        for end in range(2, len(typed) + 1):
+            await self.api.call("GET", "/search/suggest/{term}", f"/search/suggest/{quote(typed[:end], safe='')}")
+            await asyncio.sleep(self.rng.uniform(0.08, 0.2))
+        if self.rng.random() < 0.3:
+            await self.api.call("GET", "/catalog", "/catalog", params={"search": typed})
+        await self.api.call("GET", "/anime/{anime_name}", f"/anime/{quote(title, safe='')}")
+        await self.think()
+
+    async def binge(self):
+        anime = self.anime()
+        title = anime["title"]["romaji"]
+        await self.api.call("GET", "/anime/{anime_name}", f"/anime/{quote(title, safe='')}")
+        episodes = anime["episodes"] or 12
+        first = self.rng.randint(1, max(1, episodes - 3))
+        for episode in range(first, min(episodes, first + self.rng.randint(2, 6)) + 1):
+            await self.api.call("GET", "/watch/{anime_name}/{episode}", f"/watch/{quote(title, safe='')}/{episode}")
+            await self.api.call("POST", "/users/history", "/users/history", headers=self.auth, json={
+                "anime_id": anime["id"], "title": title, "cover": anime["coverImage"]["large"], "episode": episode,
+            })
+            # O "episódio" dura algumas vezes o tempo de pensar
+            await self.think(3)
+        await self.api.call("GET", "/users/me/history", "/users/me/history", headers=self.auth)
+
+    async def profile(self):
+        # O que a página de perfil carrega de uma vez
+        await asyncio.gather(
+            self.api.call("GET", "/users/me", "/users/me", headers=self.auth),
+            self.api.call("GET", "/users/me/favorites", "/users/me/favorites", headers=self.auth),
+            self.api.call("GET", "/users/me/continue-watching", "/users/me/continue-watching", headers=self.auth),
+        )
+        await self.think()
+        for route in ("/users/me/watchlist", "/users/me/history"):
+            await self.api.call("GET", route, route, headers=self.auth)
+            await self.think()
+        roll = self.rng.random()
+        if roll < 0.3:
+            anime = self.anime()
+            item = {"anime_id": anime["id"], "title": anime["title"]["romaji"], "cover": anime["coverImage"]["large"], "format": anime["format"]}
+            kind = self.rng.choice(("favorites", "watchlist"))
+            await self.api.call("POST", f"/users/{kind}", f"/users/{kind}", headers=self.auth, json=item)
+            await self.think()
+            await self.api.call("DELETE", f"/users/{kind}/{{anime_id}}", f"/users/{kind}/{anime['id']}", headers=self.auth)
+        elif roll < 0.4:
+            await self.api.call("PUT", "/users/me", "/users/me", headers=self.auth, json={"bio": f"Assistindo {self.anime()['title']['romaji']}"})
+
+    async def run(self, mix: dict[str, float], deadline: float):
+        names, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            scenario = self.rng.choices(names, weights)[0]
+            await getattr(self, scenario)()
+            if self.api.recorder.recording:
+                self.api.recorder.scenarios[scenario] += 1
+
+
+# --- SERVIDOR DA API ---
+def server_env(args, workdir: str, db_path: str, anilist_port: int, site_port: int, api_port: int) -> dict:
+    env = {
+        **os.environ,
+        "ANIHUB_DATABASE_URL": f"sqlite:///{db_path}",
+        "ANIHUB_STREAM_CACHE_PATH": os.path.join(workdir, "stream_cache.db"),
+        "ANIHUB_IMAGE_CACHE_DIR": os.path.join(workdir, "image_cache"),
+        "ANIHUB_IMAGE_PROXY_BASE": f"http://127.0.0.1:{api_port}",
+        "ANIHUB_PROFILE_DIR": os.path.join(workdir, "profiles"),
+        "ANIHUB_ANILIST_URL": f"http://127.0.0.1:{anilist_port}/",
+        "ANIHUB_ANIMESONLINE_URL": f"http://127.0.0.1:{site_port}",
+        # O falso não tem limite: sem isso o benchmark mede só o limite de 80/min
+        "ANIHUB_ANILIST_RATE_PER_MIN": str(args.anilist_rate),
+        "ANIHUB_BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "ANIHUB_LOG_LEVEL": "WARNING",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+async def run_command(command: list[str], env: dict, log_path: str):
+    # Assíncrono: os falsos rodam neste mesmo event loop e precisam responder
+    with open(log_path, "ab") as log:
+        process = await asyncio.create_subprocess_exec(*command, cwd=BACKEND, env=env, stdout=log, stderr=log)
+        if await process.wait() != 0:
+            raise RuntimeError(f"{' '.join(command)} falhou (log em {log_path})")
+
+
+async def wait_ready(client: httpx.AsyncClient, server: asyncio.subprocess.Process, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.returncode is not None:
+            raise RuntimeError("a API encerrou na subida")
+        try:
+            if (await client.get("/")).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("a API não respondeu a tempo")
+
+
+async def login(client: httpx.AsyncClient, sessions: int) -> list[dict]:
+    headers = []
+    for n in range(sessions):
+        response = await client.post("/login", json={"username": username(n), "password": SEED_PASSWORD})
+        response.raise_for_status()
+        headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+    return headers
+
+
+# --- /metrics DA API ---
+_SAMPLE_RE = re.compile(r'^(\w+)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text: str) -> dict[str, list[tuple[dict, float]]]:
+    families = defaultdict(list)
+    for line in text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if match:
+            families[match.group(1)].append((dict(_LABEL_RE.findall(match.group(2) or "")), float(match.group(3))))
+    return families
+
+
+def server_summary(before: dict, after: dict) -> dict:
+    """Diferença entre duas coletas do /metrics: só o que aconteceu na janela medida."""
+    def delta(name: str, keys: tuple[str, ...]) -> dict:
+        start = {tuple(labels.get(k, "") for k in keys): value for labels, value in before.get(name, [])}
+        result = {}
+        for labels, value in after.get(name, []):
+            key = tuple(labels.get(k, "") for k in keys)
+            result[":".join(key)] = value - start.get(key, 0)
+        return result
+
+    def latencies(prefix: str, keys: tuple[str, ...]) -> dict:
+        sums, counts = delta(f"{prefix}_sum", keys), delta(f"{prefix}_count", keys)
+        return {key: {"count": int(count), "mean_ms": round(sums[key] / count * 1000, 3)}
+                for key, count in sorted(counts.items()) if count}
+
+    caches = {}
+    hits, misses = delta("anihub_cache_hits_total", ("cache",)), delta("anihub_cache_misses_total", ("cache",))
+    for name in sorted(hits):
+        total = hits[name] + misses.get(name, 0)
+        caches[name] = {"hits": int(hits[name]), "misses": int(misses.get(name, 0)),
+                        "hit_ratio": round(hits[name] / total, 3) if total else None}
+    return {
+        "upstream": latencies("anihub_upstream_duration_seconds", ("upstream", "operation")),
+        "upstream_errors": {k: int(v) for k, v in delta("anihub_upstream_errors_total", ("upstream", "operation")).items() if v},
+        "db": latencies("anihub_db_query_duration_seconds", ("statement", "table")),
+        "caches": caches,
+        "singleflight_deduplicated": {k: int(v) for k, v in delta("anihub_singleflight_deduplicated_total", ("group",)).items() if v},
+    }
+
+
+# --- EXECUÇÃO ---
+def parse_mix(value: str) -> dict[str, float]:
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in MIXES["mixed"]:
+            raise argparse.ArgumentTypeError(f"roteiro desconhecido: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="anihub-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    log_path = os.path.join(workdir, "server.log")
+    catalog = MediaCatalog(args.catalog_size)
+    anilist_port, site_port, api_port = free_port(), free_port(), args.port or free_port()
+
+    anilist = FakeAniList(catalog, Faults(args.anilist_latency, args.anilist_jitter, args.anilist_errors, args.anilist_throttle))
+    site = FakeSite(f"http://127.0.0.1:{site_port}", Faults(args.site_latency, args.site_jitter, args.site_errors))
+    fakes = [await start_server(anilist.app(), anilist_port), await start_server(site.app(), site_port)]
+    env = server_env(args, workdir, db_path, anilist_port, site_port, api_port)
+    server = None
+    try:
+        await run_command([sys.executable, os.path.join("benchmarks", "seed.py"), db_path, "--users", str(args.seed_users),
+                           "--history", str(args.history), "--rounds", str(args.bcrypt_rounds),
+                           "--catalog-size", str(args.catalog_size), "--seed", str(args.seed)], env, log_path)
+        if args.mirror_pages:
+            await run_command([sys.executable, "-m", "services.media_store", "fetch", "--pages", str(args.mirror_pages)], env, log_path)
+
+        with open(log_path, "ab") as log:
+            server = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--workers", str(args.workers),
+                "--log-level", "warning", "--no-access-log", cwd=BACKEND, env=env, stdout=log, stderr=log,
+            )
+        limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", limits=limits, timeout=args.timeout) as client:
+            await wait_ready(client, server)
+            sessions = await login(client, min(args.sessions or args.users, args.seed_users))
+
+            recorder = Recorder()
+            api = Api(client, recorder)
+            rng = random.Random(args.seed)
+            mix = parse_mix(args.mix)
+            users = [VirtualUser(api, catalog, sessions[n % len(sessions)], random.Random(rng.random()), args.think) for n in range(args.users)]
+            start = time.monotonic()
+            deadline = start + args.warmup + args.duration
+            tasks = [asyncio.create_task(user.run(mix, deadline)) for user in users]
+
+            await asyncio.sleep(args.warmup)
+            metrics_before = parse_metrics((await client.get("/metrics")).text)
+            calls_before = {"anilist": Counter(anilist.calls), "site": Counter(site.calls)}
+            recorder.start()
+            await asyncio.sleep(args.duration)
+            recorder.recording = False
+            elapsed = time.perf_counter() - recorder.window_start
+            calls = {"anilist": anilist.calls - calls_before["anilist"], "site": site.calls - calls_before["site"]}
+            metrics_after = parse_metrics((await client.get("/metrics")).text)
+            # Quem estava no meio de um roteiro é interrompido
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if server is not None and server.returncode is None:
+            server.terminate()
+            await server.wait()
+        for fake, task in fakes:
+            fake.should_exit = True
+            await task
+        if args.keep:
+            print(f"# arquivos da execução em {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "version": RESULT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare", "keep", "port")
+        },
+        "elapsed_s": round(elapsed, 2),
+        **recorder.summary(elapsed),
+        "upstream_calls": {name: dict(sorted(counter.items())) for name, counter in calls.items()},
+        "server": server_summary(metrics_before, metrics_after),
+    }
+
+
+# --- RELATÓRIO E COMPARAÇÃO ---
+def _ms(value: float | None) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def print_report(result: dict):
+    config = result["config"]
+    print(f"# {config['users']} usuários virtuais, {result['elapsed_s']:.0f}s medidos, roteiros {config['mix']}, "
+          f"AniList {config['anilist_latency']:.0f}±{config['anilist_jitter']:.0f} ms, site {config['site_latency']:.0f}±{config['site_jitter']:.0f} ms")
+    print(f"{'rota':<40} {'reqs':>7} {'req/s':>8} {'erros':>6} {'4xx':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<40} {stats['requests']:>7} {stats['rps']:>8.1f} {stats['errors']:>6} {stats['client_errors']:>5} "
+              f"{_ms(stats['p50_ms']):>8} {_ms(stats['p95_ms']):>8} {_ms(stats['p99_ms']):>8}")
+    total = result["total"]
+    print(f"{'total':<40} {total['requests']:>7} {total['rps']:>8.1f} {total['errors']:>6} {'':>5} "
+          f"{_ms(total['p50_ms']):>8} {_ms(total['p95_ms']):>8} {_ms(total['p99_ms']):>8}")
+    print(f"# roteiros completos: {result['scenarios']}")
+    print(f"# chamadas aos falsos: {result['upstream_calls']}")
+    for key, stats in result["server"]["upstream"].items():
+        print(f"#   {key:<32} {stats['count']:>6} chamadas, média {stats['mean_ms']:.1f} ms")
+    ratios = {name: cache["hit_ratio"] for name, cache in result["server"]["caches"].items()}
+    print(f"# acerto dos caches: {ratios}")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Rotas que pioraram: p95 maior, vazão menor ou taxa de erros maior que a da base."""
+    regressions = []
+    print(f"\n{'rota':<40} {'p95 base':>9} {'p95 atual':>10} {'Δ':>7} {'req/s base':>11} {'req/s atual':>12} {'Δ':>7}")
+    for route in sorted(set(baseline["routes"]) | set(current["routes"])):
+        old, new = baseline["routes"].get(route), current["routes"].get(route)
+        if old is None or new is None:
+            print(f"{route:<40} {'(só na ' + ('atual' if old is None else 'base') + ')':>9}")
+            continue
+        p95_delta = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        rps_delta = (new["rps"] - old["rps"]) / old["rps"] if old["rps"] else 0.0
+        old_errors, new_errors = old["errors"] / max(old["requests"], 1), new["errors"] / max(new["requests"], 1)
+        worse = []
+        # Diferenças de 1-2 ms são ruído em rotas que respondem da memória
+        if p95_delta > tolerance and new["p95_ms"] - old["p95_ms"] > 2:
+            worse.append(f"p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms")
+        if rps_delta < -tolerance:
+            worse.append(f"req/s {old['rps']:.1f} -> {new['rps']:.1f}")
+        if new_errors - old_errors > 0.01:
+            worse.append(f"erros {old_errors:.1%} -> {new_errors:.1%}")
+        if worse:
+            regressions.append(f"{route}: {', '.join(worse)}")
+        print(f"{route:<40} {old['p95_ms']:>9.1f} {new['p95_ms']:>10.1f} {p95_delta:>+7.0%} {old['rps']:>11.1f} {new['rps']:>12.1f} {rps_delta:>+7.0%}"
+              + ("  <-- pior" if worse else ""))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--users", type=int, default=50, help="usuários virtuais simultâneos")
+    arg_parser.add_argument("--duration", type=float, default=60, help="segundos medidos")
+    arg_parser.add_argument("--warmup", type=float, default=10, help="segundos antes da medição (caches esquentando)")
+    arg_parser.add_argument("--mix", default="mixed", help=f"{', '.join(MIXES)} ou pesos (ex.: browse=50,binge=50)")
+    arg_parser.add_argument("--think", type=float, default=0.5, help="pausa média entre ações, em segundos (0 = sem pausa)")
+    arg_parser.add_argument("--sessions", type=int, default=0, help="logins distintos (padrão: um por usuário virtual)")
+    arg_parser.add_argument("--seed-users", type=int, default=2000)
+    arg_parser.add_argument("--history", type=float, default=30, help="mediana do histórico por usuário no banco")
+    arg_parser.add_argument("--catalog-size", type=int, default=2000)
+    arg_parser.add_argument("--mirror-pages", type=int, default=0, help="páginas (50 animes) importadas no espelho antes de subir")
+    arg_parser.add_argument("--anilist-latency", type=float, default=80)
+    arg_parser.add_argument("--anilist-jitter", type=float, default=40)
+    arg_parser.add_argument("--anilist-errors", type=float, default=0.0, help="fração de respostas 500")
+    arg_parser.add_argument("--anilist-throttle", type=float, default=0.0, help="fração de respostas 429")
+    arg_parser.add_argument("--anilist-rate", type=float, default=100_000, help="ANIHUB_ANILIST_RATE_PER_MIN da API")
+    arg_parser.add_argument("--site-latency", type=float, default=150)
+    arg_parser.add_argument("--site-jitter", type=float, default=80)
+    arg_parser.add_argument("--site-errors", type=float, default=0.0)
+    arg_parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    arg_parser.add_argument("--workers", type=int, default=1)
+    arg_parser.add_argument("--env", action="append", default=[], metavar="CHAVE=VALOR", help="variável extra para a API (repetível)")
+    arg_parser.add_argument("--timeout", type=float, default=30)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--port", type=int, default=0)
+    arg_parser.add_argument("--output", help="grava o resultado em JSON")
+    arg_parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    arg_parser.add_argument("--tolerance", type=float, default=0.15, help="piora aceita na comparação (0.15 = 15%%)")
+    arg_parser.add_argument("--keep", action="store_true", help="não apaga o banco, os logs e os flamegraphs da execução")
+    args = arg_parser.parse_args()
+    parse_mix(args.mix)
+
+    result = asyncio.run(run_suite(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"# resultado gravado em {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        if regressions:
+            print("\n# piorou além da tolerância:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Popula um SQLite com usuários, favoritos, "minha lista" e histórico em volumes
+parecidos com os de produção, para os benchmarks não rodarem num banco vazio.
+
+- os animes vêm do mesmo catálogo do AniList falso (benchmarks/fakes.py), com
+  preferência pelos mais populares (distribuição de Zipf), então as listas
+  apontam para animes que a API consegue resolver;
+- o tamanho do histórico varia muito de usuário para usuário (lognormal):
+  a maioria tem poucas dezenas de animes, alguns têm centenas;
+- todos os usuários têm a mesma senha (bench_<n> / SEED_PASSWORD), com o hash
+  gerado uma vez só, no custo pedido (o mesmo ANIHUB_BCRYPT_ROUNDS da API).
+
+Uso (dentro de backend/):
+    python benchmarks/seed.py bench.db [--users 2000] [--history 30] [--rounds 4]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bcrypt
+from sqlalchemy import create_engine
+
+from fakes import MediaCatalog
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED_PASSWORD = "senha-benchmark"
+AVATAR_COLORS = ("purple", "blue", "green", "red", "orange", "pink")
+
+
+def username(n: int) -> str:
+    return f"bench_{n}"
+
+
+def seed(path: str, users: int, history: float, favorites: float, watchlist: float,
+         rounds: int, catalog_size: int, rng_seed: int = 42) -> dict:
+    # Importado aqui: o run_suite usa este módulo só pelo usuário e senha, sem carregar o backend
+    sys.path.insert(0, BACKEND)
+    import migrations
+    migrations.run_migrations(create_engine(f"sqlite:///{path}"))
+
+    rng = random.Random(rng_seed)
+    catalog = MediaCatalog(catalog_size)
+    hashed = bcrypt.hashpw(SEED_PASSWORD.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+    now = datetime.utcnow()
+
+    conn = sqlite3.connect(path)
+    first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]) + 1
+    conn.executemany(
+        "INSERT INTO users (id, username, email, hashed_password, is_active, bio, avatar_color) VALUES (?, ?, ?, ?, 1, ?, ?)",
+        [(first_id + n, username(n), f"{username(n)}@example.com", hashed, "Apenas um fã de animes.", rng.choice(AVATAR_COLORS))
+         for n in range(users)],
+    )
+
+    counts = {"users": users, "favorites": 0, "watchlist": 0, "history": 0}
+    for n in range(users):
+        user_id = first_id + n
+        # Mediana = o valor pedido; cauda longa de quem assiste muito
+        watched = catalog.sample(rng, int(rng.lognormvariate(0, 1) * history))
+        rows = []
+        for media in watched:
+            episodes = media["episodes"] or 24
+            moment = now - timedelta(days=rng.expovariate(1 / 30))
+            rows.append((user_id, media["id"], media["title"]["romaji"], media["coverImage"]["large"],
+                         rng.randint(1, episodes), moment.strftime("%Y-%m-%d %H:%M:%S.%f")))
+        conn.executemany("INSERT INTO history (user_id, anime_id, title, cover, episode, watched_at) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        counts["history"] += len(rows)
+
+        for table, mean in (("favorites", favorites), ("watchlist", watchlist)):
+            picked = catalog.sample(rng, int(rng.expovariate(1 / mean)) if mean else 0)
+            conn.executemany(
+                f"INSERT INTO {table} (user_id, anime_id, title, cover, format) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, m["id"], m["title"]["romaji"], m["coverImage"]["large"], m["format"]) for m in picked],
+            )
+            counts[table] += len(picked)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("path", help="arquivo SQLite (criado se não existir)")
+    arg_parser.add_argument("--users", type=int, default=2000)
+    arg_parser.add_argument("--history", type=float, default=30, help="mediana de animes no histórico por usuário")
+    arg_parser.add_argument("--favorites", type=float, default=6, help="média de favoritos por usuário")
+    arg_parser.add_argument("--watchlist", type=float, default=10, help="média da minha lista por usuário")
+    arg_parser.add_argument("--rounds", type=int, default=int(os.getenv("ANIHUB_BCRYPT_ROUNDS", "12")))
+    arg_parser.add_argument("--catalog-size", type=int, default=2000)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    counts = seed(args.path, args.users, args.history, args.favorites, args.watchlist, args.rounds, args.catalog_size, args.seed)
+    print(f"# {args.path}: " + ", ".join(f"{count} {table}" for table, count in counts.items())
+          + f" em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+import database
 from database import engine
-import models
-from routers import anime, video, auth, users
+import migrations
+from routers import anime, video, images, metrics, auth, users, auth_async, users_async
+from services import http_client, title_index
+from providers import parsers
+from providers.stream_cache import stream_cache
+from services.history_writer import history_buffer
+from services.image_proxy import image_proxy
+from responses import FastJSONResponse
+from services.metrics import MetricsMiddleware
+from services.profiler import profiler
+from services.log import setup_logging
+import os
 
-# Cria o banco de dados se não existir
-models.Base.metadata.create_all(bind=engine)
+try:
+    from brotli_asgi import BrotliMiddleware  # opcional: pip install brotli-asgi
+except ImportError:
+    BrotliMiddleware = None
 
-app = FastAPI()
+# CONFIGURAÇÕES
+# Respostas menores que isso vão sem compressão (não compensa o custo)
+COMPRESS_MIN_SIZE = int(os.getenv("ANIHUB_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("ANIHUB_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("ANIHUB_BROTLI_QUALITY", "4"))
+
+# Logs com nível (ANIHUB_LOG_LEVEL) e formato texto ou JSON (ANIHUB_LOG_FORMAT)
+setup_logging()
+
+# Cria o banco de dados se não existir e aplica as migrações pendentes
+migrations.run_migrations(engine)
+
+# --- CICLO DE VIDA: clientes HTTP compartilhados (pool de conexões keep-alive) ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.start_clients()
+    history_buffer.start()
+    # Gravações do cache do scraper em lote, fora do event loop
+    stream_cache.start()
+    # Índice das sugestões de busca montado a partir do espelho local
+    await asyncio.to_thread(title_index.load_from_db)
+    # Índice do cache de imagens (percorre o diretório inteiro)
+    await asyncio.to_thread(image_proxy.store.load)
+    # Profiler por amostragem (só com ANIHUB_PROFILE_SLOW_MS > 0)
+    profiler.start()
+    yield
+    profiler.stop()
+    await history_buffer.stop()
+    await stream_cache.stop()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+    await http_client.close_clients()
+    parsers.shutdown()
+
+# orjson em todas as rotas (cai para o json padrão se não estiver instalado)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # --- CONFIGURAÇÃO DO CORS (O Segredo do Sucesso) ---
 # Isso libera o Frontend (Next.js) para conversar com o Backend
@@ -22,13 +73,32 @@ app.add_middleware(
     allow_credentials=True,      # Permite cookies/tokens
     allow_methods=["*"],         # Permite GET, POST, PUT, DELETE, OPTIONS
     allow_headers=["*"],         # Permite todos os cabeçalhos (inclusive Authorization)
+    expose_headers=["ETag", "X-Next-Cursor"],  # Paginação das listas do usuário
 )
 
+# --- COMPRESSÃO (home e catálogo passam de dezenas de KB) ---
+# Brotli para quem aceita (com gzip de reserva); sem o pacote, só gzip
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, quality=BROTLI_QUALITY, minimum_size=COMPRESS_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# --- MÉTRICAS (GET /metrics) ---
+# Adicionado por último = mais externo: a latência medida inclui a compressão
+app.add_middleware(MetricsMiddleware, on_finish=profiler.request_finished if profiler.enabled else None)
+
 # --- INCLUIR ROTAS ---
 app.include_router(anime.router)
 app.include_router(video.router)
-app.include_router(auth.router)
-app.include_router(users.router)
+app.include_router(images.router)
+app.include_router(metrics.router)
+# Usuários e login: sessão async (ANIHUB_ASYNC_DB=1) ou a síncrona de sempre
+if database.ASYNC_DB:
+    app.include_router(auth_async.router)
+    app.include_router(users_async.router)
+else:
+    app.include_router(auth.router)
+    app.include_router(users.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,110 @@
+"""
+Migrações versionadas do banco.
+
+Cada migração roda uma vez só e fica registrada na tabela schema_version.
+Elas checam o estado atual antes de mexer (coluna/índice já existe?), porque
+num banco novo a migração 1 já cria as tabelas no formato mais recente.
+
+Uso manual (dentro de backend/):
+    python migrations.py
+"""
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+import models
+
+logger = logging.getLogger(__name__)
+
+
+# --- MIGRAÇÕES ---
+def _baseline(conn: Connection):
+    # Equivale ao antigo create_all do main.py: só cria o que ainda não existe
+    models.Base.metadata.create_all(bind=conn)
+
+
+def _user_list_indexes(conn: Connection):
+    if not has_column(conn, "history", "watched_at"):
+        conn.execute(text("ALTER TABLE history ADD COLUMN watched_at TIMESTAMP"))
+        conn.execute(text("UPDATE history SET watched_at = CURRENT_TIMESTAMP WHERE watched_at IS NULL"))
+
+    for table in ("favorites", "watchlist", "history"):
+        unique_index = f"ux_{table}_user_anime"
+        if has_index(conn, table, unique_index):
+            continue
+        # Remove duplicados criados pela antiga checagem "lê e depois insere", fica o mais recente
+        conn.execute(text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MAX(id) FROM {table} GROUP BY user_id, anime_id)"
+        ))
+        conn.execute(text(f"CREATE UNIQUE INDEX {unique_index} ON {table} (user_id, anime_id)"))
+
+    if not has_index(conn, "history", "ix_history_user_watched"):
+        conn.execute(text("CREATE INDEX ix_history_user_watched ON history (user_id, watched_at)"))
+
+
+def _media_mirror(conn: Connection):
+    for model in (models.Media, models.MediaTitle, models.MediaGenre, models.MediaStudio, models.MediaRelation):
+        model.__table__.create(bind=conn, checkfirst=True)
+
+
+def _media_aliases(conn: Connection):
+    if not has_column(conn, "media", "relations_fetched_at"):
+        conn.execute(text("ALTER TABLE media ADD COLUMN relations_fetched_at TIMESTAMP"))
+        # Até aqui as relações sempre vinham junto com o detalhe
+        conn.execute(text("UPDATE media SET relations_fetched_at = detail_fetched_at"))
+    models.MediaAlias.__table__.create(bind=conn, checkfirst=True)
+
+
+def _history_watched_at_format(conn: Connection):
+    # No SQLite o DateTime do SQLAlchemy vira texto "YYYY-MM-DD HH:MM:SS.ffffff" e é comparado como texto.
+    # O preenchimento da migração 2 (CURRENT_TIMESTAMP) saiu sem os microssegundos: o cursor do
+    # histórico nunca "empatava" com essas linhas e repetia a mesma página para sempre.
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text(
+        "UPDATE history SET watched_at = strftime('%Y-%m-%d %H:%M:%f000', watched_at) "
+        "WHERE watched_at IS NOT NULL AND watched_at NOT LIKE '____-__-__ __:__:__.______'"
+    ))
+
+
+# (versão, descrição, função). Nunca altere uma migração já publicada: crie outra.
+MIGRATIONS = [
+    (1, "esquema inicial (antigo create_all)", _baseline),
+    (2, "índices únicos por usuário e history.watched_at", _user_list_indexes),
+    (3, "espelho local do AniList (media, títulos, gêneros, estúdios, relações)", _media_mirror),
+    (4, "apelidos de busca (nome -> id) e media.relations_fetched_at", _media_aliases),
+    (5, "history.watched_at no formato de data do SQLAlchemy (com microssegundos)", _history_watched_at_format),
+]
+
+
+# --- AUXILIARES PARA AS MIGRAÇÕES ---
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def has_index(conn: Connection, table: str, index: str) -> bool:
+    return any(i["name"] == index for i in inspect(conn).get_indexes(table))
+
+
+# --- EXECUÇÃO ---
+def current_version(conn: Connection) -> int:
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def run_migrations(engine: Engine):
+    with engine.begin() as conn:
+        version = current_version(conn)
+        for number, description, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info("Aplicando migração", extra={"version": number, "description": description})
+            migrate(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": number})
+
+
+if __name__ == "__main__":
+    from database import engine
+    from services.log import setup_logging
+    setup_logging()
+    run_migrations(engine)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -21,6 +22,10 @@ class User(Base):
 
 class Favorite(Base): # Vitrine do Perfil
     __tablename__ = "favorites"
+    __table_args__ = (
+        # Um anime por usuário; também atende as buscas por (user_id, anime_id)
+        Index("ux_favorites_user_anime", "user_id", "anime_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     
@@ -33,6 +38,9 @@ class Favorite(Base): # Vitrine do Perfil
 
 class WatchList(Base): # Minha Lista (Assistir Mais Tarde) <--- NOVO
     __tablename__ = "watchlist"
+    __table_args__ = (
+        Index("ux_watchlist_user_anime", "user_id", "anime_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     
@@ -45,6 +53,11 @@ class WatchList(Base): # Minha Lista (Assistir Mais Tarde) <--- NOVO
 
 class History(Base):
     __tablename__ = "history"
+    __table_args__ = (
+        Index("ux_history_user_anime", "user_id", "anime_id", unique=True),
+        # "Últimos assistidos" do usuário sem varrer a tabela
+        Index("ix_history_user_watched", "user_id", "watched_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     
@@ -52,5 +65,74 @@ class History(Base):
     title = Column(String)
     cover = Column(String)
     episode = Column(Integer)
+    watched_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    owner = relationship("User", back_populates="history")
\ No newline at end of file
+    owner = relationship("User", back_populates="history")
+
+# --- ESPELHO LOCAL DO ANILIST ---
+# Preenchido com as respostas do AniList que passam pela API e pela importação em lote
+class Media(Base):
+    __tablename__ = "media"
+    id = Column(Integer, primary_key=True)  # mesmo id do AniList
+
+    title_romaji = Column(String)
+    title_english = Column(String)
+    title_native = Column(String)
+    cover_extra_large = Column(String)
+    cover_large = Column(String)
+    cover_medium = Column(String)
+    banner = Column(String)
+    description = Column(Text)
+    average_score = Column(Integer)
+    popularity = Column(Integer, index=True)
+    trending = Column(Integer)
+    episodes = Column(Integer)
+    status = Column(String)
+    format = Column(String)
+    season_year = Column(Integer)
+    start_date = Column(Integer)  # AAAAMMDD, para ordenar por lançamento
+
+    fetched_at = Column(DateTime)         # última vez que veio qualquer dado
+    detail_fetched_at = Column(DateTime)  # última vez que veio o detalhe completo
+    relations_fetched_at = Column(DateTime)  # relações vêm numa consulta separada
+
+    titles = relationship("MediaTitle", cascade="all, delete-orphan")
+    genres = relationship("MediaGenre", cascade="all, delete-orphan")
+    studios = relationship("MediaStudio", cascade="all, delete-orphan")
+    relations = relationship("MediaRelation", cascade="all, delete-orphan")
+
+class MediaTitle(Base): # Todos os nomes (romaji, english, native, sinônimos) para busca
+    __tablename__ = "media_titles"
+    id = Column(Integer, primary_key=True)
+    media_id = Column(Integer, ForeignKey("media.id"), index=True)
+    kind = Column(String)
+    title = Column(String)
+    normalized = Column(String, index=True)  # minúsculo e sem acentos
+
+class MediaGenre(Base):
+    __tablename__ = "media_genres"
+    media_id = Column(Integer, ForeignKey("media.id"), primary_key=True)
+    genre = Column(String, primary_key=True, index=True)
+
+class MediaStudio(Base):
+    __tablename__ = "media_studios"
+    media_id = Column(Integer, ForeignKey("media.id"), primary_key=True)
+    name = Column(String, primary_key=True)
+    is_main = Column(Boolean, default=False)
+
+class MediaRelation(Base):
+    __tablename__ = "media_relations"
+    media_id = Column(Integer, ForeignKey("media.id"), primary_key=True)
+    related_id = Column(Integer, primary_key=True)
+    relation_type = Column(String)
+    # Dados do relacionado ficam aqui mesmo (ele pode não estar na tabela media)
+    title = Column(String)
+    format = Column(String)
+    type = Column(String)
+    cover = Column(String)
+
+class MediaAlias(Base): # Nome buscado (slug) -> id do AniList, aprendido das buscas que não batem com um título
+    __tablename__ = "media_aliases"
+    slug = Column(String, primary_key=True)
+    media_id = Column(Integer, index=True)
+    learned_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
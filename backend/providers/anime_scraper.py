@@ -1,11 +1,28 @@
 import httpx
-from bs4 import BeautifulSoup
-from providers.provider import AnimeProvider
+import logging
+import os
+from providers.provider import AnimeProvider, EpisodeIndex
+from providers import parsers
+from services.http_client import get_scraper_client
+from services.singleflight import SingleFlight, normalize_key
+from providers.stream_cache import stream_cache, MISS
+from services.metrics import track_upstream
 import re
 
+logger = logging.getLogger(__name__)
+
+# Vários usuários pedindo o mesmo episódio ao mesmo tempo disparam um só scrape
+scraper_flight = SingleFlight("scraper")
+
+# CONFIGURAÇÕES
+# Endereço do site (trocado nos benchmarks por um servidor local com as páginas salvas)
+ANIMESONLINE_URL = os.getenv("ANIHUB_ANIMESONLINE_URL", "https://animesonlinecc.to").rstrip("/")
+
 class AnimeOnlineScraper(AnimeProvider):
-    def __init__(self):
-        self.site_url = "https://animesonlinecc.to" 
+    def __init__(self, client: httpx.AsyncClient | None = None):
+        # Cliente HTTP injetável; por padrão usa o pool compartilhado da aplicação
+        self._client = client
+        self.site_url = ANIMESONLINE_URL
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
@@ -18,59 +35,112 @@ class AnimeOnlineScraper(AnimeProvider):
     def base_url(self) -> str:
         return self.site_url
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_scraper_client()
+
     async def search_video(self, anime_title: str, episode: int):
-        print(f"🕵️ [Scraper Original] Buscando: {anime_title}...")
-        
-        async with httpx.AsyncClient(headers=self.headers, follow_redirects=True) as client:
-            try:
-                # --- PASSO 1: BUSCA ---
-                search_query = anime_title.replace(" ", "+")
-                search_res = await client.get(f"{self.site_url}/?s={search_query}")
-                
-                if search_res.status_code != 200:
-                    return None
-
-                soup = BeautifulSoup(search_res.text, 'html.parser')
-                anime_card = soup.select_one('div.poster a')
-                
-                if not anime_card:
-                    return None
-                
-                anime_link = anime_card['href']
-
-                # --- PASSO 2: PÁGINA DO ANIME ---
-                anime_page = await client.get(anime_link)
-                soup_anime = BeautifulSoup(anime_page.text, 'html.parser')
-
-                episode_link = None
-                for link in soup_anime.select('ul.episodios li a'):
-                    text = link.get_text().lower()
-                    if f"episodio {episode}" in text.replace("ó", "o") or f"episódio {episode}" in text:
-                        episode_link = link['href']
-                        break
-                
-                # Fallback para ep 1
-                if not episode_link and episode == 1:
-                    first_ep = soup_anime.select_one('ul.episodios li a')
-                    if first_ep:
-                        episode_link = first_ep['href']
-
-                if not episode_link:
-                    return None
-                
-                # --- PASSO 3: EXTRAIR VÍDEO (IFRAME) ---
-                ep_page = await client.get(episode_link)
-                soup_ep = BeautifulSoup(ep_page.text, 'html.parser')
-
-                iframe = soup_ep.select_one('iframe')
-                
-                if iframe:
-                    video_url = iframe['src']
-                    print(f"🎬 Iframe encontrado: {video_url}")
-                    return video_url
-                
+        key = normalize_key(self.name, anime_title, episode)
+        return await scraper_flight.do(key, lambda: self._scrape_video(anime_title, episode))
+
+    async def _scrape_video(self, anime_title: str, episode: int):
+        title_key = f"{self.name}:{normalize_key(anime_title)[0]}"
+        iframe_key = f"{title_key}#{episode}"
+
+        # Caminho comum: o iframe já foi resolvido antes (inclusive "não existe")
+        cached = await stream_cache.get_async("iframe", iframe_key)
+        if cached is not MISS:
+            return cached
+
+        logger.info("Scraper: buscando", extra={"provider": self.name, "anime": anime_title, "episode": episode})
+        try:
+            video_url = await self._resolve_video(anime_title, title_key, episode)
+        except Exception as e:
+            # Erros de rede não são cacheados, só resultados negativos de verdade
+            logger.warning("Scraper: erro", extra={"provider": self.name, "anime": anime_title, "episode": episode, "error": str(e)})
+            return None
+
+        stream_cache.set("iframe", iframe_key, video_url)
+        return video_url
+
+    async def _resolve_video(self, anime_title: str, title_key: str, episode: int):
+        # Duas tentativas: se um link vindo do cache quebrou (404), invalida e refaz
+        for _ in range(2):
+            # --- PASSO 1: BUSCA ---
+            anime_link = await self._get_anime_link(anime_title, title_key)
+            if not anime_link:
+                return None
+
+            # --- PASSO 2: PÁGINA DO ANIME ---
+            index, from_cache = await self._get_index(anime_link)
+            if index is None:
+                stream_cache.invalidate("anime_link", title_key)
+                continue
+
+            episode_link = index.get(episode)
+            if not episode_link:
+                # Índice em cache pode ser anterior ao lançamento do episódio
+                if from_cache:
+                    stream_cache.invalidate("episodes", anime_link)
+                    continue
                 return None
 
-            except Exception as e:
-                print(f"💥 Erro: {e}")
-                return None
\ No newline at end of file
+            # --- PASSO 3: EXTRAIR VÍDEO (IFRAME) ---
+            with track_upstream(self.name, "episode_page"):
+                ep_page = await self.client.get(episode_link, headers=self.headers)
+            if ep_page.status_code == 404:
+                stream_cache.invalidate("episodes", anime_link)
+                continue
+            ep_page.raise_for_status()
+            video_url = await parsers.parse("iframe", ep_page.text)
+
+            if video_url:
+                logger.info("Scraper: iframe encontrado", extra={"provider": self.name, "url": video_url})
+                return video_url
+
+            return None
+        return None
+
+    async def _get_anime_link(self, anime_title: str, title_key: str):
+        cached = await stream_cache.get_async("anime_link", title_key)
+        if cached is not MISS:
+            return cached
+
+        search_query = anime_title.replace(" ", "+")
+        with track_upstream(self.name, "search"):
+            search_res = await self.client.get(f"{self.site_url}/?s={search_query}", headers=self.headers)
+        search_res.raise_for_status()
+
+        anime_link = await parsers.parse("anime_link", search_res.text)
+
+        stream_cache.set("anime_link", title_key, anime_link)
+        return anime_link
+
+    async def get_episode_index(self, anime_title: str) -> EpisodeIndex | None:
+        title_key = f"{self.name}:{normalize_key(anime_title)[0]}"
+        anime_link = await self._get_anime_link(anime_title, title_key)
+        if not anime_link:
+            return None
+        index, _ = await self._get_index(anime_link)
+        return index
+
+    async def _get_index(self, anime_link: str):
+        """Retorna (EpisodeIndex, veio_do_cache). Índice None = página sumiu (404)."""
+        cached = await stream_cache.get_async("episodes", anime_link)
+        # Entradas antigas (lista crua de links) são tratadas como ausentes
+        if isinstance(cached, dict):
+            return EpisodeIndex.from_dict(cached), True
+
+        with track_upstream(self.name, "anime_page"):
+            anime_page = await self.client.get(anime_link, headers=self.headers)
+        if anime_page.status_code == 404:
+            return None, False
+        anime_page.raise_for_status()
+
+        # A página do anime é lida uma vez só e vira um índice número -> link
+        index = EpisodeIndex()
+        for label, link in await parsers.parse("episodes", anime_page.text):
+            index.add(label, link)
+
+        stream_cache.set("episodes", anime_link, index.to_dict())
+        return index, False
\ No newline at end of file
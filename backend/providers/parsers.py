@@ -0,0 +1,204 @@
+import asyncio
+import html as html_lib
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from services.metrics import parse_duration
+
+# CONFIGURAÇÕES
+# Backend de parsing: "html.parser" (BeautifulSoup puro), "lxml" (BeautifulSoup + lxml),
+# "selectolax" (se instalado) ou "targeted" (extrator próprio que só olha as tags que usamos)
+PARSER_BACKEND = os.getenv("ANIHUB_PARSER_BACKEND", "targeted")
+PARSER_POOL = os.getenv("ANIHUB_PARSER_POOL", "thread")  # "thread" ou "process"
+PARSER_WORKERS = int(os.getenv("ANIHUB_PARSER_WORKERS", "2"))
+# Máximo de páginas esperando parse; acima disso quem chega espera a vez
+PARSER_MAX_PENDING = int(os.getenv("ANIHUB_PARSER_MAX_PENDING", "32"))
+
+
+# --- BACKEND: BEAUTIFULSOUP (html.parser / lxml) ---
+class SoupBackend:
+    def __init__(self, features: str):
+        self.features = features
+
+    def _soup(self, html: str):
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(html, self.features)
+
+    def anime_link(self, html: str) -> str | None:
+        card = self._soup(html).select_one('div.poster a')
+        return card.get('href') if card else None
+
+    def episodes(self, html: str) -> list[tuple[str, str]]:
+        return [(a.get_text(), a['href']) for a in self._soup(html).select('ul.episodios li a') if a.get('href')]
+
+    def iframe(self, html: str) -> str | None:
+        iframe = self._soup(html).select_one('iframe')
+        return iframe.get('src') if iframe else None
+
+
+# --- BACKEND: SELECTOLAX (opcional) ---
+class SelectolaxBackend:
+    def _tree(self, html: str):
+        from selectolax.parser import HTMLParser as LexborParser
+        return LexborParser(html)
+
+    def anime_link(self, html: str) -> str | None:
+        card = self._tree(html).css_first('div.poster a')
+        return card.attributes.get('href') if card else None
+
+    def episodes(self, html: str) -> list[tuple[str, str]]:
+        return [
+            (a.text(), a.attributes['href'])
+            for a in self._tree(html).css('ul.episodios li a') if a.attributes.get('href')
+        ]
+
+    def iframe(self, html: str) -> str | None:
+        iframe = self._tree(html).css_first('iframe')
+        return iframe.attributes.get('src') if iframe else None
+
+
+# --- BACKEND: EXTRATOR DIRECIONADO (só biblioteca padrão) ---
+class _TargetedExtractor(HTMLParser):
+    """
+    Percorre o HTML uma vez guardando só o necessário, sem montar árvore:
+    o primeiro 'div.poster a', os 'ul.episodios li a' e o primeiro 'iframe'.
+    """
+
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self, want: str):
+        super().__init__(convert_charrefs=True)
+        self.want = want
+        self.result = None
+        self.done = False
+        self.episodes: list[tuple[str, str]] = []
+        self._stack: list[tuple[str, set]] = []  # (tag, classes) abertos
+        self._current_href: str | None = None
+        self._current_text: list[str] = []
+
+    def _inside(self, tag: str, css_class: str) -> bool:
+        return any(t == tag and css_class in classes for t, classes in self._stack)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.want == "iframe" and tag == "iframe" and self.result is None:
+            self.result = attrs.get("src")
+            self.done = True
+        elif tag == "a" and self.want == "anime_link" and self.result is None:
+            if self._inside("div", "poster"):
+                self.result = attrs.get("href")
+                self.done = True
+        elif tag == "a" and self.want == "episodes":
+            if self._inside("ul", "episodios") and any(t == "li" for t, _ in self._stack):
+                self._current_href = attrs.get("href")
+                self._current_text = []
+        if tag not in self.VOID_TAGS:
+            self._stack.append((tag, set((attrs.get("class") or "").split())))
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._current_href is not None:
+            self.episodes.append(("".join(self._current_text), self._current_href))
+            self._current_href = None
+        # Fecha até a tag correspondente (HTML real nem sempre é bem formado)
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+        # A lista de episódios acabou: o resto da página não interessa
+        if self.episodes and not self._inside("ul", "episodios"):
+            self.done = True
+
+    def handle_data(self, data):
+        if self._current_href is not None:
+            self._current_text.append(data)
+
+
+class TargetedBackend:
+    # Trecho que aparece antes do que procuramos; o parse começa na tag anterior a ele
+    ANCHORS = {"anime_link": "poster", "episodes": "episodios", "iframe": "<iframe"}
+    CHUNK = 8192
+
+    def _run(self, want: str, html: str) -> _TargetedExtractor:
+        extractor = _TargetedExtractor(want)
+        start = html.find(self.ANCHORS[want])
+        if start == -1:
+            return extractor
+        start = max(html.rfind("<", 0, start), 0)
+        # Alimenta em pedaços e para assim que achar (cabeçalho, sidebar e rodapé são pulados)
+        for i in range(start, len(html), self.CHUNK):
+            extractor.feed(html[i:i + self.CHUNK])
+            if extractor.done:
+                break
+        return extractor
+
+    def anime_link(self, html: str) -> str | None:
+        return self._run("anime_link", html).result
+
+    def episodes(self, html: str) -> list[tuple[str, str]]:
+        # Caminho rápido: a lista é um bloco <ul class="episodios"> sem <ul> aninhado,
+        # então basta recortar o bloco e pegar os <a> com regex
+        match = _EPISODES_UL_RE.search(html)
+        if match:
+            end = html.find("</ul>", match.end())
+            block = html[match.end():end if end != -1 else len(html)]
+            if "<ul" not in block:
+                return [
+                    (html_lib.unescape(_TAG_RE.sub("", text)), html_lib.unescape(href))
+                    for href, text in _LINK_RE.findall(block)
+                ]
+        return self._run("episodes", html).episodes
+
+    def iframe(self, html: str) -> str | None:
+        return self._run("iframe", html).result
+
+
+_EPISODES_UL_RE = re.compile(r"<ul\b[^>]*\bclass\s*=\s*[\"'][^\"']*\bepisodios\b[^\"']*[\"'][^>]*>", re.I)
+_LINK_RE = re.compile(r"<a\b[^>]*?\bhref\s*=\s*[\"']([^\"']+)[\"'][^>]*>(.*?)</a>", re.I | re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+BACKENDS = {
+    "html.parser": SoupBackend("html.parser"),
+    "lxml": SoupBackend("lxml"),
+    "selectolax": SelectolaxBackend(),
+    "targeted": TargetedBackend(),
+}
+
+
+def parse_sync(what: str, html: str, backend: str = PARSER_BACKEND):
+    """Executa a extração no thread atual ('anime_link', 'episodes' ou 'iframe')."""
+    return getattr(BACKENDS[backend], what)(html)
+
+
+# --- EXECUÇÃO FORA DO EVENT LOOP ---
+_executor: Executor | None = None
+_slots: asyncio.Semaphore | None = None
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PARSER_POOL == "process":
+            _executor = ProcessPoolExecutor(max_workers=PARSER_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix="html-parser")
+    return _executor
+
+
+async def parse(what: str, html: str):
+    """Extrai dados da página num pool limitado, sem travar o event loop."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PARSER_MAX_PENDING)
+    with parse_duration.time(what=what):
+        async with _slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_executor(), parse_sync, what, html, PARSER_BACKEND)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
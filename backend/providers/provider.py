@@ -1,10 +1,95 @@
+import asyncio
+import logging
+import os
+import re
+import unicodedata
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Quantos episódios à frente são resolvidos em segundo plano (0 desliga)
+PREFETCH_AHEAD = int(os.getenv("ANIHUB_PREFETCH_AHEAD", "1"))
+
+_SPECIAL_RE = re.compile(r"\b(ova|oad|ona|especial|special|filme|movie)\b\s*(\d+)?")
+_EPISODE_RE = re.compile(r"\b(?:episodio|ep)\.?\s*(\d+)")
+_ONLY_NUMBER_RE = re.compile(r"^\s*(\d+)\s*$")
+
+
+def parse_episode_label(text: str) -> tuple[str, int] | None:
+    """
+    Interpreta o texto de um link de episódio.
+    Retorna ("episode", N), (tipo_especial, N) ou None se não reconhecer.
+    Ex: "Episódio 12" -> ("episode", 12); "OVA 2" -> ("ova", 2);
+        "Special A Episódio 3" -> ("episode", 3)
+    """
+    # Remove acentos: "Episódio" -> "episodio"
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+    # Número de episódio primeiro: "Episódio 5 - Especial de Natal" é o episódio 5
+    # (o antigo scan por "episodio N" também achava esses)
+    match = _EPISODE_RE.search(text) or _ONLY_NUMBER_RE.match(text)
+    if match:
+        return "episode", int(match.group(1))
+
+    special = _SPECIAL_RE.search(text)
+    if special:
+        return special.group(1), int(special.group(2) or 1)
+    return None
+
+
+@dataclass
+class EpisodeIndex:
+    """Índice de episódios de um anime: número -> link da página do episódio."""
+    episodes: dict[int, str] = field(default_factory=dict)
+    specials: dict[str, str] = field(default_factory=dict)  # "ova 1" -> link
+    first: str | None = None  # primeiro link da lista (fallback do ep 1, ex: filmes)
+
+    def get(self, episode: int) -> str | None:
+        link = self.episodes.get(episode)
+        if link is None and episode == 1:
+            return self.first
+        return link
+
+    def add(self, label: str, link: str):
+        if self.first is None:
+            self.first = link
+        parsed = parse_episode_label(label)
+        if parsed is None:
+            return
+        kind, number = parsed
+        # Mantém o primeiro link de cada número (mesmo comportamento do scan linear)
+        if kind == "episode":
+            self.episodes.setdefault(number, link)
+        else:
+            self.specials.setdefault(f"{kind} {number}", link)
+
+    def to_dict(self) -> dict:
+        # Chaves de JSON são strings
+        return {
+            "episodes": {str(k): v for k, v in self.episodes.items()},
+            "specials": self.specials,
+            "first": self.first,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EpisodeIndex":
+        return cls(
+            episodes={int(k): v for k, v in data.get("episodes", {}).items()},
+            specials=data.get("specials", {}),
+            first=data.get("first"),
+        )
+
 
 class AnimeProvider(ABC):
     """
     Classe abstrata que define como um provedor de vídeo deve se comportar.
     """
-    
+
+    # Referências das tarefas de prefetch (senão o asyncio pode descartá-las)
+    _background_tasks: set = set()
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -22,4 +107,31 @@ class AnimeProvider(ABC):
         """
         Deve retornar o link do vídeo (mp4/m3u8) para o player.
         """
-        pass
\ No newline at end of file
+        pass
+
+    async def get_episode_index(self, anime_title: str) -> EpisodeIndex | None:
+        """
+        Opcional: índice de episódios do anime no site.
+        Provedores que implementam ganham o prefetch do próximo episódio.
+        """
+        return None
+
+    def schedule_prefetch(self, anime_title: str, episode: int, ahead: int = PREFETCH_AHEAD):
+        """Resolve em segundo plano os próximos episódios para o "próximo" ser instantâneo."""
+        if ahead <= 0:
+            return
+        task = asyncio.create_task(self._prefetch(anime_title, episode, ahead))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _prefetch(self, anime_title: str, episode: int, ahead: int):
+        try:
+            index = await self.get_episode_index(anime_title)
+            if index is None:
+                return
+            for next_episode in range(episode + 1, episode + 1 + ahead):
+                # Só pede episódios que existem, para não encher o cache de negativos
+                if next_episode in index.episodes:
+                    await self.search_video(anime_title, next_episode)
+        except Exception as e:
+            logger.warning("Prefetch falhou", extra={"provider": self.name, "anime": anime_title, "episode": episode + 1, "error": str(e)})
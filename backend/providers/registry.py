@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+from providers.provider import AnimeProvider
+from services.metrics import upstream_duration
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURAÇÕES
+# Tempo que esperamos o provedor atual antes de disparar o próximo em paralelo
+HEDGE_DELAY = float(os.getenv("ANIHUB_PROVIDER_HEDGE_DELAY", "1.5"))
+# Peso das medições novas na média móvel de latência
+LATENCY_ALPHA = 0.2
+
+
+class ProviderStats:
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.latency: float | None = None  # média móvel (segundos) das respostas
+
+    @property
+    def success_rate(self) -> float:
+        total = self.successes + self.failures
+        # Provedor sem histórico começa otimista para ser testado
+        return self.successes / total if total else 1.0
+
+    def record(self, ok: bool, elapsed: float):
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += LATENCY_ALPHA * (elapsed - self.latency)
+
+    def expected_cost(self, default_latency: float) -> float:
+        # Tempo esperado até um link válido: latência / chance de sucesso
+        latency = self.latency if self.latency is not None else default_latency
+        return latency / max(self.success_rate, 0.05)
+
+
+class ProviderRegistry:
+    """
+    Corrida entre provedores (hedged requests): começa pelo historicamente
+    mais rápido, dispara o próximo se o orçamento de latência estourar ou se
+    o atual falhar, devolve o primeiro link válido e cancela o resto.
+    """
+
+    def __init__(self, providers: list[AnimeProvider] | None = None, hedge_delay: float = HEDGE_DELAY):
+        self.hedge_delay = hedge_delay
+        self.providers: list[AnimeProvider] = []
+        self.stats: dict[str, ProviderStats] = {}
+        for provider in providers or []:
+            self.register(provider)
+
+    def register(self, provider: AnimeProvider):
+        self.providers.append(provider)
+        self.stats[provider.name] = ProviderStats()
+
+    def ordered(self) -> list[AnimeProvider]:
+        # sorted é estável: em empate vale a ordem de registro
+        return sorted(self.providers, key=lambda p: self.stats[p.name].expected_cost(self.hedge_delay))
+
+    async def search_video(self, anime_title: str, episode: int) -> tuple[str | None, AnimeProvider | None]:
+        """Retorna (link, provedor que respondeu) ou (None, None)."""
+        queue = self.ordered()
+        pending: dict[asyncio.Task, AnimeProvider] = {}
+
+        def launch_next():
+            provider = queue.pop(0)
+            task = asyncio.create_task(self._timed_search(provider, anime_title, episode))
+            pending[task] = provider
+
+        if queue:
+            launch_next()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Orçamento de latência estourou: dispara o próximo em paralelo
+                    launch_next()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    video_url = task.result()
+                    if video_url:
+                        return video_url, provider
+                    # Falhou: não espera o orçamento para tentar o próximo
+                    if queue:
+                        launch_next()
+            return None, None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed_search(self, provider: AnimeProvider, anime_title: str, episode: int) -> str | None:
+        start = time.monotonic()
+        try:
+            video_url = await provider.search_video(anime_title, episode)
+        except asyncio.CancelledError:
+            # Perdedor cancelado não conta como falha
+            raise
+        except Exception as e:
+            logger.warning("Provedor falhou", extra={"provider": provider.name, "anime": anime_title, "episode": episode, "error": str(e)})
+            video_url = None
+        elapsed = time.monotonic() - start
+        self.stats[provider.name].record(bool(video_url), elapsed)
+        upstream_duration.observe(elapsed, upstream=provider.name, operation="search_video")
+        return video_url
+
+    def schedule_prefetch(self, anime_title: str, episode: int):
+        """Resolve em segundo plano o episódio seguinte no provedor mais bem colocado."""
+        queue = self.ordered()
+        if queue:
+            queue[0].schedule_prefetch(anime_title, episode)
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {
+                "provider": p.name,
+                "successes": self.stats[p.name].successes,
+                "failures": self.stats[p.name].failures,
+                "success_rate": round(self.stats[p.name].success_rate, 3),
+                "latency_ms": round(self.stats[p.name].latency * 1000) if self.stats[p.name].latency is not None else None,
+            }
+            for p in self.ordered()
+        ]
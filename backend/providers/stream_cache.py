@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURAÇÕES
+# Fica ao lado do anihub.db, mas em arquivo próprio para não disputar lock com as escritas dos usuários
+STREAM_CACHE_PATH = os.getenv("ANIHUB_STREAM_CACHE_PATH", "./stream_cache.db")
+STREAM_CACHE_LRU_SIZE = int(os.getenv("ANIHUB_STREAM_CACHE_LRU_SIZE", "2048"))
+# Gravações vão para o disco em lote (uma transação) a cada intervalo ou quando acumulam demais
+STREAM_CACHE_FLUSH_INTERVAL = float(os.getenv("ANIHUB_STREAM_CACHE_FLUSH_INTERVAL", "1"))
+STREAM_CACHE_MAX_PENDING = int(os.getenv("ANIHUB_STREAM_CACHE_MAX_PENDING", "256"))
+
+# TTL (segundos) de cada tipo de entrada
+TTLS = {
+    "anime_link": 7 * 24 * 3600,   # link da página do anime no site
+    "episodes": 6 * 3600,          # lista de episódios (muda quando sai episódio novo)
+    "iframe": 3 * 24 * 3600,       # URL final do player
+}
+NEGATIVE_TTL = 30 * 60             # "não encontrado" também fica guardado, por menos tempo
+
+MISS = object()
+_DELETE = object()  # invalidação pendente
+
+
+class StreamCache:
+    """
+    Cache persistente (SQLite) dos passos do scraper, com um LRU em memória na frente.
+    Valor None é um resultado negativo ("não existe") e também é cacheado.
+
+    Nada de I/O no event loop: get_async só vai ao disco (em thread) quando o LRU
+    não tem a chave, e set/invalidate apenas enfileiram a alteração, gravada em
+    lote pelo flush periódico (iniciado no lifespan do main.py).
+    """
+
+    def __init__(self, path: str = STREAM_CACHE_PATH, lru_size: int = STREAM_CACHE_LRU_SIZE,
+                 interval: float = STREAM_CACHE_FLUSH_INTERVAL, max_pending: int = STREAM_CACHE_MAX_PENDING):
+        self.path = path
+        self.lru_size = lru_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lru: OrderedDict[tuple[str, str], tuple[Any, float]] = OrderedDict()
+        # (kind, key) -> (valor em JSON, expira_em) ou _DELETE, até o próximo flush
+        self._pending: dict[tuple[str, str], Any] = {}
+        self._lock = threading.Lock()      # LRU e pendentes
+        self._db_lock = threading.Lock()   # a conexão SQLite (leituras e flush)
+        self._conn: sqlite3.Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Contadores para diagnóstico (/metrics)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL: leituras não esperam o flush; com WAL, synchronous=NORMAL ainda é seguro contra corrupção
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stream_cache ("
+                " kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (kind, key))"
+            )
+            self._conn.execute("DELETE FROM stream_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+        return self._conn
+
+    # --- LEITURA ---
+    def get(self, kind: str, key: str) -> Any:
+        """Retorna o valor guardado (pode ser None = negativo) ou MISS. Pode ir ao disco: fora do event loop."""
+        found, value = self._from_memory(kind, key)
+        return value if found else self._from_disk(kind, key)
+
+    async def get_async(self, kind: str, key: str) -> Any:
+        found, value = self._from_memory(kind, key)
+        if found:
+            return value
+        return await asyncio.to_thread(self._from_disk, kind, key)
+
+    def _from_memory(self, kind: str, key: str) -> tuple[bool, Any]:
+        """(True, valor/MISS) se a memória já responde; (False, None) se precisa olhar o disco."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get((kind, key))
+            if entry is not None:
+                if entry[1] > now:
+                    self._lru.move_to_end((kind, key))
+                    self.memory_hits += 1
+                    return True, entry[0]
+                del self._lru[(kind, key)]
+
+            pending = self._pending.get((kind, key))
+            if pending is _DELETE:
+                self.misses += 1
+                return True, MISS
+            if pending is not None and pending[1] > now:
+                self.memory_hits += 1
+                return True, json.loads(pending[0]) if pending[0] is not None else None
+        return False, None
+
+    def _from_disk(self, kind: str, key: str) -> Any:
+        with self._db_lock:
+            row = self._db().execute(
+                "SELECT value, expires_at FROM stream_cache WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        with self._lock:
+            if row is None or row[1] <= time.time():
+                self.misses += 1
+                return MISS
+            self.disk_hits += 1
+            value = json.loads(row[0]) if row[0] is not None else None
+            # Alteração enfileirada durante a leitura vale mais que o disco
+            if (kind, key) not in self._pending:
+                self._remember(kind, key, value, row[1])
+            return value
+
+    # --- ESCRITA (enfileirada) ---
+    def set(self, kind: str, key: str, value: Any):
+        ttl = TTLS[kind] if value is not None else NEGATIVE_TTL
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._pending[(kind, key)] = (json.dumps(value) if value is not None else None, expires_at)
+            self._remember(kind, key, value, expires_at)
+        self._after_write()
+
+    def invalidate(self, kind: str, key: str):
+        with self._lock:
+            self._lru.pop((kind, key), None)
+            self._pending[(kind, key)] = _DELETE
+        self._after_write()
+
+    def _after_write(self):
+        if self._task is None:
+            # Sem o flush periódico (scripts, fora do servidor): grava na hora, como antes
+            self.flush()
+        elif len(self._pending) >= self.max_pending:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def flush(self):
+        """Grava as alterações pendentes numa transação só (síncrono; chamar fora do event loop)."""
+        with self._db_lock:
+            with self._lock:
+                batch = dict(self._pending)
+            if not batch:
+                return
+            upserts = [(kind, key, entry[0], entry[1]) for (kind, key), entry in batch.items() if entry is not _DELETE]
+            deletes = [(kind, key) for (kind, key), entry in batch.items() if entry is _DELETE]
+            conn = self._db()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO stream_cache (kind, key, value, expires_at) VALUES (?, ?, ?, ?)", upserts
+                    )
+                    conn.executemany("DELETE FROM stream_cache WHERE kind = ? AND key = ?", deletes)
+            except sqlite3.Error as e:
+                # Fica tudo pendente para a próxima rodada (o LRU continua servindo)
+                logger.error("Erro gravando cache do scraper", extra={"rows": len(batch), "error": str(e)})
+                return
+            # Só sai da fila o que não mudou enquanto gravava; até aqui a leitura acha tudo nos pendentes
+            with self._lock:
+                for item, entry in batch.items():
+                    if self._pending.get(item) is entry:
+                        del self._pending[item]
+
+    def _remember(self, kind: str, key: str, value: Any, expires_at: float):
+        self._lru[(kind, key)] = (value, expires_at)
+        self._lru.move_to_end((kind, key))
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # --- CICLO DE VIDA (lifespan do main.py) ---
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+
+stream_cache = StreamCache()
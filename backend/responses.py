@@ -0,0 +1,40 @@
+"""
+Serialização JSON rápida para as respostas da API.
+
+Usa orjson quando instalado (pip install orjson) e cai para o json da
+biblioteca padrão quando não está; as duas saídas são equivalentes
+(UTF-8, sem espaços, datas em ISO 8601).
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} não é serializável em JSON")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """Resposta padrão da aplicação (default_response_class no main.py)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def raw_json(body: bytes, **kwargs) -> Response:
+    """Resposta com um JSON já serializado (payloads guardados em cache como bytes)."""
+    return Response(content=body, media_type="application/json", **kwargs)
@@ -1,176 +1,403 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+import asyncio
 import httpx
+import logging
+import os
 from typing import Optional
+from services.http_client import get_anilist_client
+from services.cache import SWRCache
+from services import anilist_service
+from services.anilist_service import graphql, media_batcher
+from services import media_store
+from responses import FastJSONResponse, dumps, raw_json
+from services.title_index import title_index
+from services.image_proxy import FIELD_WIDTHS, proxy_url, rewrite_media_list
 
 router = APIRouter(tags=["Anime"])
-ANILIST_URL = "https://graphql.anilist.co"
+logger = logging.getLogger(__name__)
+
+# --- ROTA 1: HOME (com cache stale-while-revalidate) ---
+# As listas mudam poucas vezes por hora: serve da memória e atualiza em segundo plano
+HOME_CACHE_TTL = float(os.getenv("ANIHUB_HOME_CACHE_TTL", "3600"))
+HOME_CACHE_REFRESH = float(os.getenv("ANIHUB_HOME_CACHE_REFRESH", "300"))
+home_cache = SWRCache(ttl=HOME_CACHE_TTL, refresh_after=HOME_CACHE_REFRESH, max_entries=1, name="home")
+
+HOME_QUERY = """
+query Home {
+  # Adicionei 'trailer { id site }' na consulta de trending
+  trending: Page(perPage: 10) { 
+      media(sort: TRENDING_DESC, type: ANIME) { 
+          id, 
+          title { romaji }, 
+          coverImage { extraLarge, large, medium }, 
+          bannerImage, 
+          description,
+          trailer { id, site } 
+      } 
+  }
+  popular: Page(perPage: 10) { media(sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
+  action: Page(perPage: 10) { media(genre: "Action", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
+  romance: Page(perPage: 10) { media(genre: "Romance", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
+  horror: Page(perPage: 10) { media(genre: "Horror", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
+  sports: Page(perPage: 10) { media(genre: "Sports", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
+}
+"""
+
+async def _fetch_home(client: httpx.AsyncClient):
+    data = (await graphql(HOME_QUERY, client=client)).get('data')
+    # Resposta vazia não pode sobrescrever o último payload bom
+    if not data:
+        raise ValueError("AniList retornou a home vazia")
+    # Aproveita a resposta para alimentar o espelho local
+    await media_store.remember([m for section in data.values() for m in (section or {}).get('media', [])])
+    # Capas e banners pelo proxy de imagens (o espelho guarda as URLs originais)
+    data = {name: {**section, 'media': rewrite_media_list(section.get('media') or [])} if section else section for name, section in data.items()}
+    # Guardada já serializada: a home é o maior payload e o mais pedido
+    return dumps(data)
 
-# --- ROTA 1: HOME (Mantida) ---
 @router.get("/home")
-async def get_home_data():
-    query = """
-    query {
-      # Adicionei 'trailer { id site }' na consulta de trending
-      trending: Page(perPage: 10) { 
-          media(sort: TRENDING_DESC, type: ANIME) { 
-              id, 
-              title { romaji }, 
-              coverImage { extraLarge, large, medium }, 
-              bannerImage, 
-              description,
-              trailer { id, site } 
-          } 
-      }
-      popular: Page(perPage: 10) { media(sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
-      action: Page(perPage: 10) { media(genre: "Action", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
-      romance: Page(perPage: 10) { media(genre: "Romance", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
-      horror: Page(perPage: 10) { media(genre: "Horror", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
-      sports: Page(perPage: 10) { media(genre: "Sports", sort: POPULARITY_DESC, type: ANIME) { id, title { romaji }, coverImage { extraLarge, large, medium } } }
+async def get_home_data(client: httpx.AsyncClient = Depends(get_anilist_client)):
+    try:
+        return raw_json(await home_cache.get("home", lambda: _fetch_home(client)))
+    except Exception:
+        return {}
+
+# --- ROTA 2: CATÁLOGO (cache por combinação de filtros) ---
+CATALOG_CACHE_TTL = float(os.getenv("ANIHUB_CATALOG_CACHE_TTL", "1800"))
+# Listas que mudam mais rápido ficam menos tempo na memória
+CATALOG_TTL_BY_SORT = {"TRENDING_DESC": float(os.getenv("ANIHUB_CATALOG_TRENDING_TTL", "600"))}
+CATALOG_SEARCH_TTL = float(os.getenv("ANIHUB_CATALOG_SEARCH_TTL", "300"))
+CATALOG_CACHE_SIZE = int(os.getenv("ANIHUB_CATALOG_CACHE_SIZE", "512"))
+
+# Valores aceitos pelo AniList (MediaFormat e a lista fixa de gêneros)
+CATALOG_FORMATS = {"TV", "TV_SHORT", "MOVIE", "SPECIAL", "OVA", "ONA", "MUSIC"}
+CATALOG_GENRES = {g.lower(): g for g in (
+    "Action", "Adventure", "Comedy", "Drama", "Ecchi", "Fantasy", "Horror", "Mahou Shoujo", "Mecha", "Music",
+    "Mystery", "Psychological", "Romance", "Sci-Fi", "Slice of Life", "Sports", "Supernatural", "Thriller",
+)}
+
+def _catalog_group(key: tuple) -> str:
+    # Métrica por combinação de filtros, sem a página e sem o texto da busca (que não tem limite)
+    _, sort, genre, search, format = key
+    return f"sort={sort} genre={genre or '-'} format={format or '-'}{' search' if search else ''}"
+
+catalog_cache = SWRCache(ttl=CATALOG_CACHE_TTL, max_entries=CATALOG_CACHE_SIZE, group_by=_catalog_group, name="catalog")
+
+CATALOG_QUERY = """
+query Catalog ($page: Int, $sort: [MediaSort], $genre: String, $search: String, $format: MediaFormat) {
+  Page(page: $page, perPage: 18) {
+    pageInfo {
+      total
+      perPage
+      lastPage
+      currentPage
+      hasNextPage
+    }
+    media(sort: $sort, type: ANIME, genre: $genre, search: $search, format: $format) {
+      id
+      title { romaji }
+      coverImage { extraLarge, large }
+      averageScore
+      genres
+      seasonYear
+      episodes
+      format
+      popularity
     }
-    """
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(ANILIST_URL, json={'query': query})
-            return resp.json().get('data', {})
-        except Exception:
-            return {}
-
-# --- ROTA 2: CATÁLOGO ---
+  }
+}
+"""
+
+def catalog_key(page: int, sort: str, genre: Optional[str], search: Optional[str], format: Optional[str]) -> tuple:
+    """Valida e normaliza os filtros; combinações equivalentes viram a mesma chave."""
+    sort = sort.strip().upper()
+    if sort not in media_store.CATALOG_SORTS:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida: {sort}")
+    if genre and genre != "Todos":
+        if genre.strip().lower() not in CATALOG_GENRES:
+            raise HTTPException(status_code=400, detail=f"Gênero inválido: {genre}")
+        genre = CATALOG_GENRES[genre.strip().lower()]
+    else:
+        genre = None
+    if format and format != "Todos":
+        format = format.strip().upper()
+        if format not in CATALOG_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Formato inválido: {format}")
+    else:
+        format = None
+    search = " ".join(search.split()).lower() if search else None
+    return (max(page, 1), sort, genre, search or None, format)
+
+def _catalog_ttl(key: tuple) -> float:
+    _, sort, _, search, _ = key
+    return CATALOG_SEARCH_TTL if search else CATALOG_TTL_BY_SORT.get(sort, CATALOG_CACHE_TTL)
+
+async def _fetch_catalog(key: tuple, client: httpx.AsyncClient) -> dict:
+    page, sort, genre, search, format = key
+    variables = {'page': page, 'sort': [sort], 'genre': genre, 'search': search, 'format': format}
+    data = await graphql(CATALOG_QUERY, variables, client=client)
+    result = (data.get('data') or {}).get('Page')
+    # Erro do AniList não entra no cache
+    if not result:
+        raise ValueError(f"AniList não retornou o catálogo: {data.get('errors')}")
+    await media_store.remember(result.get('media') or [])
+    return {**result, 'media': rewrite_media_list(result.get('media') or [])}
+
 @router.get("/catalog")
 async def get_catalog(
     page: int = 1,
     sort: str = "POPULARITY_DESC",
     genre: Optional[str] = None,
     search: Optional[str] = None,
-    format: Optional[str] = None # <--- NOVO PARÂMETRO
+    format: Optional[str] = None, # <--- NOVO PARÂMETRO
+    client: httpx.AsyncClient = Depends(get_anilist_client),
 ):
-    args_list = [f"sort: {sort}", "type: ANIME"]
-    if genre and genre != "Todos":
-        args_list.append(f'genre: "{genre}"')
-    if search:
-        args_list.append(f'search: "{search}"')
-        
-    # Filtro de Formato (TV, MOVIE, OVA, etc)
-    if format and format != "Todos":
-        args_list.append(f'format: {format}')
-
-    args_string = ", ".join(args_list)
-
-    query = f"""
-    query ($page: Int) {{
-      Page(page: $page, perPage: 18) {{
-        pageInfo {{
-          total
-          perPage
-          lastPage
-          currentPage
-          hasNextPage
-        }}
-        media({args_string}) {{
-          id
-          title {{ romaji }}
-          coverImage {{ extraLarge, large }}
-          averageScore
-          genres
-          seasonYear
-          episodes
-          format
-        }}
-      }}
-    }}
-    """
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(ANILIST_URL, json={'query': query, 'variables': {'page': page}})
-            return resp.json().get('data', {}).get('Page', {})
-        except Exception as e:
-            print(f"Erro Catalogo: {e}")
-            return {"media": []}
-
-# --- ROTA 3: DETALHES DO ANIME (ATUALIZADA COM RELATIONS/TEMPORADAS) ---
-@router.get("/anime/{anime_name}")
-async def get_anime_info(anime_name: str):
-    query = """
-    query ($search: String) {
-      Media (search: $search, type: ANIME) {
-        id
-        title { romaji }
-        coverImage { extraLarge, large }
-        bannerImage
-        description
-        averageScore
-        episodes
-        status
-        format
-        seasonYear
-        genres
-        studios(isMain: true) {
-            nodes { name }
-        }
-        relations {
-            edges {
-                relationType(version: 2)
-                node {
-                    id
-                    title { romaji }
-                    format
-                    type
-                    coverImage { medium }
-                }
+    key = catalog_key(page, sort, genre, search, format)
+
+    # Com o espelho completo (importação em lote), o catálogo nem passa pelo AniList
+    if media_store.LOCAL_CATALOG:
+        result = await asyncio.to_thread(media_store.search_catalog, *key)
+        return FastJSONResponse({**result, 'media': rewrite_media_list(result['media'])})
+
+    try:
+        result = await catalog_cache.get(key, lambda: _fetch_catalog(key, client), _catalog_ttl(key))
+    except Exception as e:
+        logger.warning("Erro no catálogo", extra={"key": key, "error": str(e)})
+        return {"media": []}
+
+    # Quem abriu a página N costuma ir para a N+1: já deixa ela pronta
+    if result.get('pageInfo', {}).get('hasNextPage'):
+        next_key = (key[0] + 1,) + key[1:]
+        catalog_cache.prefetch(next_key, lambda: _fetch_catalog(next_key, client), _catalog_ttl(next_key))
+    # Devolver a Response direto pula o jsonable_encoder (o dict já é JSON puro)
+    return FastJSONResponse(result)
+
+@router.get("/catalog/stats")
+async def get_catalog_stats():
+    return catalog_cache.stats()
+
+@router.get("/anilist/stats")
+async def get_anilist_stats():
+    # Limite de requisições e estado do circuito do AniList
+    return anilist_service.stats()
+
+# --- ROTA 3: DETALHES DO ANIME (por id, com resolução de nome e relações à parte) ---
+DETAIL_CACHE_TTL = float(os.getenv("ANIHUB_DETAIL_CACHE_TTL", "3600"))
+DETAIL_CACHE_SIZE = int(os.getenv("ANIHUB_DETAIL_CACHE_SIZE", "1024"))
+NAME_CACHE_TTL = float(os.getenv("ANIHUB_NAME_CACHE_TTL", "86400"))
+# Payloads guardados já serializados (bytes): um acerto não passa nem pelo json.dumps
+detail_cache = SWRCache(ttl=DETAIL_CACHE_TTL, max_entries=DETAIL_CACHE_SIZE, name="detail")
+relations_cache = SWRCache(ttl=DETAIL_CACHE_TTL, max_entries=DETAIL_CACHE_SIZE, name="relations")
+# slug do nome -> id do AniList
+name_cache = SWRCache(ttl=NAME_CACHE_TTL, max_entries=4 * DETAIL_CACHE_SIZE, name="names")
+
+# Campos do detalhe e das relações: vão para o lote de buscas por id (media_batcher)
+DETAIL_FIELDS = """
+    id
+    title { romaji english native }
+    synonyms
+    coverImage { extraLarge, large, medium }
+    bannerImage
+    description
+    averageScore
+    popularity
+    episodes
+    status
+    format
+    seasonYear
+    genres
+    studios(isMain: true) {
+        nodes { name }
+    }
+"""
+
+RELATIONS_FIELDS = """
+    id
+    relations {
+        edges {
+            relationType(version: 2)
+            node {
+                id
+                title { romaji }
+                format
+                type
+                coverImage { medium }
             }
         }
-      }
     }
-    """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(ANILIST_URL, json={'query': query, 'variables': {'search': anime_name}})
-            data = response.json()
-            if not data.get('data') or not data['data'].get('Media'):
-                return {"error": "Anime não encontrado"}
-            
-            media = data['data']['Media']
-            
-            # Limpa as relações para mandar só o que importa (Sequel, Prequel, etc)
-            relations = []
-            if media.get('relations'):
-                for edge in media['relations']['edges']:
-                    if edge['node']['type'] == 'ANIME': # Só queremos animes, não mangás
-                        relations.append({
-                            "type": edge['relationType'],
-                            "title": edge['node']['title']['romaji'],
-                            "format": edge['node']['format'],
-                            "cover": edge['node']['coverImage']['medium']
-                        })
-
-            return {
-                "id": media['id'],
-                "title": media['title']['romaji'],
-                "cover": media['coverImage']['extraLarge'],
-                "banner": media['bannerImage'],
-                "description": media['description'],
-                "score": media['averageScore'],
-                "episodes": media['episodes'],
-                "status": media['status'],
-                "year": media['seasonYear'],
-                "genres": media['genres'],
-                "studio": media['studios']['nodes'][0]['name'] if media['studios']['nodes'] else None,
-                "relations": relations
-            }
-        except Exception as e:
-            print(f"Erro Anime Info: {e}")
-            return {"error": "Erro interno"}
+"""
 
-# --- ROTA 4: PESQUISA (Mantida) ---
-@router.get("/search/suggest/{term}")
-async def search_suggest(term: str):
-    query = """
-    query ($search: String) {
-      Page(perPage: 5) { media(search: $search, type: ANIME, sort: POPULARITY_DESC) { title { romaji }, coverImage { medium }, format } }
+DETAIL_QUERY = """
+query Detail ($search: String) {
+  Media (search: $search, type: ANIME) {%s}
+}
+""" % DETAIL_FIELDS
+
+def shape_anime_info(media: dict) -> dict:
+    """Converte o Media do AniList (ou do espelho local) no formato da página do anime."""
+    return {
+        "id": media['id'],
+        "title": media['title']['romaji'],
+        "cover": proxy_url(media['coverImage']['extraLarge'], FIELD_WIDTHS['extraLarge']),
+        "banner": proxy_url(media['bannerImage'], FIELD_WIDTHS['banner']),
+        "description": media['description'],
+        "score": media['averageScore'],
+        "episodes": media['episodes'],
+        "status": media['status'],
+        "year": media['seasonYear'],
+        "genres": media['genres'],
+        "studio": media['studios']['nodes'][0]['name'] if media['studios']['nodes'] else None,
+    }
+
+def shape_relations(relations: dict | None) -> list:
+    # Limpa as relações para mandar só o que importa (Sequel, Prequel, etc)
+    shaped = []
+    for edge in (relations or {}).get('edges', []):
+        if edge['node']['type'] == 'ANIME': # Só queremos animes, não mangás
+            shaped.append({
+                "type": edge['relationType'],
+                "title": edge['node']['title']['romaji'],
+                "format": edge['node']['format'],
+                "cover": proxy_url(edge['node']['coverImage']['medium'], FIELD_WIDTHS['medium'])
+            })
+    return shaped
+
+def _media_or_raise(data: dict) -> dict:
+    media = (data.get('data') or {}).get('Media')
+    if media:
+        return media
+    errors = data.get('errors') or []
+    # 404 do AniList é "não existe"; qualquer outro erro (429, 500...) não pode virar "não encontrado"
+    if errors and not all(e.get('status') == 404 for e in errors):
+        raise RuntimeError(f"AniList: {errors}")
+    raise LookupError("Anime não encontrado")
+
+async def _load_detail(anime_id: int, client: httpx.AsyncClient) -> bytes:
+    # Espelho local primeiro: o AniList só é consultado se não tiver ou estiver velho
+    local = await asyncio.to_thread(media_store.get_by_id, anime_id)
+    if local:
+        return dumps(shape_anime_info(local))
+    try:
+        media = await media_batcher.load(anime_id, DETAIL_FIELDS, client)
+    except Exception:
+        # AniList fora do ar: serve o que tiver no espelho, mesmo velho
+        stale = await asyncio.to_thread(media_store.get_by_id, anime_id, True, True)
+        if stale:
+            return dumps(shape_anime_info(stale))
+        raise
+    if media is None:
+        raise LookupError("Anime não encontrado")
+    await media_store.remember([media], detail=True)
+    return dumps(shape_anime_info(media))
+
+async def _load_relations(anime_id: int, client: httpx.AsyncClient) -> bytes:
+    local = await asyncio.to_thread(media_store.get_relations, anime_id)
+    if local is not None:
+        return dumps(shape_relations(local))
+    try:
+        media = await media_batcher.load(anime_id, RELATIONS_FIELDS, client)
+    except Exception:
+        stale = await asyncio.to_thread(media_store.get_relations, anime_id, True)
+        if stale is not None:
+            return dumps(shape_relations(stale))
+        raise
+    if media is None:
+        raise LookupError("Anime não encontrado")
+    await media_store.remember([media])
+    return dumps(shape_relations(media.get('relations')))
+
+async def _resolve(anime_name: str, client: httpx.AsyncClient) -> int:
+    # Título conhecido ou apelido já aprendido: nem passa pelo AniList
+    anime_id = await asyncio.to_thread(media_store.resolve_id, anime_name)
+    if anime_id is not None:
+        return anime_id
+    # Nome desconhecido: a busca do AniList já traz o detalhe, que entra direto no cache
+    media = _media_or_raise(await graphql(DETAIL_QUERY, {'search': anime_name}, client=client))
+    detail_cache.set(media['id'], dumps(shape_anime_info(media)))
+    await media_store.remember([media], detail=True)
+    await asyncio.to_thread(media_store.learn_alias, anime_name, media['id'])
+    return media['id']
+
+async def _detail_bytes(anime_id: int, client: httpx.AsyncClient) -> bytes:
+    return await detail_cache.get(anime_id, lambda: _load_detail(anime_id, client))
+
+async def _relations_bytes(anime_id: int, client: httpx.AsyncClient) -> bytes:
+    return await relations_cache.get(anime_id, lambda: _load_relations(anime_id, client))
+
+def prefetch_details(anime_ids: list[int], client: httpx.AsyncClient | None = None):
+    """Esquenta o detalhe (e o espelho local) em segundo plano; o lote junta os ids num POST só."""
+    client = client or get_anilist_client()
+    for anime_id in anime_ids:
+        detail_cache.prefetch(anime_id, lambda anime_id=anime_id: _load_detail(anime_id, client))
+
+@router.get("/anime/id/{anime_id}")
+async def get_anime_by_id(anime_id: int, client: httpx.AsyncClient = Depends(get_anilist_client)):
+    try:
+        return raw_json(await _detail_bytes(anime_id, client))
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Anime não encontrado")
+    except Exception as e:
+        logger.warning("Erro no detalhe do anime", extra={"anime_id": anime_id, "error": str(e)})
+        raise HTTPException(status_code=502, detail="AniList indisponível")
+
+@router.get("/anime/id/{anime_id}/relations")
+async def get_anime_relations(anime_id: int, client: httpx.AsyncClient = Depends(get_anilist_client)):
+    try:
+        return raw_json(await _relations_bytes(anime_id, client))
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Anime não encontrado")
+    except Exception as e:
+        logger.warning("Erro nas relações do anime", extra={"anime_id": anime_id, "error": str(e)})
+        raise HTTPException(status_code=502, detail="AniList indisponível")
+
+@router.get("/anime/{anime_name}")
+async def get_anime_info(anime_name: str, relations: bool = True, client: httpx.AsyncClient = Depends(get_anilist_client)):
+    # Formato antigo (detalhe + relações juntos) continua sendo o padrão para clientes antigos.
+    # A página do anime pede ?relations=false e busca /anime/id/{id}/relations depois, fora do caminho crítico.
+    try:
+        anime_id = await name_cache.get(media_store.slugify(anime_name), lambda: _resolve(anime_name, client))
+        if not relations:
+            return raw_json(await _detail_bytes(anime_id, client))
+        detail, related = await asyncio.gather(
+            _detail_bytes(anime_id, client), _relations_bytes(anime_id, client), return_exceptions=True,
+        )
+        if isinstance(detail, BaseException):
+            raise detail
+    except LookupError:
+        return {"error": "Anime não encontrado"}
+    except Exception as e:
+        logger.warning("Erro no detalhe do anime", extra={"anime": anime_name, "error": str(e)})
+        return {"error": "Erro interno"}
+
+    if isinstance(related, BaseException):
+        # Sem as relações a página ainda funciona
+        logger.warning("Erro nas relações do anime", extra={"anime": anime_name, "error": str(related)})
+        related = b"[]"
+    # Junta os dois payloads prontos sem desserializar: {...detalhe...,"relations":[...]}
+    return raw_json(detail[:-1] + b',"relations":' + related + b'}')
+
+# --- ROTA 4: PESQUISA (índice local primeiro) ---
+SUGGEST_QUERY = """
+query Suggest ($search: String) {
+  Page(perPage: 5) {
+    media(search: $search, type: ANIME, sort: POPULARITY_DESC) {
+      id, title { romaji english native }, synonyms, coverImage { medium }, format, popularity
     }
-    """
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(ANILIST_URL, json={'query': query, 'variables': {'search': term}})
-            return resp.json()['data']['Page']['media']
-        except Exception: return []
\ No newline at end of file
+  }
+}
+"""
+
+@router.get("/search/suggest/{term}")
+async def search_suggest(term: str, background_tasks: BackgroundTasks, client: httpx.AsyncClient = Depends(get_anilist_client)):
+    # Índice em memória: responde sem I/O para tudo que já está no espelho
+    local = title_index.suggest(term)
+    if local:
+        return local
+
+    # Termo desconhecido: pergunta ao AniList e guarda os resultados (entram no índice)
+    try:
+        data = await graphql(SUGGEST_QUERY, {'search': term}, client=client)
+        media = data['data']['Page']['media']
+        background_tasks.add_task(media_store.save_many, media)
+        return media
+    except Exception: return []
\ No newline at end of file
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from database import get_db
@@ -17,35 +18,50 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+# Rotas async: o bcrypt espera no pool próprio do auth.py sem ocupar thread nenhuma, e só as
+# consultas ao banco (Session síncrona) passam pelo threadpool, uma de cada vez e rápidas.
+def _find_user(db: Session, username: str) -> models.User | None:
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def _save_user(db: Session, new_user: models.User):
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+
 # --- ROTA 1: CRIAR CONTA (REGISTER) ---
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     # Verifica se usuário já existe
-    user_exists = db.query(models.User).filter(models.User.username == user.username).first()
+    user_exists = await run_in_threadpool(_find_user, db, user.username)
     if user_exists:
         raise HTTPException(status_code=400, detail="Usuário já existe")
     
     # Cria novo usuário com senha criptografada
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     new_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_save_user, db, new_user)
     
     return {"message": "Usuário criado com sucesso!"}
 
 # --- ROTA 2: LOGIN ---
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
     # Busca usuário pelo nome
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await run_in_threadpool(_find_user, db, user.username)
     
     # Verifica se usuário existe e se a senha bate
-    if not db_user or not auth.verify_password(user.password, db_user.hashed_password):
+    if not db_user or not await auth.verify_password_async(user.password, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Usuário ou senha incorretos")
+
+    # Lido antes do commit, que expira o objeto (recarregar seria I/O no event loop)
+    username = db_user.username
+
+    # Custo do bcrypt mudou na configuração: aproveita a senha em mãos e refaz o hash
+    if auth.needs_rehash(db_user.hashed_password):
+        db_user.hashed_password = await auth.get_password_hash_async(user.password)
+        await run_in_threadpool(db.commit)
     
     # Gera o Token
-    access_token = auth.create_access_token(data={"sub": db_user.username})
+    access_token = auth.create_access_token(data={"sub": username})
     
-    return {"access_token": access_token, "token_type": "bearer", "username": db_user.username}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer", "username": username}
@@ -0,0 +1,46 @@
+"""
+Cadastro e login com sessão assíncrona (ANIHUB_ASYNC_DB=1).
+Mesmo contrato de routers/auth.py.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+import models
+import auth
+from routers.auth import UserCreate, UserLogin
+
+router = APIRouter(tags=["Auth"])
+
+
+def _by_username(username: str):
+    return select(models.User).where(models.User.username == username).limit(1)
+
+# --- ROTA 1: CRIAR CONTA (REGISTER) ---
+@router.post("/register")
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if (await db.execute(_by_username(user.username))).scalar() is not None:
+        raise HTTPException(status_code=400, detail="Usuário já existe")
+
+    hashed_password = await auth.get_password_hash_async(user.password)
+    db.add(models.User(username=user.username, email=user.email, hashed_password=hashed_password))
+    await db.commit()
+
+    return {"message": "Usuário criado com sucesso!"}
+
+# --- ROTA 2: LOGIN ---
+@router.post("/login")
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(_by_username(user.username))).scalar()
+
+    if not db_user or not await auth.verify_password_async(user.password, db_user.hashed_password):
+        raise HTTPException(status_code=400, detail="Usuário ou senha incorretos")
+
+    # Custo do bcrypt mudou na configuração: aproveita a senha em mãos e refaz o hash
+    if auth.needs_rehash(db_user.hashed_password):
+        db_user.hashed_password = await auth.get_password_hash_async(user.password)
+        await db.commit()
+
+    access_token = auth.create_access_token(data={"sub": db_user.username})
+
+    return {"access_token": access_token, "token_type": "bearer", "username": db_user.username}
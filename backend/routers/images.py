@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+from typing import Optional
+import asyncio
+import httpx
+import logging
+import os
+from services.image_proxy import image_proxy
+
+router = APIRouter(tags=["Images"])
+logger = logging.getLogger(__name__)
+
+# As URLs do AniList não mudam de conteúdo: o navegador pode guardar por muito tempo
+IMAGE_MAX_AGE = int(os.getenv("ANIHUB_IMAGE_MAX_AGE", str(30 * 24 * 3600)))
+
+@router.get("/img")
+async def get_image(request: Request, url: str, w: Optional[int] = Query(None, ge=1, le=4096)):
+    # WebP só para quem anuncia suporte (a resposta varia com o Accept)
+    webp = "image/webp" in request.headers.get("accept", "")
+    try:
+        path, media_type, etag = await image_proxy.get(url, w, webp)
+        # Despejado pelo limite do disco entre a consulta e o envio: busca/gera de novo uma vez
+        if not await asyncio.to_thread(os.path.exists, path):
+            path, media_type, etag = await image_proxy.get(url, w, webp)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    except (httpx.HTTPError, OSError) as e:
+        logger.warning("Erro no proxy de imagem", extra={"url": url, "error": str(e)})
+        raise HTTPException(status_code=502, detail="Origem da imagem indisponível")
+
+    headers = {"Cache-Control": f"public, max-age={IMAGE_MAX_AGE}, immutable", "ETag": etag, "Vary": "Accept"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    # FileResponse lê o arquivo em pedaços e atende Range (bytes=...) sozinho
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+@router.get("/img/stats")
+async def get_image_stats():
+    return image_proxy.stats()
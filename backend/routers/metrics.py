@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Response
+import auth
+from providers.stream_cache import stream_cache
+from routers.video import provider_registry
+from services import anilist_service, metrics, singleflight
+from services.cache import caches
+from services.history_writer import history_buffer
+from services.image_proxy import image_proxy
+from services.profiler import profiler
+from services.title_index import title_index
+
+router = APIRouter(tags=["Metrics"])
+
+# --- COLETORES: leem os contadores que cada serviço já mantém ---
+def _swr_caches():
+    counters = ("hits", "misses", "stale_served", "refresh_errors", "prefetches")
+    for counter in counters:
+        yield (f"anihub_cache_{counter}_total", "counter", f"SWRCache: {counter}",
+               [({"cache": name}, getattr(cache, counter)) for name, cache in caches.items()])
+    yield ("anihub_cache_entries", "gauge", "SWRCache: entradas em memória",
+           [({"cache": name}, len(cache._entries)) for name, cache in caches.items()])
+    yield ("anihub_cache_loads_in_flight", "gauge", "SWRCache: buscas em andamento",
+           [({"cache": name}, len(cache._inflight)) for name, cache in caches.items()])
+
+def _stream_cache():
+    yield ("anihub_stream_cache_lookups_total", "counter", "Cache do scraper por resultado", [
+        ({"result": "memory_hit"}, stream_cache.memory_hits),
+        ({"result": "disk_hit"}, stream_cache.disk_hits),
+        ({"result": "miss"}, stream_cache.misses),
+    ])
+
+def _singleflight():
+    groups = singleflight.stats()
+    yield ("anihub_singleflight_calls_total", "counter", "Chamadas que saíram de fato",
+           [({"group": name}, g["calls"]) for name, g in groups.items()])
+    yield ("anihub_singleflight_deduplicated_total", "counter", "Chamadas que pegaram carona numa em andamento",
+           [({"group": name}, g["deduplicated"]) for name, g in groups.items()])
+    yield ("anihub_singleflight_in_flight", "gauge", "Chamadas em andamento",
+           [({"group": name}, g["in_flight"]) for name, g in groups.items()])
+
+def _anilist():
+    state = anilist_service.stats()
+    limiter, breaker, batcher = state["limiter"], state["breaker"], state["batcher"]
+    yield ("anihub_anilist_tokens", "gauge", "Fichas disponíveis no limite do AniList", [({}, limiter["tokens"])])
+    yield ("anihub_anilist_waiting", "gauge", "Chamadas esperando ficha", [
+        ({"priority": "interactive"}, limiter["waiting_interactive"]),
+        ({"priority": "background"}, limiter["waiting_background"]),
+    ])
+    yield ("anihub_anilist_limiter_total", "counter", "Decisões do limite de requisições",
+           [({"result": key}, limiter[key]) for key in ("granted", "queued", "rejected", "throttled")])
+    yield ("anihub_anilist_breaker_open", "gauge", "Circuito do AniList (0 fechado, 1 em teste, 2 aberto)",
+           [({}, {"closed": 0, "half_open": 1, "open": 2}[breaker["state"]])])
+    yield ("anihub_anilist_short_circuited_total", "counter", "Chamadas barradas pelo circuito", [({}, breaker["short_circuited"])])
+    yield ("anihub_anilist_batch_loads_total", "counter", "Buscas por id pedidas ao lote", [({}, batcher["loads"])])
+    yield ("anihub_anilist_batches_total", "counter", "Documentos em lote enviados", [({}, batcher["batches"])])
+
+def _title_index():
+    state = title_index.stats()
+    yield ("anihub_title_index_size", "gauge", "Tamanho do índice de títulos",
+           [({"kind": key}, state[key]) for key in ("media", "names", "keys", "trigrams")])
+
+def _providers():
+    snapshot = provider_registry.snapshot()
+    yield ("anihub_provider_results_total", "counter", "Resultados por provedor de vídeo",
+           [({"provider": p["provider"], "result": "success"}, p["successes"]) for p in snapshot]
+           + [({"provider": p["provider"], "result": "failure"}, p["failures"]) for p in snapshot])
+    yield ("anihub_provider_latency_seconds", "gauge", "Média móvel de latência por provedor",
+           [({"provider": p["provider"]}, p["latency_ms"] / 1000 if p["latency_ms"] is not None else None) for p in snapshot])
+
+def _auth():
+    yield ("anihub_hashing_queue_depth", "gauge", "Hashes bcrypt esperando um worker", [({}, auth.hashing_queue_depth())])
+    yield ("anihub_auth_cache_entries", "gauge", "Caches da autenticação", [
+        ({"cache": "token"}, len(auth._token_cache)),
+        ({"cache": "user"}, len(auth._user_cache)),
+    ])
+
+def _history():
+    yield ("anihub_history_buffer_pending", "gauge", "Atualizações de histórico esperando o flush", [({}, history_buffer.pending)])
+    yield ("anihub_history_buffer_rows_total", "counter", "Linhas do buffer de histórico", [
+        ({"stage": "received"}, history_buffer.received),
+        ({"stage": "written"}, history_buffer.written),
+    ])
+
+def _images():
+    state = image_proxy.stats()
+    yield ("anihub_image_proxy_total", "counter", "Proxy de imagens por resultado",
+           [({"result": key}, state[key]) for key in ("original_hits", "variant_hits", "origin_fetches", "resized")])
+    yield ("anihub_image_cache_bytes", "gauge", "Bytes no cache de imagens em disco", [({}, state["disk"]["bytes"])])
+    yield ("anihub_image_cache_evictions_total", "counter", "Arquivos despejados do cache de imagens", [({}, state["disk"]["evictions"])])
+
+def _profiler():
+    state = profiler.stats()
+    yield ("anihub_profiler_dumps_total", "counter", "Flamegraphs gravados de requisições lentas", [({}, state["dumps"])])
+
+for _collector in (_swr_caches, _stream_cache, _singleflight, _anilist, _title_index, _providers, _auth, _history, _images, _profiler):
+    metrics.register_collector(_collector)
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,13 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, delete, or_, select, update
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
+from datetime import datetime, timezone
+import base64
+import hashlib
+import json
+import os
 import database
 import models
 import auth
+from services.history_writer import HISTORY_WRITE_BEHIND, history_buffer, history_upsert
+from responses import dumps, raw_json
+from services.image_proxy import FIELD_WIDTHS, origin_url, proxy_url
+from routers.anime import prefetch_details
+from routers.video import provider_registry
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+# Paginação das listas (o próximo cursor vai no cabeçalho X-Next-Cursor)
+LIST_DEFAULT_LIMIT = 200
+LIST_MAX_LIMIT = 1000
+# Máximo de operações num POST /users/batch
+BATCH_MAX_OPERATIONS = 500
+# "Continuar assistindo": quantos itens por padrão e de quantos o próximo episódio é resolvido antes do clique
+CONTINUE_WATCHING_LIMIT = int(os.getenv("ANIHUB_CONTINUE_WATCHING_LIMIT", "12"))
+CONTINUE_WATCHING_MAX = 50
+CONTINUE_WATCHING_PREFETCH = int(os.getenv("ANIHUB_CONTINUE_WATCHING_PREFETCH", "3"))
+
 class AnimeItem(BaseModel):
     anime_id: int
     title: str
@@ -24,75 +45,311 @@ class ProfileUpdate(BaseModel):
     bio: Optional[str] = None
     avatar_color: Optional[str] = None
 
+class BatchOperation(BaseModel):
+    op: Literal["history", "favorite_add", "favorite_remove", "watchlist_add", "watchlist_remove"]
+    anime_id: int
+    title: Optional[str] = None
+    cover: Optional[str] = None
+    format: str = "TV"
+    episode: Optional[int] = None
+    watched_at: Optional[datetime] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+# Respostas das listas: só as colunas que o frontend usa, sem carregar objetos do ORM
+class AnimeItemOut(BaseModel):
+    id: int
+    anime_id: int
+    title: str
+    cover: str
+    format: Optional[str] = None
+
+class HistoryItemOut(BaseModel):
+    id: int
+    anime_id: int
+    title: str
+    cover: str
+    episode: int
+    watched_at: Optional[datetime] = None
+
+# Respostas das demais rotas: com response_model o FastAPI serializa direto, sem o jsonable_encoder
+class ContinueWatchingOut(BaseModel):
+    id: int
+    anime_id: int
+    title: str
+    cover: str
+    episode: int
+    watched_at: Optional[datetime] = None
+    # Do espelho local do AniList (None enquanto o anime não estiver nele)
+    total_episodes: Optional[int] = None
+    status: Optional[str] = None
+    format: Optional[str] = None
+    next_episode: Optional[int] = None
+    progress: Optional[float] = None
+
+class MessageOut(BaseModel):
+    message: str
+
+class BatchApplied(BaseModel):
+    history: int
+    added: int
+    removed: int
+
+class BatchOut(BaseModel):
+    message: str
+    applied: BatchApplied
+
+class ProfileOut(BaseModel):
+    username: str
+    email: Optional[str] = None
+    bio: Optional[str] = None
+    avatar_color: Optional[str] = None
+
+# --- PAGINAÇÃO POR CURSOR (KEYSET) + ETAG ---
+def _encode_cursor(values: list) -> str:
+    raw = json.dumps(values, default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _list_response(request: Request, rows: list, limit: int, cursor_fields: list[str]) -> Response:
+    """Monta a página (rows vem com limit + 1 linhas para saber se há próxima)."""
+    has_more = len(rows) > limit
+    items = [dict(row._mapping) for row in rows[:limit]]
+    # O banco guarda a URL original da capa; a lista sai em tamanho de miniatura pelo proxy
+    for item in items:
+        item["cover"] = proxy_url(item["cover"], FIELD_WIDTHS["list"])
+    headers = {}
+    if has_more:
+        headers["X-Next-Cursor"] = _encode_cursor([items[-1][field] for field in cursor_fields])
+    return _etag_response(request, dumps(items), headers)
+
+def _etag_response(request: Request, body: bytes, headers: dict | None = None) -> Response:
+    headers = {"ETag": f'"{hashlib.sha1(body).hexdigest()}"', "Cache-Control": "private, no-cache", **(headers or {})}
+    # Lista não mudou desde a última vez: não manda o corpo de novo
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return raw_json(body, headers=headers)
+
+# --- CONSULTAS (montadas aqui e executadas pela versão síncrona ou pela async em users_async.py) ---
+def list_items_query(model, user_id: int, limit: int, cursor: Optional[str]):
+    query = select(model.id, model.anime_id, model.title, model.cover, model.format).where(model.user_id == user_id)
+    if cursor:
+        (last_id,) = _decode_cursor(cursor, 1)
+        query = query.where(model.id > last_id)
+    return query.order_by(model.id).limit(limit + 1)
+
+def history_query(user_id: int, limit: int, cursor: Optional[str]):
+    h = models.History
+    query = select(h.id, h.anime_id, h.title, h.cover, h.episode, h.watched_at).where(h.user_id == user_id)
+    if cursor:
+        # Mais recentes primeiro: continua a partir de (watched_at, id) da última linha
+        last_watched, last_id = _decode_cursor(cursor, 2)
+        try:
+            last_watched = datetime.fromisoformat(last_watched)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        query = query.where(or_(h.watched_at < last_watched, and_(h.watched_at == last_watched, h.id < last_id)))
+    return query.order_by(h.watched_at.desc(), h.id.desc()).limit(limit + 1)
+
+def continue_watching_query(user_id: int, limit: int):
+    """Histórico mais recente com o total de episódios e o status do espelho local, numa consulta só."""
+    h, m = models.History, models.Media
+    return (
+        select(h.id, h.anime_id, h.title, h.cover, h.episode, h.watched_at,
+               m.episodes.label("total_episodes"), m.status, m.format)
+        .outerjoin(m, m.id == h.anime_id)
+        # Fora quem já viu o último episódio de um anime encerrado (sem o anime no espelho, fica)
+        .where(h.user_id == user_id, or_(m.status.is_(None), m.status != "FINISHED", m.episodes.is_(None), h.episode < m.episodes))
+        .order_by(h.watched_at.desc(), h.id.desc())
+        .limit(limit)
+    )
+
+def continue_watching_items(rows: list) -> list[dict]:
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        total = item["total_episodes"]
+        # Sem o total (anime em lançamento ou fora do espelho) o próximo é sempre um palpite
+        item["next_episode"] = item["episode"] + 1 if total is None or item["episode"] < total else None
+        item["progress"] = round(min(item["episode"] / total, 1.0), 3) if total else None
+        item["cover"] = proxy_url(item["cover"], FIELD_WIDTHS["list"])
+        items.append(item)
+    return items
+
+async def warm_continue_watching(items: list[dict]):
+    """
+    Depois da resposta: resolve o stream do próximo episódio dos primeiros itens
+    (o clique mais provável) e traz do AniList o que faltar no espelho, para a
+    próxima visita já ter total de episódios e status.
+    """
+    for item in [item for item in items if item["next_episode"]][:CONTINUE_WATCHING_PREFETCH]:
+        provider_registry.schedule_prefetch(item["title"], item["episode"])
+    # Status vem sempre do AniList: sem ele, o anime não está no espelho
+    missing = [item["anime_id"] for item in items if item["status"] is None]
+    if missing:
+        prefetch_details(missing)
+
+def add_item_statement(model, user_id: int, item: AnimeItem):
+    # Uma instrução só: o índice único resolve a corrida de cliques duplicados
+    return database.upsert(model, {"user_id": user_id, "anime_id": item.anime_id, "title": item.title, "cover": origin_url(item.cover), "format": item.format}, ["user_id", "anime_id"])
+
+def remove_item_statement(model, user_id: int, anime_id: int):
+    return delete(model).where(model.user_id == user_id, model.anime_id == anime_id)
+
+def history_values(user_id: int, item: HistoryItem) -> dict:
+    return {"user_id": user_id, "anime_id": item.anime_id, "title": item.title, "cover": origin_url(item.cover), "episode": item.episode, "watched_at": datetime.utcnow()}
+
+def client_watched_at(value: Optional[datetime]) -> datetime:
+    """
+    Horário vindo do cliente (lote offline) em UTC sem fuso, como o resto da tabela,
+    e nunca no futuro: com o upsert "só se for mais novo", um relógio adiantado
+    travaria a linha contra todas as atualizações seguintes.
+    """
+    now = datetime.utcnow()
+    if value is None:
+        return now
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(value, now)
+
+def plan_batch(batch: BatchRequest, user_id: int) -> tuple[dict, list]:
+    """Valida o lote e devolve (contadores, [(contador ou None, instrução)])."""
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {BATCH_MAX_OPERATIONS} operações por lote")
+
+    history_rows = []
+    # Para favoritos/lista vale a última operação de cada anime (adicionar ou remover)
+    final_state = {"favorite": {}, "watchlist": {}}
+    for op in batch.operations:
+        if op.op == "history":
+            if op.title is None or op.cover is None or op.episode is None:
+                raise HTTPException(status_code=422, detail="history exige title, cover e episode")
+            history_rows.append({"user_id": user_id, "anime_id": op.anime_id, "title": op.title, "cover": origin_url(op.cover), "episode": op.episode, "watched_at": client_watched_at(op.watched_at)})
+        else:
+            target, action = op.op.split("_")
+            if action == "add" and (op.title is None or op.cover is None):
+                raise HTTPException(status_code=422, detail=f"{op.op} exige title e cover")
+            final_state[target][op.anime_id] = (action, op)
+
+    applied = {"history": len(history_rows), "added": 0, "removed": 0}
+    statements = []
+    if history_rows:
+        statements.append((None, history_upsert(history_rows)))
+    for target, model in (("favorite", models.Favorite), ("watchlist", models.WatchList)):
+        adds = [{"user_id": user_id, "anime_id": op.anime_id, "title": op.title, "cover": origin_url(op.cover), "format": op.format} for action, op in final_state[target].values() if action == "add"]
+        removes = [anime_id for anime_id, (action, _) in final_state[target].items() if action == "remove"]
+        if adds:
+            statements.append(("added", database.upsert(model, adds, ["user_id", "anime_id"])))
+        if removes:
+            statements.append(("removed", delete(model).where(model.user_id == user_id, model.anime_id.in_(removes))))
+    return applied, statements
+
+def profile_changes(data: ProfileUpdate) -> dict:
+    changes = {}
+    if data.bio: changes["bio"] = data.bio
+    if data.avatar_color: changes["avatar_color"] = data.avatar_color
+    return changes
+
+def profile_out(current_user: auth.CurrentUser) -> dict:
+    return {"username": current_user.username, "email": current_user.email, "bio": current_user.bio, "avatar_color": current_user.avatar_color}
+
 # --- FAVORITOS (VITRINE) ---
-@router.post("/favorites")
-def add_favorite(item: AnimeItem, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    exists = db.query(models.Favorite).filter(models.Favorite.user_id == current_user.id, models.Favorite.anime_id == item.anime_id).first()
-    if exists: return {"message": "Já existe"}
-    new_fav = models.Favorite(user_id=current_user.id, anime_id=item.anime_id, title=item.title, cover=item.cover, format=item.format)
-    db.add(new_fav)
+@router.post("/favorites", response_model=MessageOut)
+def add_favorite(item: AnimeItem, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    result = db.execute(add_item_statement(models.Favorite, current_user.id, item))
     db.commit()
+    if result.rowcount == 0: return {"message": "Já existe"}
     return {"message": "Adicionado aos favoritos"}
 
-@router.delete("/favorites/{anime_id}")
-def remove_favorite(anime_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    fav = db.query(models.Favorite).filter(models.Favorite.user_id == current_user.id, models.Favorite.anime_id == anime_id).first()
-    if fav:
-        db.delete(fav)
-        db.commit()
+@router.delete("/favorites/{anime_id}", response_model=MessageOut)
+def remove_favorite(anime_id: int, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    db.execute(remove_item_statement(models.Favorite, current_user.id, anime_id))
+    db.commit()
     return {"message": "Removido"}
 
-@router.get("/me/favorites")
-def get_my_favorites(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.Favorite).filter(models.Favorite.user_id == current_user.id).all()
+@router.get("/me/favorites", response_model=List[AnimeItemOut])
+def get_my_favorites(request: Request, limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT), cursor: Optional[str] = None, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    rows = db.execute(list_items_query(models.Favorite, current_user.id, limit, cursor)).all()
+    return _list_response(request, rows, limit, ["id"])
 
 # --- MINHA LISTA (WATCHLIST) --- NOVO!
-@router.post("/watchlist")
-def add_watchlist(item: AnimeItem, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    exists = db.query(models.WatchList).filter(models.WatchList.user_id == current_user.id, models.WatchList.anime_id == item.anime_id).first()
-    if exists: return {"message": "Já existe na lista"}
-    new_item = models.WatchList(user_id=current_user.id, anime_id=item.anime_id, title=item.title, cover=item.cover, format=item.format)
-    db.add(new_item)
+@router.post("/watchlist", response_model=MessageOut)
+def add_watchlist(item: AnimeItem, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    result = db.execute(add_item_statement(models.WatchList, current_user.id, item))
     db.commit()
+    if result.rowcount == 0: return {"message": "Já existe na lista"}
     return {"message": "Adicionado à lista"}
 
-@router.delete("/watchlist/{anime_id}")
-def remove_watchlist(anime_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    item = db.query(models.WatchList).filter(models.WatchList.user_id == current_user.id, models.WatchList.anime_id == anime_id).first()
-    if item:
-        db.delete(item)
-        db.commit()
+@router.delete("/watchlist/{anime_id}", response_model=MessageOut)
+def remove_watchlist(anime_id: int, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    db.execute(remove_item_statement(models.WatchList, current_user.id, anime_id))
+    db.commit()
     return {"message": "Removido da lista"}
 
-@router.get("/me/watchlist")
-def get_my_watchlist(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.WatchList).filter(models.WatchList.user_id == current_user.id).all()
+@router.get("/me/watchlist", response_model=List[AnimeItemOut])
+def get_my_watchlist(request: Request, limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT), cursor: Optional[str] = None, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    rows = db.execute(list_items_query(models.WatchList, current_user.id, limit, cursor)).all()
+    return _list_response(request, rows, limit, ["id"])
 
 # --- HISTÓRICO & PERFIL ---
-@router.post("/history")
-def update_history(item: HistoryItem, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    history = db.query(models.History).filter(models.History.user_id == current_user.id, models.History.anime_id == item.anime_id).first()
-    if history:
-        history.episode = item.episode
-        history.title = item.title
-        history.cover = item.cover
+@router.post("/history", response_model=MessageOut)
+def update_history(item: HistoryItem, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    values = history_values(current_user.id, item)
+    # Com write-behind, atualizações repetidas do mesmo anime viram uma escrita só no próximo flush
+    if HISTORY_WRITE_BEHIND and history_buffer.running:
+        history_buffer.add(values)
     else:
-        history = models.History(user_id=current_user.id, anime_id=item.anime_id, title=item.title, cover=item.cover, episode=item.episode)
-        db.add(history)
-    db.commit()
+        db.execute(history_upsert([values]))
+        db.commit()
     return {"message": "Histórico atualizado"}
 
-@router.get("/me/history")
-def get_my_history(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.History).filter(models.History.user_id == current_user.id).order_by(models.History.id.desc()).all()
+@router.get("/me/history", response_model=List[HistoryItemOut])
+def get_my_history(request: Request, limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT), cursor: Optional[str] = None, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    # Lê o que o próprio usuário acabou de escrever
+    if history_buffer.has_pending(current_user.id):
+        history_buffer.flush()
+    rows = db.execute(history_query(current_user.id, limit, cursor)).all()
+    return _list_response(request, rows, limit, ["watched_at", "id"])
 
-@router.get("/me")
-def get_my_profile(current_user: models.User = Depends(auth.get_current_user)):
-    return {"username": current_user.username, "email": current_user.email, "bio": current_user.bio, "avatar_color": current_user.avatar_color}
+@router.get("/me/continue-watching", response_model=List[ContinueWatchingOut])
+def get_continue_watching(request: Request, background_tasks: BackgroundTasks, limit: int = Query(CONTINUE_WATCHING_LIMIT, ge=1, le=CONTINUE_WATCHING_MAX), db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    if history_buffer.has_pending(current_user.id):
+        history_buffer.flush()
+    items = continue_watching_items(db.execute(continue_watching_query(current_user.id, limit)).all())
+    background_tasks.add_task(warm_continue_watching, items)
+    return _etag_response(request, dumps(items))
 
-@router.put("/me")
-def update_profile(data: ProfileUpdate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    if data.bio: current_user.bio = data.bio
-    if data.avatar_color: current_user.avatar_color = data.avatar_color
+# --- LOTE: VÁRIAS ALTERAÇÕES NUMA TRANSAÇÃO SÓ ---
+@router.post("/batch", response_model=BatchOut)
+def apply_batch(batch: BatchRequest, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    applied, statements = plan_batch(batch, current_user.id)
+    for counter, statement in statements:
+        result = db.execute(statement)
+        if counter:
+            applied[counter] += result.rowcount
     db.commit()
+    return {"message": "Lote aplicado", "applied": applied}
+
+@router.get("/me", response_model=ProfileOut)
+def get_my_profile(current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    return profile_out(current_user)
+
+@router.put("/me", response_model=MessageOut)
+def update_profile(data: ProfileUpdate, db: Session = Depends(database.get_db), current_user: auth.CurrentUser = Depends(auth.get_current_user)):
+    changes = profile_changes(data)
+    if changes:
+        db.execute(update(models.User).where(models.User.id == current_user.id).values(**changes))
+        db.commit()
+        # O usuário em cache ficou desatualizado
+        auth.invalidate_user(current_user.username)
     return {"message": "Perfil atualizado!"}
\ No newline at end of file
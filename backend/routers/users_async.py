@@ -0,0 +1,116 @@
+"""
+Rotas de usuários com sessão assíncrona (ANIHUB_ASYNC_DB=1).
+
+Mesmos caminhos, modelos e consultas de routers/users.py; só muda a execução:
+as rotas são async e esperam o banco sem ocupar o threadpool do Starlette.
+"""
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import database
+import models
+import auth
+from services.history_writer import HISTORY_WRITE_BEHIND, history_buffer, history_upsert
+from responses import dumps
+from routers.users import (
+    CONTINUE_WATCHING_LIMIT, CONTINUE_WATCHING_MAX, LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT,
+    AnimeItem, AnimeItemOut, BatchOut, BatchRequest, ContinueWatchingOut, HistoryItem, HistoryItemOut, MessageOut,
+    ProfileOut, ProfileUpdate,
+    _etag_response, _list_response, add_item_statement, continue_watching_items, continue_watching_query,
+    history_query, history_values, list_items_query, plan_batch, profile_changes, profile_out, remove_item_statement,
+    warm_continue_watching,
+)
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+
+# --- FAVORITOS (VITRINE) ---
+@router.post("/favorites", response_model=MessageOut)
+async def add_favorite(item: AnimeItem, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    result = await db.execute(add_item_statement(models.Favorite, current_user.id, item))
+    await db.commit()
+    if result.rowcount == 0: return {"message": "Já existe"}
+    return {"message": "Adicionado aos favoritos"}
+
+@router.delete("/favorites/{anime_id}", response_model=MessageOut)
+async def remove_favorite(anime_id: int, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    await db.execute(remove_item_statement(models.Favorite, current_user.id, anime_id))
+    await db.commit()
+    return {"message": "Removido"}
+
+@router.get("/me/favorites", response_model=List[AnimeItemOut])
+async def get_my_favorites(request: Request, limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT), cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    rows = (await db.execute(list_items_query(models.Favorite, current_user.id, limit, cursor))).all()
+    return _list_response(request, rows, limit, ["id"])
+
+# --- MINHA LISTA (WATCHLIST) ---
+@router.post("/watchlist", response_model=MessageOut)
+async def add_watchlist(item: AnimeItem, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    result = await db.execute(add_item_statement(models.WatchList, current_user.id, item))
+    await db.commit()
+    if result.rowcount == 0: return {"message": "Já existe na lista"}
+    return {"message": "Adicionado à lista"}
+
+@router.delete("/watchlist/{anime_id}", response_model=MessageOut)
+async def remove_watchlist(anime_id: int, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    await db.execute(remove_item_statement(models.WatchList, current_user.id, anime_id))
+    await db.commit()
+    return {"message": "Removido da lista"}
+
+@router.get("/me/watchlist", response_model=List[AnimeItemOut])
+async def get_my_watchlist(request: Request, limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT), cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    rows = (await db.execute(list_items_query(models.WatchList, current_user.id, limit, cursor))).all()
+    return _list_response(request, rows, limit, ["id"])
+
+# --- HISTÓRICO & PERFIL ---
+@router.post("/history", response_model=MessageOut)
+async def update_history(item: HistoryItem, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    values = history_values(current_user.id, item)
+    if HISTORY_WRITE_BEHIND and history_buffer.running:
+        history_buffer.add(values)
+    else:
+        await db.execute(history_upsert([values]))
+        await db.commit()
+    return {"message": "Histórico atualizado"}
+
+@router.get("/me/history", response_model=List[HistoryItemOut])
+async def get_my_history(request: Request, limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT), cursor: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    # O flush do buffer é síncrono (engine de sempre): roda numa thread para não travar o loop
+    if history_buffer.has_pending(current_user.id):
+        await asyncio.to_thread(history_buffer.flush)
+    rows = (await db.execute(history_query(current_user.id, limit, cursor))).all()
+    return _list_response(request, rows, limit, ["watched_at", "id"])
+
+@router.get("/me/continue-watching", response_model=List[ContinueWatchingOut])
+async def get_continue_watching(request: Request, background_tasks: BackgroundTasks, limit: int = Query(CONTINUE_WATCHING_LIMIT, ge=1, le=CONTINUE_WATCHING_MAX), db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    if history_buffer.has_pending(current_user.id):
+        await asyncio.to_thread(history_buffer.flush)
+    items = continue_watching_items((await db.execute(continue_watching_query(current_user.id, limit))).all())
+    background_tasks.add_task(warm_continue_watching, items)
+    return _etag_response(request, dumps(items))
+
+# --- LOTE: VÁRIAS ALTERAÇÕES NUMA TRANSAÇÃO SÓ ---
+@router.post("/batch", response_model=BatchOut)
+async def apply_batch(batch: BatchRequest, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    applied, statements = plan_batch(batch, current_user.id)
+    for counter, statement in statements:
+        result = await db.execute(statement)
+        if counter:
+            applied[counter] += result.rowcount
+    await db.commit()
+    return {"message": "Lote aplicado", "applied": applied}
+
+@router.get("/me", response_model=ProfileOut)
+async def get_my_profile(current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    return profile_out(current_user)
+
+@router.put("/me", response_model=MessageOut)
+async def update_profile(data: ProfileUpdate, db: AsyncSession = Depends(database.get_async_db), current_user: auth.CurrentUser = Depends(auth.get_current_user_async)):
+    changes = profile_changes(data)
+    if changes:
+        await db.execute(update(models.User).where(models.User.id == current_user.id).values(**changes))
+        await db.commit()
+        auth.invalidate_user(current_user.username)
+    return {"message": "Perfil atualizado!"}
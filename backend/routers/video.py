@@ -2,19 +2,26 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 # Importando o Scraper que estávamos usando (AnimeOnline - Blogger)
 from providers.anime_scraper import AnimeOnlineScraper
+from providers.registry import ProviderRegistry
 
 # Cria o roteador específico para vídeos
 router = APIRouter(tags=["Video"])
 
-# Instancia o provider
-active_provider = AnimeOnlineScraper()
+# Registro de provedores: novos sites entram aqui e disputam a corrida
+provider_registry = ProviderRegistry([AnimeOnlineScraper()])
 
 class VideoResponse(BaseModel):
     stream_url: str | None
 
 @router.get("/watch/{anime_name}/{episode}")
 async def get_episode_link(anime_name: str, episode: int):
-    video_url = await active_provider.search_video(anime_name, episode)
+    video_url, provider = await provider_registry.search_video(anime_name, episode)
     if not video_url:
         return {"stream_url": None}
-    return {"stream_url": video_url}
\ No newline at end of file
+    # Deixa o próximo episódio pronto (no provedor que respondeu) enquanto o usuário assiste este
+    provider.schedule_prefetch(anime_name, episode)
+    return {"stream_url": video_url}
+
+@router.get("/providers/stats")
+def get_provider_stats():
+    return provider_registry.snapshot()
@@ -1,10 +1,214 @@
+import asyncio
+import os
+import re
+from functools import lru_cache
 import httpx
+from services.http_client import get_anilist_client
+from services.singleflight import SingleFlight, normalize_key
+from services.rate_limit import (
+    BACKGROUND, CircuitBreaker, FlightPriority, RateLimited, TokenBucket, current_priority, join_flight, retry_after_seconds,
+)
+from services import media_store
+from services.metrics import track_upstream, upstream_errors
 
-ANILIST_URL = "https://graphql.anilist.co"
+# CONFIGURAÇÕES
+# A URL pode apontar para um servidor GraphQL falso nos testes/benchmarks
+ANILIST_URL = os.getenv("ANIHUB_ANILIST_URL", "https://graphql.anilist.co")
+# O AniList limita por IP (90/min, às vezes reduzido para 30/min); o valor é por processo
+ANILIST_RATE_PER_MIN = float(os.getenv("ANIHUB_ANILIST_RATE_PER_MIN", "80"))
+ANILIST_BURST = int(os.getenv("ANIHUB_ANILIST_BURST", "10"))
+# Fichas que as atualizações em segundo plano nunca usam (ficam para quem está na tela)
+ANILIST_BACKGROUND_RESERVE = int(os.getenv("ANIHUB_ANILIST_BACKGROUND_RESERVE", "3"))
+# Quanto uma requisição interativa espera por uma ficha antes de desistir (e cair no cache)
+ANILIST_MAX_WAIT = float(os.getenv("ANIHUB_ANILIST_MAX_WAIT", "3"))
+ANILIST_BREAKER_FAILURES = int(os.getenv("ANIHUB_ANILIST_BREAKER_FAILURES", "5"))
+ANILIST_BREAKER_RECOVERY = float(os.getenv("ANIHUB_ANILIST_BREAKER_RECOVERY", "30"))
+# Janela (segundos) em que buscas por id esperam companhia para ir num POST só
+ANILIST_BATCH_WINDOW = float(os.getenv("ANIHUB_ANILIST_BATCH_WINDOW", "0.01"))
+# Aliases por documento (o AniList também limita a complexidade da consulta)
+ANILIST_BATCH_SIZE = int(os.getenv("ANIHUB_ANILIST_BATCH_SIZE", "25"))
+
+# Consultas idênticas em andamento compartilham a mesma requisição
+anilist_flight = SingleFlight("anilist")
+# Limite e circuito compartilhados por todas as rotas do processo
+anilist_limiter = TokenBucket(ANILIST_RATE_PER_MIN, ANILIST_BURST, ANILIST_BACKGROUND_RESERVE, ANILIST_MAX_WAIT)
+anilist_breaker = CircuitBreaker(ANILIST_BREAKER_FAILURES, ANILIST_BREAKER_RECOVERY)
+
+_OPERATION_RE = re.compile(r"^\s*query\s+(\w+)")
+
+@lru_cache(maxsize=256)
+def operation_name(query: str) -> str:
+    # Nome da operação GraphQL ("query Catalog (...)"), usado como rótulo das métricas
+    match = _OPERATION_RE.match(query)
+    return match.group(1) if match else "anonymous"
+
+async def _post(client: httpx.AsyncClient, query: str, variables: dict) -> dict:
+    operation = operation_name(query)
+    # Circuito aberto falha na hora, antes até de esperar ficha
+    probe = anilist_breaker.before_call()
+    try:
+        return await _send(client, query, variables, operation)
+    finally:
+        # Rede de segurança: nenhuma saída (nem erro imprevisto) deixa a chamada de teste
+        # do half_open presa. Depois de record_success/record_failure não muda nada.
+        if probe:
+            anilist_breaker.release()
+
+async def _send(client: httpx.AsyncClient, query: str, variables: dict, operation: str) -> dict:
+    """Uma ida ao AniList, informando o resultado ao limiter e ao circuit breaker."""
+    try:
+        await anilist_limiter.acquire()
+        # Mede só a ida ao AniList (a espera por ficha aparece no limiter)
+        with track_upstream("anilist", operation):
+            response = await client.post(ANILIST_URL, json={"query": query, "variables": variables})
+    except (RateLimited, asyncio.CancelledError):
+        # Não diz nada sobre a saúde do AniList; se era a chamada de teste, o _post a libera
+        raise
+    except Exception:
+        # httpx.HTTPError e qualquer outra falha do cliente contam contra o AniList
+        anilist_breaker.record_failure()
+        raise
+
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.isdigit():
+        anilist_limiter.sync_remaining(int(remaining))
+    if response.status_code == 429 or response.status_code >= 500:
+        upstream_errors.inc(upstream="anilist", operation=operation)
+    if response.status_code == 429:
+        delay = retry_after_seconds(response.headers.get("Retry-After"))
+        anilist_limiter.pause(delay if delay is not None else 60)
+        raise RateLimited(f"AniList respondeu 429 (Retry-After {delay})")
+    if response.status_code >= 500:
+        anilist_breaker.record_failure()
+        response.raise_for_status()
+    try:
+        data = response.json()
+    except ValueError:
+        upstream_errors.inc(upstream="anilist", operation=operation)
+        anilist_breaker.record_failure()
+        raise
+    anilist_breaker.record_success()
+    return data
+
+async def graphql(query: str, variables: dict | None = None, client: httpx.AsyncClient | None = None) -> dict:
+    """
+    Executa uma consulta GraphQL no AniList e devolve o JSON da resposta.
+    Levanta RateLimited/CircuitOpen quando não dá para consultar agora (quem chama serve o cache).
+    """
+    variables = variables or {}
+    client = client or get_anilist_client()
+
+    # Listas (ex.: sort) viram tuplas para a chave ser hashable
+    key = normalize_key(query, *(
+        tuple(value) if isinstance(value, list) else value for _, value in sorted(variables.items())
+    ))
+    return await anilist_flight.do(key, lambda: _post(client, query, variables))
+
+# --- LOTES: várias buscas de Media por id viram um POST só ---
+class MediaBatcher:
+    """
+    DataLoader: junta os load(id, campos) que chegam dentro de uma janela curta
+    num documento com aliases (m0: Media(id: $i0) { ... } m1: ...) e devolve a
+    cada um o seu pedaço. Campos diferentes podem ir no mesmo documento; pedidos
+    repetidos (mesmo id e campos) dentro do lote viram um alias só.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        # (id, campos) -> futures de quem pediu; o lote anda na prioridade do pedido mais urgente
+        self._pending: dict[tuple[int, str], list[asyncio.Future]] = {}
+        self._flight = FlightPriority(BACKGROUND)
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.loads = 0
+
+    async def load(self, media_id: int, fields: str, client: httpx.AsyncClient | None = None) -> dict | None:
+        """Media com os campos pedidos, ou None se o id não existir no AniList."""
+        self.loads += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (media_id, " ".join(fields.split()))
+        self._pending.setdefault(key, []).append(future)
+        join_flight(self._flight)
+
+        if len(self._pending) >= self.max_size:
+            self._flush(client)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush, client)
+        return await future
+
+    async def load_many(self, media_ids: list[int], fields: str, client: httpx.AsyncClient | None = None) -> list[dict | None]:
+        return await asyncio.gather(*(self.load(media_id, fields, client) for media_id in media_ids))
+
+    def _flush(self, client: httpx.AsyncClient | None):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        flight, self._flight = self._flight, FlightPriority(BACKGROUND)
+        if batch:
+            self.batches += 1
+            task = asyncio.ensure_future(self._run(batch, flight, client))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict, flight: FlightPriority, client: httpx.AsyncClient | None):
+        # Promovido se quem pediu for promovido depois (join_flight inscreveu o lote)
+        current_priority.set(flight)
+        keys = list(batch)
+        params = ", ".join(f"$i{n}: Int" for n in range(len(keys)))
+        body = "\n".join(f"  m{n}: Media(id: $i{n}) {{ {fields} }}" for n, (_, fields) in enumerate(keys))
+        query = f"query MediaBatch ({params}) {{\n{body}\n}}"
+        try:
+            data = await graphql(query, {f"i{n}": media_id for n, (media_id, _) in enumerate(keys)}, client)
+            results = data.get("data")
+            if results is None:
+                raise RuntimeError(f"AniList: {data.get('errors')}")
+            errors = data.get("errors") or []
+            # Erro sem path (limite de complexidade, erro interno) vale para o documento inteiro:
+            # deixar os aliases em None viraria um falso "não encontrado" para todo mundo
+            batch_error = next((error for error in errors if not error.get("path")), None)
+            if batch_error is not None:
+                raise RuntimeError(f"AniList: {batch_error}")
+            # Erro que não é 404 num alias (ex.: 500 parcial) vira exceção só para quem pediu aquele
+            failed = {
+                error["path"][0]: error for error in errors
+                if error.get("status") != 404
+            }
+        except BaseException as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        for n, key in enumerate(keys):
+            alias = f"m{n}"
+            for future in batch[key]:
+                if future.done():
+                    continue
+                if alias in failed:
+                    future.set_exception(RuntimeError(f"AniList: {failed[alias]}"))
+                else:
+                    future.set_result(results.get(alias))
+
+
+media_batcher = MediaBatcher(ANILIST_BATCH_WINDOW, ANILIST_BATCH_SIZE)
+
+def stats() -> dict:
+    return {
+        "limiter": anilist_limiter.snapshot(),
+        "breaker": anilist_breaker.snapshot(),
+        "batcher": {"loads": media_batcher.loads, "batches": media_batcher.batches},
+    }
 
 # A Query GraphQL define exatamente o que queremos receber
 SEARCH_QUERY = """
-query ($search: String) {
+query Search ($search: String) {
   Media (search: $search, type: ANIME) {
     id
     title {
@@ -25,18 +229,14 @@ query ($search: String) {
 """
 
 async def search_anime_data(anime_name: str):
-    """Busca metadados do anime na API oficial do AniList."""
-    variables = {"search": anime_name}
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            ANILIST_URL, 
-            json={"query": SEARCH_QUERY, "variables": variables}
-        )
-        
-        if response.status_code != 200:
-            return None
-            
-        data = response.json()
-        # Retorna apenas o objeto 'Media' se existir
-        return data.get("data", {}).get("Media")
\ No newline at end of file
+    """Busca metadados do anime (espelho local primeiro, depois a API oficial do AniList)."""
+    local = await asyncio.to_thread(media_store.get_by_title, anime_name, False)
+    if local:
+        return local
+
+    data = await graphql(SEARCH_QUERY, {"search": anime_name})
+    # Retorna apenas o objeto 'Media' se existir
+    media = (data.get("data") or {}).get("Media")
+    if media:
+        await media_store.remember([media])
+    return media
\ No newline at end of file
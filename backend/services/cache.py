@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable
+from services.rate_limit import BACKGROUND, FlightPriority, current_priority, join_flight, new_flight
+
+logger = logging.getLogger(__name__)
+
+# Caches com nome, para expor os contadores de todos num lugar só (/metrics)
+caches: dict[str, "SWRCache"] = {}
+
+
+class SWRCache:
+    """
+    Cache em memória com TTL e stale-while-revalidate.
+
+    - idade < refresh_after: serve direto da memória;
+    - refresh_after <= idade < ttl: serve da memória e atualiza em segundo plano;
+    - sem valor ou idade >= ttl: busca de novo (chamadas concorrentes viram uma só);
+    - se a busca falhar, continua servindo o último valor bom que tiver;
+    - quem espera uma busca iniciada em segundo plano (prefetch, refresh) a promove
+      para a prioridade dele, em vez de ficar atrás da reserva do limiter.
+
+    Cada chave pode ter seu próprio TTL (o refresh_after acompanha na mesma
+    proporção). Com group_by, os acertos também são contados por grupo de chaves.
+    """
+
+    def __init__(self, ttl: float, refresh_after: float | None = None, max_entries: int = 256,
+                 group_by: Callable[[Hashable], Hashable] | None = None, name: str | None = None):
+        self.name = name
+        if name is not None:
+            caches[name] = self
+        self.ttl = ttl
+        self.refresh_after = refresh_after if refresh_after is not None else ttl * 0.8
+        self.max_entries = max_entries
+        self.group_by = group_by
+        # chave -> (valor, guardado em, ttl, refresh_after)
+        self._entries: dict[Hashable, tuple[Any, float, float, float]] = {}
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._flights: dict[Hashable, FlightPriority] = {}
+
+        # Contadores simples para diagnóstico
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.refresh_errors = 0
+        self.prefetches = 0
+        self.groups: dict[Hashable, dict[str, int]] = {}
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float | None = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at, entry_ttl, refresh_after = entry
+            age = time.monotonic() - stored_at
+            if age < entry_ttl:
+                self._count(key, "hits")
+                if age >= refresh_after:
+                    self._load(key, loader, ttl, background=True)
+                return value
+
+        self._count(key, "misses")
+        try:
+            # shield: se um cliente desistir, a busca continua para os outros
+            return await asyncio.shield(self._load(key, loader, ttl))
+        except Exception:
+            if entry is not None:
+                self.stale_served += 1
+                return entry[0]
+            raise
+
+    def prefetch(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float | None = None):
+        """Carrega em segundo plano se a chave não estiver no cache (ou já pedir atualização)."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < entry[3]:
+            return
+        if key not in self._inflight:
+            self.prefetches += 1
+            self._load(key, loader, ttl, background=True)
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = ttl if ttl is not None else self.ttl
+        refresh_after = self.refresh_after * ttl / self.ttl
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.monotonic(), ttl, refresh_after)
+        # Remove os mais antigos (ordem de inserção do dict)
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, key: Hashable | None = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "stale_served": self.stale_served,
+            "refresh_errors": self.refresh_errors,
+            "prefetches": self.prefetches,
+            "groups": {
+                str(group): {**counts, "hit_rate": round(counts["hits"] / (counts["hits"] + counts["misses"]), 3)}
+                for group, counts in self.groups.items()
+            },
+        }
+
+    # --- INTERNOS ---
+    def _count(self, key: Hashable, counter: str):
+        setattr(self, counter, getattr(self, counter) + 1)
+        if self.group_by is not None:
+            counts = self.groups.setdefault(self.group_by(key), {"hits": 0, "misses": 0})
+            counts[counter] += 1
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float | None = None,
+              background: bool = False) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            flight = self._flights[key] = new_flight(BACKGROUND if background else None)
+            task = asyncio.ensure_future(self._fetch(key, loader, ttl, flight))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        elif not background:
+            # Alguém vai esperar esta busca: ela passa a andar na prioridade dele
+            join_flight(self._flights.get(key))
+        return task
+
+    async def _fetch(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: float | None,
+                     flight: FlightPriority) -> Any:
+        # A task tem a própria cópia do contexto: a prioridade da busca só vale aqui dentro
+        current_priority.set(flight)
+        value = await loader()
+        self.set(key, value, ttl)
+        return value
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        self._flights.pop(key, None)
+        # Consome a exceção para não gerar "Task exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            logger.warning("Cache: falha ao atualizar", extra={"cache": self.name, "key": key, "error": str(task.exception())})
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+import threading
+import database
+import models
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURAÇÕES
+# Write-behind: o POST /users/history só guarda em memória e um flush periódico grava em lote
+HISTORY_WRITE_BEHIND = os.getenv("ANIHUB_HISTORY_WRITE_BEHIND", "1") == "1"
+HISTORY_FLUSH_INTERVAL = float(os.getenv("ANIHUB_HISTORY_FLUSH_INTERVAL", "2"))
+HISTORY_MAX_PENDING = int(os.getenv("ANIHUB_HISTORY_MAX_PENDING", "5000"))
+
+HISTORY_KEY = ["user_id", "anime_id"]
+HISTORY_UPDATE = ["title", "cover", "episode", "watched_at"]
+
+
+def history_upsert(rows: list[dict]):
+    """
+    Upsert em lote do histórico. Só sobrescreve se o watched_at for mais novo,
+    então a ordem de chegada (buffer x lote x rota direta) não importa.
+    """
+    # Uma linha por (usuário, anime): o PostgreSQL não aceita atualizar a mesma linha duas vezes
+    latest: dict[tuple, dict] = {}
+    for row in rows:
+        key = (row["user_id"], row["anime_id"])
+        if key not in latest or row["watched_at"] >= latest[key]["watched_at"]:
+            latest[key] = row
+    return database.upsert(models.History, list(latest.values()), HISTORY_KEY, HISTORY_UPDATE, only_if_newer="watched_at")
+
+
+class HistoryWriteBuffer:
+    """
+    Junta atualizações repetidas do mesmo (usuário, anime) em memória
+    e grava tudo num único upsert a cada HISTORY_FLUSH_INTERVAL segundos.
+    """
+
+    def __init__(self, interval: float = HISTORY_FLUSH_INTERVAL, max_pending: int = HISTORY_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: dict[tuple[int, int], dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.received = 0
+        self.written = 0
+
+    def add(self, row: dict):
+        with self._lock:
+            self._pending[(row["user_id"], row["anime_id"])] = row
+            self.received += 1
+            full = len(self._pending) >= self.max_pending
+        # Buffer cheio: antecipa o flush (add roda nos threads das rotas síncronas)
+        if full and self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def has_pending(self, user_id: int) -> bool:
+        with self._lock:
+            return any(key[0] == user_id for key in self._pending)
+
+    def flush(self):
+        """Grava o que está pendente (síncrono; chamar fora do event loop)."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = list(self._pending.values()), {}
+            if not rows:
+                return
+            db = database.SessionLocal()
+            try:
+                db.execute(history_upsert(rows))
+                db.commit()
+                self.written += len(rows)
+            except Exception as e:
+                db.rollback()
+                logger.error("Erro gravando histórico em lote", extra={"rows": len(rows), "error": str(e)})
+                # Devolve ao buffer sem sobrescrever atualizações que chegaram depois
+                with self._lock:
+                    for row in rows:
+                        self._pending.setdefault((row["user_id"], row["anime_id"]), row)
+            finally:
+                db.close()
+
+    # --- CICLO DE VIDA (lifespan do main.py) ---
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Não perde o que ficou pendente no desligamento
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+
+history_buffer = HistoryWriteBuffer()
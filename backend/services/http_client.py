@@ -0,0 +1,86 @@
+import os
+import httpx
+
+# CONFIGURAÇÕES (podem ser sobrescritas por variáveis de ambiente)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("ANIHUB_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("ANIHUB_HTTP_READ_TIMEOUT", "15"))
+HTTP_POOL_TIMEOUT = float(os.getenv("ANIHUB_HTTP_POOL_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("ANIHUB_HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("ANIHUB_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ANIHUB_HTTP_KEEPALIVE_EXPIRY", "30"))
+ANILIST_HTTP2 = os.getenv("ANIHUB_ANILIST_HTTP2", "1") == "1"
+
+# Um cliente por host: como cada cliente só conversa com um site,
+# os limites do pool valem como limite de conexões por host.
+_anilist_client: httpx.AsyncClient | None = None
+_scraper_client: httpx.AsyncClient | None = None
+_image_client: httpx.AsyncClient | None = None
+
+
+def _http2_disponivel() -> bool:
+    # O httpx só fala HTTP/2 se o pacote 'h2' estiver instalado (httpx[http2])
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client(http2: bool = False, **kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=http2 and _http2_disponivel(),
+        timeout=httpx.Timeout(
+            HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        **kwargs,
+    )
+
+
+# --- CICLO DE VIDA (chamado pelo lifespan do main.py) ---
+async def start_clients():
+    global _anilist_client, _scraper_client
+    if _anilist_client is None:
+        _anilist_client = _build_client(http2=ANILIST_HTTP2)
+    if _scraper_client is None:
+        _scraper_client = _build_client(follow_redirects=True)
+
+
+async def close_clients():
+    global _anilist_client, _scraper_client, _image_client
+    for client in (_anilist_client, _scraper_client, _image_client):
+        if client is not None:
+            await client.aclose()
+    _anilist_client = None
+    _scraper_client = None
+    _image_client = None
+
+
+# --- DEPENDÊNCIAS (usadas nas rotas e nos providers) ---
+def get_anilist_client() -> httpx.AsyncClient:
+    """Cliente compartilhado para o AniList (keep-alive + HTTP/2)."""
+    global _anilist_client
+    # Criação preguiçosa para scripts/testes que rodam sem o lifespan
+    if _anilist_client is None:
+        _anilist_client = _build_client(http2=ANILIST_HTTP2)
+    return _anilist_client
+
+
+def get_scraper_client() -> httpx.AsyncClient:
+    """Cliente compartilhado para os sites de vídeo (segue redirecionamentos)."""
+    global _scraper_client
+    if _scraper_client is None:
+        _scraper_client = _build_client(follow_redirects=True)
+    return _scraper_client
+
+
+def get_image_client() -> httpx.AsyncClient:
+    """Cliente do proxy de imagens (CDN do AniList); criado só quando alguém pede uma imagem."""
+    global _image_client
+    if _image_client is None:
+        _image_client = _build_client(follow_redirects=True)
+    return _image_client
@@ -0,0 +1,290 @@
+"""
+Proxy das capas e banners do AniList com cache em disco.
+
+- o original é baixado uma vez e guardado pelo hash do conteúdo (a mesma
+  imagem vinda de duas URLs ocupa espaço uma vez só);
+- variantes menores (e em WebP, para quem aceita) são geradas sob demanda com
+  o Pillow, que é opcional: sem ele o proxy serve sempre o original;
+- o disco tem um limite: passou dele, saem os arquivos usados há mais tempo;
+- as URLs dos payloads (home, catálogo, detalhe, listas do usuário) são
+  reescritas para apontar para o proxy, com a largura que cada campo precisa.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from urllib.parse import parse_qs, quote, urlsplit
+import httpx
+from services.http_client import get_image_client
+from services.singleflight import SingleFlight
+
+try:
+    from PIL import Image  # opcional: pip install pillow
+except ImportError:
+    Image = None
+
+# CONFIGURAÇÕES
+IMAGE_PROXY = os.getenv("ANIHUB_IMAGE_PROXY", "1") == "1"
+# Endereço público da API (o mesmo API_BASE do frontend): as URLs reescritas são absolutas
+IMAGE_PROXY_BASE = os.getenv("ANIHUB_IMAGE_PROXY_BASE", "http://127.0.0.1:8000").rstrip("/")
+IMAGE_CACHE_DIR = os.getenv("ANIHUB_IMAGE_CACHE_DIR", "./image_cache")
+IMAGE_CACHE_MAX_MB = float(os.getenv("ANIHUB_IMAGE_CACHE_MAX_MB", "512"))
+IMAGE_MAX_BYTES = int(os.getenv("ANIHUB_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Só busca imagens desses hosts (o proxy não pode virar um "baixe qualquer URL")
+IMAGE_HOSTS = {h.strip() for h in os.getenv("ANIHUB_IMAGE_HOSTS", "s4.anilist.co,img.anili.st").split(",") if h.strip()}
+# Larguras servidas: o pedido é arredondado para cima, assim o número de variantes é limitado
+IMAGE_WIDTHS = sorted(int(w) for w in os.getenv("ANIHUB_IMAGE_WIDTHS", "160,320,480,720,1280").split(","))
+IMAGE_QUALITY = int(os.getenv("ANIHUB_IMAGE_QUALITY", "80"))
+
+# Largura usada ao reescrever cada campo (None = original; o medium do AniList já é pequeno)
+FIELD_WIDTHS = {"medium": None, "large": 320, "extraLarge": 480, "banner": 1280, "list": 320}
+
+_PROXY_PREFIX = f"{IMAGE_PROXY_BASE}/img?"
+
+
+# --- REESCRITA DE URLS ---
+def proxy_url(url: str | None, width: int | None = None) -> str | None:
+    """URL do proxy para uma imagem do AniList (outras URLs passam como estão)."""
+    if not IMAGE_PROXY or not url or urlsplit(url).hostname not in IMAGE_HOSTS:
+        return url
+    if width:
+        return f"{_PROXY_PREFIX}w={width}&url={quote(url, safe='')}"
+    return f"{_PROXY_PREFIX}url={quote(url, safe='')}"
+
+
+def origin_url(url: str | None) -> str | None:
+    """Desfaz o proxy_url: o banco guarda sempre a URL original do AniList."""
+    if not url or not url.startswith(_PROXY_PREFIX):
+        return url
+    return parse_qs(url[len(_PROXY_PREFIX):]).get("url", [url])[0]
+
+
+def rewrite_media(media: dict) -> dict:
+    """Cópia do Media do AniList com coverImage/bannerImage apontando para o proxy."""
+    media = dict(media)
+    if media.get("coverImage"):
+        media["coverImage"] = {size: proxy_url(url, FIELD_WIDTHS.get(size)) for size, url in media["coverImage"].items()}
+    if media.get("bannerImage"):
+        media["bannerImage"] = proxy_url(media["bannerImage"], FIELD_WIDTHS["banner"])
+    return media
+
+
+def rewrite_media_list(media_list: list[dict]) -> list[dict]:
+    return [rewrite_media(media) for media in media_list]
+
+
+def snap_width(width: int | None) -> int | None:
+    if not width:
+        return None
+    return next((w for w in IMAGE_WIDTHS if w >= width), IMAGE_WIDTHS[-1])
+
+
+# --- CACHE EM DISCO ---
+class ImageStore:
+    """
+    Arquivos em disco com limite de tamanho e despejo LRU.
+
+    O índice (caminho -> bytes) fica em memória, na ordem de uso; na subida é
+    remontado a partir do mtime dos arquivos, que é atualizado a cada acerto.
+    Tudo aqui faz I/O de disco: no servidor, chamar só em thread (load no lifespan).
+    """
+
+    def __init__(self, root: str = IMAGE_CACHE_DIR, max_bytes: int = int(IMAGE_CACHE_MAX_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self):
+        if self._loaded:
+            return
+        found = []
+        for folder in ("objects", "variants"):
+            for dirpath, _, names in os.walk(os.path.join(self.root, folder)):
+                for name in names:
+                    path = os.path.join(dirpath, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, os.path.relpath(path, self.root), stat.st_size))
+        for _, rel, size in sorted(found):
+            self._files[rel] = size
+            self._size += size
+        self._loaded = True
+
+    def lookup(self, rel: str) -> str | None:
+        path = os.path.join(self.root, rel)
+        with self._lock:
+            self.load()
+            if rel not in self._files:
+                return None
+            if not os.path.exists(path):
+                self._size -= self._files.pop(rel)
+                return None
+            self._files.move_to_end(rel)
+        # O mtime guarda a ordem de uso para a próxima subida
+        os.utime(path)
+        return path
+
+    def store(self, rel: str, data: bytes) -> str:
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Grava num temporário e renomeia: quem estiver lendo nunca vê arquivo pela metade
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.load()
+            self._size -= self._files.pop(rel, 0)
+            self._files[rel] = len(data)
+            self._size += len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # O arquivo recém-gravado (o último) nunca sai
+        while self._size > self.max_bytes and len(self._files) > 1:
+            rel, size = self._files.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.root, rel))
+            except FileNotFoundError:
+                pass
+
+    def read_text(self, rel: str) -> str | None:
+        try:
+            with open(os.path.join(self.root, rel), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_text(self, rel: str, text: str):
+        # Mapas URL -> hash: poucos bytes cada, ficam fora do limite/LRU
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def stats(self) -> dict:
+        # Sem load(): chamado pelo /metrics no event loop, só lê o índice em memória
+        with self._lock:
+            return {"files": len(self._files), "bytes": self._size, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+# --- PROXY ---
+class ImageProxy:
+    def __init__(self, store: ImageStore):
+        self.store = store
+        self._origin_flight = SingleFlight("image_origin")
+        self._resize_flight = SingleFlight("image_resize")
+        self.original_hits = 0
+        self.variant_hits = 0
+        self.origin_fetches = 0
+        self.resized = 0
+
+    async def get(self, url: str, width: int | None = None, webp: bool = False) -> tuple[str, str, str]:
+        """
+        Devolve (caminho no disco, content-type, etag) da imagem pedida.
+        ValueError: URL fora dos hosts permitidos; LookupError: a origem não tem a imagem.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or parts.hostname not in IMAGE_HOSTS:
+            raise ValueError(f"Host não permitido: {parts.hostname}")
+        digest, media_type = await self._original(url)
+        width = snap_width(width)
+        # Sem Pillow (ou GIF, que pode ser animado) vai o original
+        if width is None or Image is None or media_type == "image/gif":
+            return await self._lookup(_object_path(digest)) or await self._refetch(url), media_type, f'"{digest[:20]}"'
+
+        fmt = "webp" if webp else "jpeg"
+        rel = f"variants/{digest[:2]}/{digest}-{width}.{fmt}"
+        path = await self._lookup(rel)
+        if path is not None:
+            self.variant_hits += 1
+        else:
+            path = await self._resize_flight.do(rel, lambda: self._resize(url, digest, rel, width, fmt))
+        return path, f"image/{fmt}", f'"{digest[:20]}-{width}-{fmt}"'
+
+    async def _lookup(self, rel: str) -> str | None:
+        # stat + utime (e o os.walk da primeira vez) fora do event loop
+        return await asyncio.to_thread(self.store.lookup, rel)
+
+    async def _original(self, url: str) -> tuple[str, str]:
+        """Hash e content-type do original, baixando se ainda não estiver no disco."""
+        url_rel = f"urls/{hashlib.sha256(url.encode()).hexdigest()}"
+        known = await asyncio.to_thread(self.store.read_text, url_rel)
+        if known:
+            digest, media_type = known.split("\n", 1)
+            if await self._lookup(_object_path(digest)) is not None:
+                self.original_hits += 1
+                return digest, media_type
+        return await self._origin_flight.do(url, lambda: self._download(url, url_rel))
+
+    async def _download(self, url: str, url_rel: str) -> tuple[str, str]:
+        self.origin_fetches += 1
+        async with get_image_client().stream("GET", url) as response:
+            if response.status_code == 404:
+                raise LookupError("Imagem não encontrada na origem")
+            response.raise_for_status()
+            media_type = response.headers.get("content-type", "").split(";")[0].strip()
+            if not media_type.startswith("image/"):
+                raise httpx.HTTPError(f"Origem devolveu {media_type or 'sem content-type'}")
+            chunks, total = [], 0
+            async for chunk in response.aiter_bytes():
+                total += len(chunk)
+                if total > IMAGE_MAX_BYTES:
+                    raise httpx.HTTPError(f"Imagem maior que {IMAGE_MAX_BYTES} bytes")
+                chunks.append(chunk)
+        data = b"".join(chunks)
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self.store.store, _object_path(digest), data)
+        await asyncio.to_thread(self.store.write_text, url_rel, f"{digest}\n{media_type}")
+        return digest, media_type
+
+    async def _refetch(self, url: str) -> str:
+        # O original saiu do disco entre uma consulta e outra: baixa de novo
+        digest, _ = await self._origin_flight.do(url, lambda: self._download(url, f"urls/{hashlib.sha256(url.encode()).hexdigest()}"))
+        return os.path.join(self.store.root, _object_path(digest))
+
+    async def _resize(self, url: str, digest: str, rel: str, width: int, fmt: str) -> str:
+        source = await self._lookup(_object_path(digest)) or await self._refetch(url)
+        data = await asyncio.to_thread(_render, source, width, fmt)
+        self.resized += 1
+        return await asyncio.to_thread(self.store.store, rel, data)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": IMAGE_PROXY,
+            "resizing": Image is not None,
+            "original_hits": self.original_hits,
+            "variant_hits": self.variant_hits,
+            "origin_fetches": self.origin_fetches,
+            "resized": self.resized,
+            "disk": self.store.stats(),
+        }
+
+
+def _object_path(digest: str) -> str:
+    return f"objects/{digest[:2]}/{digest}"
+
+
+def _render(source: str, width: int, fmt: str) -> bytes:
+    """Reduz para a largura pedida (nunca amplia) e converte para o formato de saída."""
+    with Image.open(source) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = BytesIO()
+        image.save(out, format=fmt.upper(), quality=IMAGE_QUALITY, **({"method": 4} if fmt == "webp" else {"optimize": True}))
+        return out.getvalue()
+
+
+image_proxy = ImageProxy(ImageStore())
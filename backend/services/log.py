@@ -0,0 +1,66 @@
+"""
+Logs estruturados com nível.
+
+Cada módulo usa logging.getLogger(__name__) e passa os dados variáveis em
+extra={...}; o formatador junta esses campos à mensagem:
+  - ANIHUB_LOG_FORMAT=text (padrão): 12:00:00 WARNING services.cache Cache: falha ao atualizar key='home' error='...'
+  - ANIHUB_LOG_FORMAT=json: um objeto JSON por linha (para coletores de log)
+"""
+import json
+import logging
+import os
+import sys
+
+# CONFIGURAÇÕES
+LOG_LEVEL = os.getenv("ANIHUB_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("ANIHUB_LOG_FORMAT", "text")
+
+# Atributos que todo LogRecord tem: o que sobrar veio do extra={...}
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            extra = " ".join(f"{key}={value!r}" for key, value in fields.items())
+            # A exceção (se houver) fica por último, depois dos campos
+            head, sep, tail = line.partition("\n")
+            line = f"{head} {extra}{sep}{tail}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """Configura o logger raiz uma vez só (chamar de novo não duplica as linhas)."""
+    root = logging.getLogger()
+    if any(getattr(handler, "_anihub", False) for handler in root.handlers):
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler._anihub = True
+    root.addHandler(handler)
+    root.setLevel(level)
+    # O httpx loga cada requisição em INFO (AniList, scraper, imagens): só avisos para cima
+    logging.getLogger("httpx").setLevel(max(logging.getLevelName(level), logging.WARNING))
@@ -0,0 +1,390 @@
+"""
+Espelho local dos dados do AniList (tabelas media, media_titles, media_genres,
+media_studios e media_relations).
+
+É preenchido de dois jeitos:
+  - passivamente, com as respostas do AniList que passam pelas rotas;
+  - pela importação em lote (offline, a partir de um dump JSON, ou paginando o AniList).
+
+Uso (dentro de backend/):
+    python -m services.media_store import benchmarks/fixtures/anilist_media.json
+    python -m services.media_store fetch --pages 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+import database
+import models
+from services.rate_limit import BACKGROUND, current_priority
+from services.title_index import entry_from_model, fold, normalize_title, title_index
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURAÇÕES
+# Depois disso o dado local é considerado velho e o AniList é consultado de novo
+MEDIA_STALE_AFTER = timedelta(hours=float(os.getenv("ANIHUB_MEDIA_STALE_HOURS", "24")))
+# Catálogo servido só do espelho (ligar depois de uma importação em lote completa)
+LOCAL_CATALOG = os.getenv("ANIHUB_LOCAL_CATALOG", "0") == "1"
+
+CATALOG_PER_PAGE = 18
+CATALOG_SORTS = {
+    "POPULARITY_DESC": models.Media.popularity.desc(),
+    "TRENDING_DESC": models.Media.trending.desc(),
+    "SCORE_DESC": models.Media.average_score.desc(),
+    "START_DATE_DESC": models.Media.start_date.desc(),
+    "TITLE_ROMAJI": models.Media.title_romaji.asc(),
+}
+
+
+# --- GRAVAÇÃO (a partir do formato do AniList) ---
+_SCALARS = {
+    "description": "description",
+    "bannerImage": "banner",
+    "averageScore": "average_score",
+    "popularity": "popularity",
+    "trending": "trending",
+    "episodes": "episodes",
+    "status": "status",
+    "format": "format",
+    "seasonYear": "season_year",
+}
+
+
+def save_media(db: Session, data: dict, detail: bool = False):
+    """Grava/atualiza um Media do AniList. Só mexe nos campos que vieram na resposta."""
+    if not data or not data.get("id"):
+        return None
+    now = datetime.utcnow()
+    media = db.get(models.Media, data["id"]) or models.Media(id=data["id"])
+    db.add(media)
+
+    for key, column in _SCALARS.items():
+        if key in data:
+            setattr(media, column, data[key])
+    if data.get("title"):
+        for kind in ("romaji", "english", "native"):
+            if kind in data["title"]:
+                setattr(media, f"title_{kind}", data["title"][kind])
+    if data.get("coverImage"):
+        for key, column in (("extraLarge", "cover_extra_large"), ("large", "cover_large"), ("medium", "cover_medium")):
+            if key in data["coverImage"]:
+                setattr(media, column, data["coverImage"][key])
+    if data.get("startDate") and data["startDate"].get("year"):
+        start = data["startDate"]
+        media.start_date = start["year"] * 10000 + (start.get("month") or 0) * 100 + (start.get("day") or 0)
+
+    if data.get("title") or "synonyms" in data:
+        names = [(kind, media_title) for kind, media_title in (
+            ("romaji", media.title_romaji), ("english", media.title_english), ("native", media.title_native),
+        ) if media_title]
+        if "synonyms" in data:
+            synonyms = [synonym for synonym in data["synonyms"] or [] if synonym]
+        else:
+            synonyms = [t.title for t in media.titles if t.kind == "synonym"]
+        names += [("synonym", synonym) for synonym in synonyms]
+        media.titles = [models.MediaTitle(kind=kind, title=name, normalized=normalize_title(name)) for kind, name in names]
+    if "genres" in data:
+        media.genres = [models.MediaGenre(genre=genre) for genre in dict.fromkeys(data["genres"] or [])]
+    if data.get("studios"):
+        studios = data["studios"]
+        if "edges" in studios:
+            found = [(e["node"]["name"], bool(e.get("isMain"))) for e in studios["edges"]]
+        else:
+            # Nas consultas da API os estúdios vêm de studios(isMain: true)
+            found = [(n["name"], True) for n in studios.get("nodes", [])]
+        media.studios = [models.MediaStudio(name=name, is_main=is_main) for name, is_main in dict(found).items()]
+    if data.get("relations"):
+        media.relations_fetched_at = now
+        relations = {}
+        for edge in data["relations"].get("edges", []):
+            node = edge["node"]
+            relations[node["id"]] = models.MediaRelation(
+                related_id=node["id"],
+                relation_type=edge.get("relationType"),
+                title=(node.get("title") or {}).get("romaji"),
+                format=node.get("format"),
+                type=node.get("type"),
+                cover=(node.get("coverImage") or {}).get("medium"),
+            )
+        media.relations = list(relations.values())
+
+    media.fetched_at = now
+    if detail:
+        media.detail_fetched_at = now
+    return media
+
+
+def save_many(media_list: list[dict], detail: bool = False):
+    """Grava vários Media numa transação (roda em thread; abre a própria sessão)."""
+    # O mesmo anime pode vir mais de uma vez (ex.: em várias listas da home)
+    merged: dict[int, dict] = {}
+    for data in media_list:
+        if data and data.get("id"):
+            merged.setdefault(data["id"], {}).update(data)
+    for attempt in range(2):
+        db = database.SessionLocal()
+        try:
+            saved = [media for media in (save_media(db, data, detail) for data in merged.values()) if media is not None]
+            # Lido antes do commit, que expira os objetos da sessão
+            entries = [entry_from_model(media) for media in saved]
+            db.commit()
+            title_index.add_many(entries)
+            return
+        except IntegrityError as e:
+            # Outra thread criou o mesmo Media entre o get e o insert: na segunda vez ele já existe
+            db.rollback()
+            if attempt:
+                logger.warning("Espelho AniList: falha ao gravar", extra={"error": str(e)})
+        except Exception as e:
+            # O espelho é só otimização: falha aqui nunca derruba a rota
+            db.rollback()
+            logger.warning("Espelho AniList: falha ao gravar", extra={"error": str(e)})
+            return
+        finally:
+            db.close()
+
+
+async def remember(media_list: list[dict], detail: bool = False):
+    await asyncio.to_thread(save_many, media_list, detail)
+
+
+# --- LEITURA (devolve no mesmo formato do AniList) ---
+def to_anilist(media: models.Media, with_relations: bool = True) -> dict:
+    data = {
+        "id": media.id,
+        "title": {"romaji": media.title_romaji, "english": media.title_english, "native": media.title_native},
+        "synonyms": [t.title for t in media.titles if t.kind == "synonym"],
+        "coverImage": {"extraLarge": media.cover_extra_large, "large": media.cover_large, "medium": media.cover_medium},
+        "bannerImage": media.banner,
+        "description": media.description,
+        "averageScore": media.average_score,
+        "popularity": media.popularity,
+        "episodes": media.episodes,
+        "status": media.status,
+        "format": media.format,
+        "seasonYear": media.season_year,
+        "genres": [g.genre for g in media.genres],
+        "studios": {"nodes": [{"name": s.name} for s in media.studios if s.is_main]},
+    }
+    if with_relations:
+        data["relations"] = relation_edges(media)
+    return data
+
+
+def relation_edges(media: models.Media) -> dict:
+    return {"edges": [
+        {
+            "relationType": r.relation_type,
+            "node": {"id": r.related_id, "title": {"romaji": r.title}, "format": r.format, "type": r.type, "coverImage": {"medium": r.cover}},
+        }
+        for r in media.relations
+    ]}
+
+
+def _is_fresh(moment: datetime | None) -> bool:
+    return moment is not None and datetime.utcnow() - moment < MEDIA_STALE_AFTER
+
+
+def find_id_by_title(db: Session, title: str) -> int | None:
+    row = (
+        db.query(models.MediaTitle.media_id)
+        .join(models.Media, models.Media.id == models.MediaTitle.media_id)
+        .filter(models.MediaTitle.normalized == normalize_title(title))
+        .order_by(models.Media.popularity.desc())
+        .first()
+    )
+    return row[0] if row else None
+
+
+def get_by_id(media_id: int, detail: bool = True, allow_stale: bool = False) -> dict | None:
+    """
+    Media local no formato do AniList (sem as relações), se existir e não estiver
+    velho (allow_stale ignora a idade).
+    """
+    db = database.SessionLocal()
+    try:
+        media = db.get(models.Media, media_id)
+        if media is None:
+            return None
+        moment = media.detail_fetched_at if detail else media.fetched_at
+        if moment is None or not (allow_stale or _is_fresh(moment)):
+            return None
+        return to_anilist(media, with_relations=False)
+    finally:
+        db.close()
+
+
+def get_relations(media_id: int, allow_stale: bool = False) -> dict | None:
+    """Relações locais (no formato do AniList), se já foram buscadas e não estão velhas."""
+    db = database.SessionLocal()
+    try:
+        media = db.get(models.Media, media_id)
+        if media is None or media.relations_fetched_at is None:
+            return None
+        if not (allow_stale or _is_fresh(media.relations_fetched_at)):
+            return None
+        return relation_edges(media)
+    finally:
+        db.close()
+
+
+def get_by_title(title: str, detail: bool = True, allow_stale: bool = False) -> dict | None:
+    db = database.SessionLocal()
+    try:
+        media_id = find_id_by_title(db, title)
+    finally:
+        db.close()
+    return get_by_id(media_id, detail, allow_stale) if media_id else None
+
+
+# --- RESOLUÇÃO NOME -> ID ---
+def slugify(name: str) -> str:
+    """Slug do nome: "Shingeki no Kyojin!" e "shingeki-no-kyojin" viram "shingeki-no-kyojin"."""
+    return fold(name).replace(" ", "-")
+
+
+def resolve_id(name: str) -> int | None:
+    """Id do AniList para um nome: título conhecido (índice em memória) ou apelido aprendido."""
+    media_id = title_index.find(name)
+    if media_id is not None:
+        return media_id
+    db = database.SessionLocal()
+    try:
+        alias = db.get(models.MediaAlias, slugify(name))
+        return alias.media_id if alias else None
+    finally:
+        db.close()
+
+
+def learn_alias(name: str, media_id: int):
+    """Guarda que a busca por 'name' levou a media_id (a próxima não precisa do AniList)."""
+    slug = slugify(name)
+    if not slug:
+        return
+    db = database.SessionLocal()
+    try:
+        db.execute(database.upsert(
+            models.MediaAlias, {"slug": slug, "media_id": media_id, "learned_at": datetime.utcnow()},
+            ["slug"], ["media_id", "learned_at"],
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Espelho AniList: falha ao gravar apelido", extra={"slug": slug, "error": str(e)})
+    finally:
+        db.close()
+
+
+def search_catalog(page: int = 1, sort: str = "POPULARITY_DESC", genre: str | None = None,
+                   search: str | None = None, format: str | None = None) -> dict:
+    """Mesmo formato do Page do AniList (pageInfo + media), servido do espelho."""
+    db = database.SessionLocal()
+    try:
+        query = db.query(models.Media)
+        if genre:
+            query = query.filter(models.Media.genres.any(models.MediaGenre.genre == genre))
+        if format:
+            query = query.filter(models.Media.format == format)
+        if search:
+            pattern = f"%{normalize_title(search)}%"
+            query = query.filter(models.Media.titles.any(models.MediaTitle.normalized.like(pattern)))
+
+        total = query.count()
+        order = CATALOG_SORTS.get(sort, CATALOG_SORTS["POPULARITY_DESC"])
+        rows = (
+            query.options(selectinload(models.Media.genres), selectinload(models.Media.titles), selectinload(models.Media.studios))
+            .order_by(order, models.Media.id)
+            .offset((page - 1) * CATALOG_PER_PAGE)
+            .limit(CATALOG_PER_PAGE)
+            .all()
+        )
+        last_page = max(1, math.ceil(total / CATALOG_PER_PAGE))
+        return {
+            "pageInfo": {"total": total, "perPage": CATALOG_PER_PAGE, "lastPage": last_page, "currentPage": page, "hasNextPage": page < last_page},
+            "media": [to_anilist(media, with_relations=False) for media in rows],
+        }
+    finally:
+        db.close()
+
+
+# --- IMPORTAÇÃO EM LOTE ---
+BULK_QUERY = """
+query BulkImport ($page: Int) {
+  Page(page: $page, perPage: 50) {
+    pageInfo { hasNextPage }
+    media(type: ANIME, sort: POPULARITY_DESC) {
+      id
+      title { romaji english native }
+      synonyms
+      coverImage { extraLarge large medium }
+      bannerImage
+      description
+      averageScore
+      popularity
+      trending
+      episodes
+      status
+      format
+      seasonYear
+      startDate { year month day }
+      genres
+      studios { edges { isMain node { name } } }
+      relations {
+        edges {
+          relationType(version: 2)
+          node { id title { romaji } format type coverImage { medium } }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def import_dump(path: str) -> int:
+    """Importa um dump JSON (lista de Media no formato do AniList). Funciona offline."""
+    with open(path, encoding="utf-8") as f:
+        media_list = json.load(f)
+    save_many(media_list, detail=True)
+    return len(media_list)
+
+
+async def fetch_pages(pages: int) -> int:
+    from services.anilist_service import graphql
+    # Importação em lote nunca passa na frente das requisições dos usuários
+    current_priority.set(BACKGROUND)
+    total = 0
+    for page in range(1, pages + 1):
+        data = await graphql(BULK_QUERY, {"page": page})
+        result = (data.get("data") or {}).get("Page") or {}
+        await remember(result.get("media") or [], detail=True)
+        total += len(result.get("media") or [])
+        if not result.get("pageInfo", {}).get("hasNextPage"):
+            break
+    return total
+
+
+if __name__ == "__main__":
+    import migrations
+    from services.log import setup_logging
+    setup_logging()
+    arg_parser = argparse.ArgumentParser(description="Importação em lote do espelho do AniList")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="importa um dump JSON local")
+    import_cmd.add_argument("path")
+    fetch_cmd = commands.add_parser("fetch", help="pagina o AniList por popularidade")
+    fetch_cmd.add_argument("--pages", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    migrations.run_migrations(database.engine)
+    if args.command == "import":
+        count = import_dump(args.path)
+    else:
+        count = asyncio.run(fetch_pages(args.pages))
+    logger.info("Animes gravados no espelho local", extra={"count": count})
@@ -0,0 +1,267 @@
+"""
+Métricas no formato de texto do Prometheus, sem dependências.
+
+- Counter, Gauge e Histogram com rótulos (labels); seguros entre threads, porque
+  boa parte das medições (banco, bcrypt, parse) acontece fora do event loop;
+- coletores: funções chamadas a cada GET /metrics que leem os contadores que os
+  serviços já mantêm (caches, single-flight, limite do AniList...) e viram
+  métricas na hora, sem duplicar a contagem;
+- MetricsMiddleware: latência, total e requisições em andamento por rota.
+"""
+import asyncio
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (nome, tipo, ajuda, [(rótulos, valor)])
+Sample = tuple[dict, float]
+Family = tuple[str, str, str, list[Sample]]
+
+_metrics: list["_Metric"] = []
+_collectors: list[Callable[[], Iterable[Family]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> list[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[Sample]:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> ([contagem por balde], soma, total)
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[Sample]:
+        # Só usado pelo render, que trata os histogramas à parte
+        return []
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(counts), total_sum, count) for key, (counts, total_sum, count) in self._values.items()]
+        for key, counts, total_sum, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total_sum!r}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+def register_collector(collector: Callable[[], Iterable[Family]]):
+    """Função chamada a cada coleta; devolve famílias (nome, tipo, ajuda, amostras)."""
+    _collectors.append(collector)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Histogram):
+            lines.extend(metric.render())
+        else:
+            lines.extend(f"{metric.name}{_labels(labels)} {_number(value)}" for labels, value in metric.samples())
+    for collector in _collectors:
+        for name, kind, help, samples in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples if value is not None)
+    return "\n".join(lines) + "\n"
+
+
+# --- MÉTRICAS COMPARTILHADAS ---
+http_requests = Counter("anihub_http_requests_total", "Requisições atendidas", ("route", "method", "status"))
+http_duration = Histogram("anihub_http_request_duration_seconds", "Latência por rota", ("route", "method"))
+http_in_flight = Gauge("anihub_http_requests_in_flight", "Requisições em andamento")
+
+upstream_duration = Histogram("anihub_upstream_duration_seconds", "Latência das chamadas externas", ("upstream", "operation"))
+upstream_errors = Counter("anihub_upstream_errors_total", "Chamadas externas que falharam", ("upstream", "operation"))
+
+db_duration = Histogram(
+    "anihub_db_query_duration_seconds", "Latência das consultas ao banco", ("statement", "table"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+parse_duration = Histogram("anihub_parse_duration_seconds", "Extração de HTML (com a espera na fila)", ("what",))
+hash_duration = Histogram("anihub_hash_duration_seconds", "bcrypt (com a espera na fila)", ("operation",))
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str):
+    """Mede uma chamada externa; exceções contam como erro e seguem adiante."""
+    start = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        # Cancelada (cliente desistiu, perdeu a corrida entre provedores) não é erro do serviço
+        raise
+    except BaseException:
+        upstream_errors.inc(upstream=upstream, operation=operation)
+        raise
+    finally:
+        upstream_duration.observe(time.perf_counter() - start, upstream=upstream, operation=operation)
+
+
+# --- BANCO: eventos do SQLAlchemy ---
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def _statement_labels(statement: str) -> tuple[str, str]:
+    # Rótulos limitados (tipo da instrução + primeira tabela), nunca o SQL inteiro
+    words = statement.split(None, 1)
+    kind = words[0].upper() if words else "?"
+    table = _TABLE_RE.search(statement)
+    return kind, table.group(1) if table else "-"
+
+
+def instrument_engine(engine):
+    """Liga as medições de consulta num Engine (no async, passar async_engine.sync_engine)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("anihub_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("anihub_query_start")
+        if not starts:
+            return
+        kind, table = _statement_labels(statement)
+        db_duration.observe(time.perf_counter() - starts.pop(), statement=kind, table=table)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Consulta que falhou não passa pelo after_cursor_execute
+        starts = context.connection.info.get("anihub_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# --- MIDDLEWARE HTTP ---
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sem o custo do BaseHTTPMiddleware). A rota é o molde
+    (/anime/{anime_name}), nunca o caminho real, para o número de séries não explodir.
+    on_finish(rota, início, fim) é chamado depois de cada requisição (gancho do profiler).
+    """
+
+    def __init__(self, app, on_finish: Callable[[str, float, float], None] | None = None):
+        self.app = app
+        self.on_finish = on_finish
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+        # A rota só é conhecida depois do roteamento: o gauge de andamento é geral
+        http_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(route=route, method=scope["method"], status=status)
+            http_duration.observe(end - start, route=route, method=scope["method"])
+            if self.on_finish is not None:
+                self.on_finish(route, start, end)
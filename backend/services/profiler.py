@@ -0,0 +1,128 @@
+"""
+Profiler por amostragem (opcional) para investigar requisições lentas.
+
+Com ANIHUB_PROFILE_SLOW_MS > 0, uma thread lê as pilhas de todas as threads a
+cada ANIHUB_PROFILE_INTERVAL_MS e guarda as amostras recentes na memória. Quando
+uma requisição passa do limite, as amostras do intervalo dela são gravadas em
+ANIHUB_PROFILE_DIR no formato "folded" (uma pilha por linha + contagem), que o
+flamegraph.pl, o speedscope e o inferno abrem direto.
+
+O event loop atende várias requisições ao mesmo tempo: a janela também mostra o
+que as outras estavam fazendo. Serve para achar o gargalo (AniList, scraper,
+parse, bcrypt, SQLite), não para uma conta exata por requisição.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURAÇÕES
+PROFILE_SLOW_MS = float(os.getenv("ANIHUB_PROFILE_SLOW_MS", "0"))  # 0 desliga
+PROFILE_INTERVAL_MS = float(os.getenv("ANIHUB_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("ANIHUB_PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("ANIHUB_PROFILE_MAX_FILES", "50"))
+# A mesma rota lenta gera no máximo um arquivo a cada tantos segundos
+PROFILE_MIN_GAP = float(os.getenv("ANIHUB_PROFILE_MIN_GAP", "30"))
+# Quanto tempo de amostras fica na memória (a requisição lenta mais longa que dá para ver)
+PROFILE_WINDOW = float(os.getenv("ANIHUB_PROFILE_WINDOW", "60"))
+
+# Pilhas paradas esperando trabalho (loop ocioso, pool sem tarefa) não interessam
+_IDLE_LEAVES = {"select", "wait", "_worker", "_wait_for_tstate_lock", "poll"}
+_UNSAFE_CHARS = re.compile(r"[^\w.-]+")
+
+
+def _fold(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    def __init__(self, slow_ms: float = PROFILE_SLOW_MS, interval_ms: float = PROFILE_INTERVAL_MS,
+                 out_dir: str = PROFILE_DIR, window: float = PROFILE_WINDOW):
+        self.slow = slow_ms / 1000
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self.window = window
+        # (perf_counter, pilha dobrada)
+        self._samples: deque[tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_dump: dict[str, float] = {}
+        self.samples_taken = 0
+        self.dumps = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow > 0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        logger.info("Profiler ligado", extra={"slow_ms": self.slow * 1000, "interval_ms": self.interval * 1000})
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            batch = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_name in _IDLE_LEAVES:
+                    continue
+                batch.append((now, f"{names.get(ident, ident)};{_fold(frame)}"))
+            with self._lock:
+                self._samples.extend(batch)
+                self.samples_taken += len(batch)
+                while self._samples and self._samples[0][0] < now - self.window:
+                    self._samples.popleft()
+
+    def request_finished(self, route: str, start: float, end: float):
+        """Gancho do MetricsMiddleware: grava o flamegraph se a requisição foi lenta."""
+        if end - start < self.slow:
+            return
+        if end - self._last_dump.get(route, float("-inf")) < PROFILE_MIN_GAP:
+            return
+        self._last_dump[route] = end
+        with self._lock:
+            stacks = Counter(stack for at, stack in self._samples if start <= at <= end)
+        if not stacks:
+            return
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{_UNSAFE_CHARS.sub('_', route).strip('_') or 'root'}_{(end - start) * 1000:.0f}ms.folded"
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        self.dumps += 1
+        logger.warning("Requisição lenta: flamegraph gravado", extra={"route": route, "ms": round((end - start) * 1000), "path": path})
+        self._prune()
+
+    def _prune(self):
+        files = sorted(f for f in os.listdir(self.out_dir) if f.endswith(".folded"))
+        for old in files[:-PROFILE_MAX_FILES]:
+            os.remove(os.path.join(self.out_dir, old))
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "samples": self.samples_taken, "dumps": self.dumps}
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,310 @@
+"""
+Controle de vazão para APIs externas: token bucket com filas de prioridade e
+circuit breaker.
+
+A prioridade vem de uma ContextVar, então quem está numa atualização em segundo
+plano (refresh do cache, prefetch, importação) não precisa passar nada adiante:
+basta rodar com current_priority = BACKGROUND.
+
+Chamadas compartilhadas (SingleFlight, cache, lote de Media) rodam com uma
+FlightPriority no lugar do número: quem se junta a elas empresta a própria
+prioridade, então um usuário esperando um prefetch não fica atrás da reserva.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE, BACKGROUND = 0, 1
+current_priority: ContextVar["int | FlightPriority"] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+class FlightPriority:
+    """
+    Prioridade mutável de uma chamada compartilhada. Só sobe: promote() avisa quem
+    estiver inscrito (o limiter move a espera para a fila interativa, chamadas
+    derivadas sobem junto).
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._listeners: list[Callable[[int], None]] = []
+
+    def promote(self, priority: int):
+        if priority >= self.value:
+            return
+        self.value = priority
+        for listener in list(self._listeners):
+            listener(priority)
+
+    def subscribe(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[int], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+
+def effective_priority() -> int:
+    value = current_priority.get()
+    return value.value if isinstance(value, FlightPriority) else value
+
+
+def new_flight(priority: int | None = None) -> FlightPriority:
+    """
+    Prioridade para uma chamada compartilhada criada agora. Sem priority, herda a
+    do contexto e acompanha as promoções dele; com priority (ex.: BACKGROUND de um
+    prefetch), fica independente de quem a disparou.
+    """
+    if priority is not None:
+        return FlightPriority(priority)
+    parent = current_priority.get()
+    flight = FlightPriority(effective_priority())
+    if isinstance(parent, FlightPriority):
+        parent.subscribe(flight.promote)
+    return flight
+
+
+def join_flight(flight: FlightPriority | None):
+    """Quem passa a esperar uma chamada compartilhada empresta a própria prioridade a ela."""
+    if flight is None:
+        return
+    caller = current_priority.get()
+    flight.promote(effective_priority())
+    if isinstance(caller, FlightPriority) and caller is not flight:
+        caller.subscribe(flight.promote)
+
+
+class RateLimited(Exception):
+    """Sem ficha a tempo no limite de requisições (ou o servidor respondeu 429)."""
+
+
+class CircuitOpen(Exception):
+    """O circuito está aberto: a chamada nem é feita."""
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Retry-After pode vir em segundos ou como data HTTP."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket com uma fila por prioridade.
+
+    - INTERACTIVE passa na frente de BACKGROUND e espera no máximo max_wait;
+    - BACKGROUND só usa fichas acima da reserva (sobra para quem está na tela)
+      e espera o quanto precisar;
+    - pause() zera o balde até o fim do Retry-After; sync_remaining() alinha as
+      fichas com o que o servidor diz que ainda resta.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, background_reserve: int = 0, max_wait: float = 5.0):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._waiters: tuple[deque, deque] = (deque(), deque())
+        self._timer: asyncio.TimerHandle | None = None
+
+        # Contadores para diagnóstico
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    async def acquire(self, priority: int | None = None):
+        flight = None
+        if priority is None:
+            context = current_priority.get()
+            if isinstance(context, FlightPriority):
+                flight, priority = context, context.value
+            else:
+                priority = context
+        self._refill()
+        # Ninguém de prioridade igual ou maior esperando: passa direto se tiver ficha
+        if not any(self._waiters[p] for p in range(priority + 1)) and self._available(priority):
+            self._take()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        self.queued += 1
+        self._schedule()
+        timeout = self.max_wait if priority == INTERACTIVE else None
+        # Chamada em segundo plano que ganhar alguém interativo esperando por ela muda de fila
+        listener = (lambda promoted: self._promote(future, promoted)) if flight is not None and priority == BACKGROUND else None
+        if listener is not None:
+            flight.subscribe(listener)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimited(f"sem vaga no limite de requisições em {timeout}s") from None
+        finally:
+            if listener is not None:
+                flight.unsubscribe(listener)
+
+    def pause(self, seconds: float):
+        """Nenhuma requisição sai pelos próximos 'seconds' (ex.: depois de um 429)."""
+        self.throttled += 1
+        self._refill()
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def sync_remaining(self, remaining: float):
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {
+            "tokens": round(self.tokens, 2),
+            "blocked_for": round(max(self.blocked_until - time.monotonic(), 0), 2),
+            "waiting_interactive": len(self._waiters[INTERACTIVE]),
+            "waiting_background": len(self._waiters[BACKGROUND]),
+            "granted": self.granted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+    # --- INTERNOS ---
+    def _refill(self):
+        now = time.monotonic()
+        # Durante o bloqueio o balde não enche
+        start = max(self._updated, self.blocked_until)
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def _floor(self, priority: int) -> float:
+        return 1 + (self.background_reserve if priority == BACKGROUND else 0)
+
+    def _available(self, priority: int) -> bool:
+        return time.monotonic() >= self.blocked_until and self.tokens >= self._floor(priority)
+
+    def _take(self):
+        self.tokens -= 1
+        self.granted += 1
+
+    def _promote(self, future: asyncio.Future, priority: int):
+        if priority != INTERACTIVE or future.done():
+            return
+        try:
+            self._waiters[BACKGROUND].remove(future)
+        except ValueError:
+            return
+        self._waiters[INTERACTIVE].append(future)
+        # A partir daqui vale o limite de espera de uma chamada interativa
+        deadline = asyncio.get_running_loop().call_later(self.max_wait, self._expire, future)
+        future.add_done_callback(lambda _: deadline.cancel())
+        self._schedule()
+
+    def _expire(self, future: asyncio.Future):
+        if not future.done():
+            self.rejected += 1
+            future.set_exception(RateLimited(f"sem vaga no limite de requisições em {self.max_wait}s"))
+
+    def _dispatch(self):
+        self._timer = None
+        self._refill()
+        for priority, queue in enumerate(self._waiters):
+            while queue:
+                # Quem desistiu (timeout/cancelamento) sai da fila
+                if queue[0].done():
+                    queue.popleft()
+                    continue
+                if not self._available(priority):
+                    break
+                self._take()
+                queue.popleft().set_result(None)
+            if queue:
+                # Prioridade maior ainda esperando: as menores esperam também
+                break
+        self._schedule()
+
+    def _schedule(self):
+        waiting = [p for p, queue in enumerate(self._waiters) if queue]
+        if not waiting:
+            return
+        self._refill()
+        now = time.monotonic()
+        missing = max(self._floor(waiting[0]) - self.tokens, 0)
+        due = now + max(max(self.blocked_until - now, 0) + missing / self.rate, 0.01)
+        if self._timer is not None:
+            # Timer armado para um background (que precisa da reserva): quem tem prioridade maior
+            # e chegou depois precisa de menos fichas, então antecipa o despertar
+            if self._timer.when() <= due:
+                return
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_at(due, self._dispatch)
+
+
+class CircuitBreaker:
+    """
+    closed -> (failure_threshold falhas seguidas) -> open -> (recovery_time) -> half_open.
+    Em half_open passa uma chamada de teste: sucesso fecha, falha abre de novo.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.short_circuited = 0
+
+    def before_call(self) -> bool:
+        """Levanta CircuitOpen se não pode chamar; True se esta é a chamada de teste do half_open."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.recovery_time:
+                self.short_circuited += 1
+                raise CircuitOpen(f"circuito aberto há {time.monotonic() - self.opened_at:.0f}s")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.short_circuited += 1
+                raise CircuitOpen("circuito em teste")
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuito aberto", extra={"failures": self.failures})
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """A chamada terminou sem dizer nada sobre a saúde do servidor (cancelada, 429...)."""
+        self._probing = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "short_circuited": self.short_circuited}
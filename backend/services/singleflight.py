@@ -0,0 +1,71 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+from services.rate_limit import FlightPriority, current_priority, join_flight, new_flight
+
+# Todos os grupos criados, para expor os contadores num lugar só
+_groups: dict[str, "SingleFlight"] = {}
+
+
+def normalize_key(*parts: Any) -> tuple:
+    """Normaliza os argumentos: strings em minúsculas e sem espaços repetidos."""
+    normalized = []
+    for part in parts:
+        if isinstance(part, str):
+            part = " ".join(part.lower().split())
+        normalized.append(part)
+    return tuple(normalized)
+
+
+class SingleFlight:
+    """
+    Garante no máximo uma chamada em andamento por chave.
+    Quem chega enquanto a chamada está rodando espera e recebe o mesmo
+    resultado (ou a mesma exceção), e empresta a própria prioridade à chamada.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._flights: dict[Hashable, FlightPriority] = {}
+        self.calls = 0
+        self.deduplicated = 0
+        _groups[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            flight = self._flights[key] = new_flight()
+            task = asyncio.ensure_future(self._run(flight, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.deduplicated += 1
+            join_flight(self._flights.get(key))
+        # shield: um cliente que desiste não cancela a chamada dos outros
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _run(flight: FlightPriority, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # A task tem a própria cópia do contexto: a prioridade compartilhada só vale aqui dentro
+        current_priority.set(flight)
+        return await fn()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._flights.pop(key, None)
+        # Evita o aviso de exceção não lida quando todos os clientes desistiram
+        if not task.cancelled():
+            task.exception()
+
+
+def stats() -> dict:
+    return {
+        name: {"calls": g.calls, "deduplicated": g.deduplicated, "in_flight": g.in_flight}
+        for name, g in _groups.items()
+    }
@@ -0,0 +1,334 @@
+"""
+Índice de títulos em memória para as sugestões da busca (search-as-you-type).
+
+Guarda romaji, english, native e sinônimos de tudo o que está no espelho local
+e responde sem sair do processo:
+  - prefixo: lista ordenada de chaves + bisect (o título inteiro e cada palavra dele);
+  - fuzzy: trigramas, para erros de digitação ("shingeky", "frieran");
+  - sem acento e sem pontuação ("Pokémon" = "pokemon", "Re:Zero" = "re zero");
+  - ranking: início do título > início de palavra > fuzzy (por semelhança), e popularidade no empate.
+
+Os dados ficam em arrays/listas paralelas (nada de um objeto por título) e as
+atualizações entram num "delta" pequeno que é fundido no índice principal de
+tempos em tempos, então gravar no espelho não reordena tudo a cada anime.
+A fusão também compacta os arrays (tira o que ficou de versões antigas dos
+animes) e é montada fora do lock das consultas, que só é pego para a troca.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+import database
+import models
+
+logger = logging.getLogger(__name__)
+
+# CONFIGURAÇÕES
+# Atualizações acumuladas antes de fundir o delta no índice principal
+DELTA_MAX = int(os.getenv("ANIHUB_TITLE_INDEX_DELTA", "256"))
+# Chaves de prefixo examinadas por consulta (termos muito curtos casam com milhares)
+PREFIX_SCAN = 2000
+# Fração mínima dos trigramas da busca que o título precisa ter
+FUZZY_MIN_SCORE = 0.55
+# Trigramas mais comuns que isso quase não discriminam ("no ", " th") e são pulados
+FUZZY_MAX_POSTINGS = 5000
+
+# Grupos do ranking
+_TIER_START, _TIER_WORD, _TIER_FUZZY = 0, 1, 2
+
+
+def normalize_title(title: str) -> str:
+    """Minúsculo, sem acentos e sem espaços repetidos ("Shingeki  no Kyojin" -> "shingeki no kyojin")."""
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    return " ".join(title.lower().split())
+
+
+def fold(text: str) -> str:
+    """normalize_title + pontuação vira espaço. É a forma usada nas chaves do índice."""
+    text = normalize_title(text)
+    return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    def __init__(self):
+        # _lock: consultas e alterações pontuais; _write_lock: um escritor (add_many/load) por vez
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reset()
+        self.built_at: float | None = None
+
+    def _reset(self):
+        # Por anime ("slot"); um anime atualizado ganha slot novo e o antigo morre
+        self._slot_by_id: dict[int, int] = {}
+        self._media_ids = array("i")
+        self._popularity = array("i")
+        self._alive = bytearray()
+        self._romaji: list[str] = []
+        self._cover: list[str | None] = []
+        self._format: list[str | None] = []
+        # Hash dos nomes do slot: salvar de novo o mesmo anime sem mudar títulos não cria slot novo
+        self._names_hash = array("q")
+        # Por nome (cada título/sinônimo de um slot)
+        self._name_slot = array("i")
+        # Prefixo: chaves ordenadas + nome e grupo de cada chave; o delta fica fora de ordem
+        self._keys: list[str] = []
+        self._key_names = array("i")
+        self._key_tiers = array("b")
+        self._delta: list[tuple[str, int, int]] = []
+        self._dead = 0
+        # Fuzzy: trigrama -> nomes que o contêm
+        self._grams: dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
+
+    # --- ESCRITA ---
+    def _add(self, media_id: int, romaji: str | None, cover: str | None, format: str | None,
+             popularity: int | None, titles) -> bool:
+        names = list(dict.fromkeys(key for key in map(fold, filter(None, titles)) if key))
+        names_hash = hash(tuple(names))
+        old = self._slot_by_id.get(media_id)
+        if old is not None and names and romaji and self._names_hash[old] == names_hash:
+            # Mesmos títulos: chaves e trigramas continuam valendo, só os dados do slot mudam
+            self._romaji[old] = romaji
+            self._cover[old] = cover
+            self._format[old] = sys.intern(format) if format else None
+            self._popularity[old] = popularity or 0
+            return True
+        if old is not None:
+            self._alive[old] = 0
+            self._dead += 1
+        if not names or not romaji:
+            self._slot_by_id.pop(media_id, None)
+            return False
+
+        slot = len(self._media_ids)
+        self._slot_by_id[media_id] = slot
+        self._media_ids.append(media_id)
+        self._popularity.append(popularity or 0)
+        self._alive.append(1)
+        self._romaji.append(romaji)
+        self._cover.append(cover)
+        # Poucos formatos diferentes (TV, MOVIE, OVA...): uma cópia só de cada
+        self._format.append(sys.intern(format) if format else None)
+        self._names_hash.append(names_hash)
+
+        for name in names:
+            name_id = len(self._name_slot)
+            self._name_slot.append(slot)
+            for gram in trigrams(name):
+                postings = self._grams.get(gram)
+                if postings is None:
+                    postings = self._grams[sys.intern(gram)] = array("i")
+                postings.append(name_id)
+            words = name.split(" ")
+            self._delta.append((name, name_id, _TIER_START))
+            for i in range(1, len(words)):
+                self._delta.append((" ".join(words[i:]), name_id, _TIER_WORD))
+        return True
+
+    def add_many(self, entries):
+        """entries: (id, romaji, capa, formato, popularidade, [títulos]) de cada anime."""
+        with self._write_lock:
+            with self._lock:
+                for entry in entries:
+                    self._add(*entry)
+                due = len(self._delta) > DELTA_MAX or self._dead > len(self._media_ids) // 4 + DELTA_MAX
+            if due:
+                # Com o _write_lock ninguém mais altera o índice: a fusão lê o estado atual sem o _lock
+                merged = self._merged()
+                with self._lock:
+                    self.__dict__.update(merged)
+
+    def _merged(self) -> dict:
+        """
+        Funde o delta nas chaves ordenadas e, se houver slots mortos, compacta:
+        slots e nomes vivos são renumerados e o resto sai dos arrays e dos trigramas.
+        Devolve os atributos novos em vez de alterar o índice.
+        """
+        alive, name_slot = self._alive, self._name_slot
+        merged = {"_delta": [], "_dead": 0}
+        if self._dead:
+            kept_slots = [slot for slot in range(len(alive)) if alive[slot]]
+            kept_names = [name_id for name_id in range(len(name_slot)) if alive[name_slot[name_id]]]
+            # Número antigo -> novo (-1 = morto)
+            slot_map = array("i", [-1]) * len(alive)
+            for new, old in enumerate(kept_slots):
+                slot_map[old] = new
+            name_map = array("i", [-1]) * len(name_slot)
+            for new, old in enumerate(kept_names):
+                name_map[old] = new
+            grams = {}
+            for gram, postings in self._grams.items():
+                kept = array("i", (name_map[n] for n in postings if name_map[n] >= 0))
+                if kept:
+                    grams[gram] = kept
+            merged.update({
+                "_slot_by_id": {media_id: slot_map[slot] for media_id, slot in self._slot_by_id.items()},
+                "_media_ids": array("i", (self._media_ids[slot] for slot in kept_slots)),
+                "_popularity": array("i", (self._popularity[slot] for slot in kept_slots)),
+                "_alive": bytearray(b"\x01") * len(kept_slots),
+                "_romaji": [self._romaji[slot] for slot in kept_slots],
+                "_cover": [self._cover[slot] for slot in kept_slots],
+                "_format": [self._format[slot] for slot in kept_slots],
+                "_names_hash": array("q", (self._names_hash[slot] for slot in kept_slots)),
+                "_name_slot": array("i", (slot_map[name_slot[name_id]] for name_id in kept_names)),
+                "_grams": grams,
+            })
+        else:
+            name_map = range(len(name_slot))
+
+        live = [
+            (key, name_map[name_id], tier)
+            for key, name_id, tier in zip(self._keys, self._key_names, self._key_tiers)
+            if name_map[name_id] >= 0
+        ]
+        live += [(key, name_map[name_id], tier) for key, name_id, tier in self._delta if name_map[name_id] >= 0]
+        live.sort()
+        merged["_keys"] = [key for key, _, _ in live]
+        merged["_key_names"] = array("i", (name_id for _, name_id, _ in live))
+        merged["_key_tiers"] = array("b", (tier for _, _, tier in live))
+        return merged
+
+    def load(self, entries):
+        """Reconstrói do zero (na subida do servidor) e troca o índice de uma vez."""
+        fresh = TitleIndex()
+        for entry in entries:
+            fresh._add(*entry)
+        fresh.__dict__.update(fresh._merged())
+        with self._write_lock, self._lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ("_lock", "_write_lock")})
+            self.built_at = time.time()
+
+    # --- CONSULTA ---
+    def suggest(self, term: str, limit: int = 5) -> list[dict]:
+        query = fold(term)
+        if not query:
+            return []
+        with self._lock:
+            best: dict[int, tuple] = {}  # slot -> (grupo, -score, -popularidade)
+
+            def offer(slot: int, tier: int, score: float = 1.0):
+                rank = (tier, -score, -self._popularity[slot])
+                if slot not in best or rank < best[slot]:
+                    best[slot] = rank
+
+            # Prefixo nas chaves ordenadas
+            keys = self._keys
+            i = bisect_left(keys, query)
+            end = min(len(keys), i + PREFIX_SCAN)
+            while i < end and keys[i].startswith(query):
+                slot = self._name_slot[self._key_names[i]]
+                if self._alive[slot]:
+                    offer(slot, self._key_tiers[i])
+                i += 1
+            for key, name_id, tier in self._delta:
+                slot = self._name_slot[name_id]
+                if self._alive[slot] and key.startswith(query):
+                    offer(slot, tier)
+
+            # Fuzzy só completa o que o prefixo não achou
+            if len(best) < limit and len(query) >= 3:
+                for slot, score in self._fuzzy(query):
+                    offer(slot, _TIER_FUZZY, score)
+
+            ranked = sorted(best.items(), key=lambda item: item[1])[:limit]
+            return [self._payload(slot) for slot, _ in ranked]
+
+    def find(self, term: str) -> int | None:
+        """Id do anime cujo título (qualquer um deles) é exatamente o termo; o mais popular no empate."""
+        query = fold(term)
+        if not query:
+            return None
+        with self._lock:
+            found = None
+            candidates = []
+            i = bisect_left(self._keys, query)
+            while i < len(self._keys) and self._keys[i] == query:
+                if self._key_tiers[i] == _TIER_START:
+                    candidates.append(self._key_names[i])
+                i += 1
+            candidates += [name_id for key, name_id, tier in self._delta if key == query and tier == _TIER_START]
+            for name_id in candidates:
+                slot = self._name_slot[name_id]
+                if self._alive[slot] and (found is None or self._popularity[slot] > self._popularity[found]):
+                    found = slot
+            return self._media_ids[found] if found is not None else None
+
+    def _fuzzy(self, query: str):
+        grams = trigrams(query)
+        shared: Counter = Counter()
+        for gram in grams:
+            postings = self._grams.get(gram)
+            if postings is not None and len(postings) <= FUZZY_MAX_POSTINGS:
+                shared.update(postings)
+        best: dict[int, float] = {}
+        for name_id, count in shared.items():
+            score = count / len(grams)
+            slot = self._name_slot[name_id]
+            if score >= FUZZY_MIN_SCORE and self._alive[slot] and score > best.get(slot, 0):
+                best[slot] = score
+        return best.items()
+
+    def _payload(self, slot: int) -> dict:
+        # Mesmo formato que o AniList devolvia para a SearchBar
+        return {
+            "id": self._media_ids[slot],
+            "title": {"romaji": self._romaji[slot]},
+            "coverImage": {"medium": self._cover[slot]},
+            "format": self._format[slot],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "media": len(self._slot_by_id),
+            "names": len(self._name_slot),
+            "keys": len(self._keys) + len(self._delta),
+            "trigrams": len(self._grams),
+            "built_at": self.built_at,
+        }
+
+
+def entry_from_model(media: models.Media) -> tuple:
+    names = [media.title_romaji, media.title_english, media.title_native] + [
+        t.title for t in media.titles if t.kind == "synonym"
+    ]
+    return (media.id, media.title_romaji, media.cover_medium or media.cover_large,
+            media.format, media.popularity, names)
+
+
+def load_from_db():
+    """Monta o índice a partir das tabelas do espelho (roda em thread na subida)."""
+    db = database.SessionLocal()
+    try:
+        synonyms: dict[int, list[str]] = {}
+        for media_id, title in (
+            db.query(models.MediaTitle.media_id, models.MediaTitle.title)
+            .filter(models.MediaTitle.kind == "synonym")
+        ):
+            synonyms.setdefault(media_id, []).append(title)
+        rows = db.query(
+            models.Media.id, models.Media.title_romaji, models.Media.title_english, models.Media.title_native,
+            models.Media.cover_medium, models.Media.cover_large, models.Media.format, models.Media.popularity,
+        )
+        title_index.load(
+            (media_id, romaji, medium or large, format, popularity, [romaji, english, native] + synonyms.get(media_id, []))
+            for media_id, romaji, english, native, medium, large, format, popularity in rows
+        )
+    finally:
+        db.close()
+    logger.info("Índice de títulos carregado", extra={"media": len(title_index)})
+
+
+title_index = TitleIndex()
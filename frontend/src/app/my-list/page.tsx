@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react';
 import Link from 'next/link';
 import { useRouter } from 'next/navigation';
 import Navbar from '@/components/Navbar';
+import { api } from '@/services/api';
 import { ListBulletIcon } from '@heroicons/react/24/solid'; // Ícone de lista
 
 export default function MyListPage() {
@@ -23,13 +24,10 @@ export default function MyListPage() {
     }
 
     try {
-        // AGORA BUSCA DO ENDPOINT CORRETO
-        const res = await fetch("http://127.0.0.1:8000/users/me/watchlist", {
-            headers: { "Authorization": `Bearer ${token}` }
-        });
+        // AGORA BUSCA DO ENDPOINT CORRETO (todas as páginas)
+        const data = await api.getUserList('watchlist', token);
         
-        if (res.ok) {
-            const data = await res.json();
+        if (data) {
             setWatchlist(data);
         } else {
             localStorage.removeItem("anihub_token");
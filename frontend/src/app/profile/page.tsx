@@ -3,6 +3,7 @@
 import { useEffect, useState } from 'react';
 import { useRouter } from 'next/navigation';
 import Navbar from '@/components/Navbar';
+import { api } from '@/services/api';
 import Link from 'next/link';
 import { HeartIcon, ClockIcon, PencilSquareIcon, StarIcon } from '@heroicons/react/24/solid';
 
@@ -43,11 +44,11 @@ export default function ProfilePage() {
         setNewColor(dataUser.avatar_color || "purple");
 
         // Favoritos
-        const resFav = await fetch(`${baseUrl}/users/me/favorites`, { headers: { "Authorization": `Bearer ${token}` } });
-        if (resFav.ok) setFavorites(await resFav.json());
+        const favs = await api.getUserList('favorites', token);
+        if (favs) setFavorites(favs);
 
-        // Histórico
-        const resHist = await fetch(`${baseUrl}/users/me/history`, { headers: { "Authorization": `Bearer ${token}` } });
+        // Continue assistindo (histórico já com próximo episódio e progresso)
+        const resHist = await fetch(`${baseUrl}/users/me/continue-watching`, { headers: { "Authorization": `Bearer ${token}` } });
         if (resHist.ok) setHistory(await resHist.json());
 
     } catch (error) {
@@ -190,7 +191,15 @@ export default function ProfilePage() {
                                 <img src={hist.cover} className="w-16 h-10 object-cover rounded shadow-sm group-hover:scale-105 transition-transform" />
                                 <div className="flex-1 min-w-0">
                                     <h4 className="font-bold text-gray-200 group-hover:text-blue-400 truncate">{hist.title}</h4>
-                                    <p className="text-xs text-gray-500">Parou no Episódio {hist.episode}</p>
+                                    <p className="text-xs text-gray-500">
+                                        {hist.next_episode ? `Próximo: Episódio ${hist.next_episode}` : `Parou no Episódio ${hist.episode}`}
+                                        {hist.total_episodes ? ` de ${hist.total_episodes}` : ""}
+                                    </p>
+                                    {hist.progress != null && (
+                                        <div className="mt-1 h-1 bg-gray-700 rounded-full overflow-hidden">
+                                            <div className="h-full bg-blue-500" style={{ width: `${hist.progress * 100}%` }} />
+                                        </div>
+                                    )}
                                 </div>
                                 <span className="text-gray-600 text-xs group-hover:text-blue-400">▶</span>
                             </div>
@@ -9,6 +9,7 @@ import {
 } from '@heroicons/react/24/solid';
 import { HeartIcon as HeartOutline } from '@heroicons/react/24/outline';
 import Navbar from '@/components/Navbar';
+import { api } from '@/services/api';
 
 interface Relation { type: string; title: string; format: string; cover: string; }
 interface AnimeData { id: number; title: string; cover: string; banner?: string; description: string; score: number; episodes: number; status: string; year?: number; genres?: string[]; studio?: string; relations?: Relation[]; format?: string; }
@@ -41,17 +42,29 @@ export default function PlayerPage({ params }: { params: { id: string } }) {
     setEpisode(1); 
     try {
       const baseUrl = "http://127.0.0.1:8000";
-      const resMeta = await fetch(`${baseUrl}/anime/${searchTerm}`);
+      // Só o detalhe: as relações (temporadas/relacionados) chegam depois, sem segurar o player
+      const resMeta = await fetch(`${baseUrl}/anime/${searchTerm}?relations=false`);
       if (!resMeta.ok) throw new Error("Anime não encontrado");
       const dataMeta = await resMeta.json();
       setAnimeData(dataMeta);
       
       checkStatus(dataMeta.id); 
+      loadRelations(dataMeta.id);
       
       await fetchVideo(searchTerm, 1, dataMeta);
     } catch (error) { console.error("Erro:", error); } finally { setLoading(false); }
   }
 
+  async function loadRelations(animeId: number) {
+    try {
+      const res = await fetch(`http://127.0.0.1:8000/anime/id/${animeId}/relations`);
+      if (!res.ok) return;
+      const relations: Relation[] = await res.json();
+      // Ignora a resposta se o usuário já trocou de anime
+      setAnimeData(prev => (prev && prev.id === animeId ? { ...prev, relations } : prev));
+    } catch (error) { console.error("Erro ao buscar relações:", error); }
+  }
+
   async function fetchVideo(animeName: string, epNumber: number, dataMeta: AnimeData | null = null) {
     setVideoUrl(null);
     try {
@@ -81,20 +94,15 @@ export default function PlayerPage({ params }: { params: { id: string } }) {
   async function checkStatus(animeId: number) {
      const myToken = localStorage.getItem("anihub_token");
      if (!myToken) return;
-     const baseUrl = "http://127.0.0.1:8000";
 
      try {
-        const resFav = await fetch(`${baseUrl}/users/me/favorites`, { headers: { "Authorization": `Bearer ${myToken}` } });
-        if(resFav.ok) {
-            const favs = await resFav.json();
-            setIsFavorite(!!favs.find((f: any) => f.anime_id === animeId));
-        }
-        
-        const resList = await fetch(`${baseUrl}/users/me/watchlist`, { headers: { "Authorization": `Bearer ${myToken}` } });
-        if(resList.ok) {
-            const list = await resList.json();
-            setIsInWatchList(!!list.find((f: any) => f.anime_id === animeId));
-        }
+        // Listas completas (todas as páginas), não só as primeiras entradas
+        const [favs, list] = await Promise.all([
+            api.getUserList('favorites', myToken),
+            api.getUserList('watchlist', myToken),
+        ]);
+        if (favs) setIsFavorite(!!favs.find((f: any) => f.anime_id === animeId));
+        if (list) setIsInWatchList(!!list.find((f: any) => f.anime_id === animeId));
 
      } catch (e) { console.error(e); }
   }
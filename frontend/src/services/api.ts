@@ -1,6 +1,8 @@
 import { HomeData, Anime } from '@/types'; // Importando do arquivo que acabamos de criar
 
 const API_BASE = "http://127.0.0.1:8000";
+// Máximo que o backend aceita por página nas listas do usuário (LIST_MAX_LIMIT)
+const USER_LIST_PAGE_SIZE = 1000;
 
 export const api = {
   getHome: async (): Promise<HomeData> => {
@@ -22,5 +24,20 @@ export const api = {
   searchSuggest: async (query: string): Promise<Anime[]> => {
     const res = await fetch(`${API_BASE}/search/suggest/${query}`);
     return res.json();
+  },
+
+  // Listas do usuário vêm paginadas: segue o X-Next-Cursor até a última página (null = erro/sem login)
+  getUserList: async <T = any>(list: 'favorites' | 'watchlist' | 'history', token: string): Promise<T[] | null> => {
+    const items: T[] = [];
+    let cursor: string | null = null;
+    do {
+      const params = new URLSearchParams({ limit: String(USER_LIST_PAGE_SIZE) });
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`${API_BASE}/users/me/${list}?${params}`, { headers: { "Authorization": `Bearer ${token}` } });
+      if (!res.ok) return null;
+      items.push(...await res.json());
+      cursor = res.headers.get("X-Next-Cursor");
+    } while (cursor);
+    return items;
   }
 };
\ No newline at end of file